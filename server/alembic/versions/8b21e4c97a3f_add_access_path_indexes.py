@@ -0,0 +1,39 @@
+"""add access path indexes
+
+Revision ID: 8b21e4c97a3f
+Revises: 3f9c2a71b8d4
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b21e4c97a3f'
+down_revision: Union[str, None] = '3f9c2a71b8d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_meal_plans_user_id_created_at', 'meal_plans', ['user_id', 'created_at']),
+    ('ix_daily_meals_plan_day_type', 'daily_meals', ['meal_plan_id', 'day_of_week', 'meal_type']),
+    ('ix_recipe_ingredients_recipe_id', 'recipe_ingredients', ['recipe_id']),
+    ('ix_shopping_items_meal_plan_ingredient', 'shopping_items', ['meal_plan_id', 'ingredient_id']),
+]
+
+
+def upgrade() -> None:
+    # Build the indexes without blocking writes on PostgreSQL; CONCURRENTLY
+    # cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
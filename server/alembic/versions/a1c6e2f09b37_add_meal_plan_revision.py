@@ -0,0 +1,28 @@
+"""add meal plan revision counter
+
+Revision ID: a1c6e2f09b37
+Revises: e7a4b9c21d05
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c6e2f09b37'
+down_revision: Union[str, None] = 'e7a4b9c21d05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant server default lets PostgreSQL add the column without rewriting the table
+    op.add_column('meal_plans', sa.Column('revision', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('meal_plans') as batch_op:
+        batch_op.drop_column('revision')
@@ -0,0 +1,38 @@
+"""add meal graph reference indexes
+
+Revision ID: c5d0f3a8e912
+Revises: 8b21e4c97a3f
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d0f3a8e912'
+down_revision: Union[str, None] = '8b21e4c97a3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_daily_meals_meal_id', 'daily_meals', ['meal_id']),
+    ('ix_meals_recipe_id', 'meals', ['recipe_id']),
+    ('ix_recipes_nutrition_id', 'recipes', ['nutrition_id']),
+]
+
+
+def upgrade() -> None:
+    # Build the indexes without blocking writes on PostgreSQL; CONCURRENTLY
+    # cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
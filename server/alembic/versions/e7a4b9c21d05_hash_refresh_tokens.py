@@ -0,0 +1,59 @@
+"""store refresh tokens as sha256 hashes
+
+Revision ID: e7a4b9c21d05
+Revises: c5d0f3a8e912
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a4b9c21d05'
+down_revision: Union[str, None] = 'c5d0f3a8e912'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('refresh_tokens', sa.Column('token_hash', sa.LargeBinary(length=32), nullable=True))
+
+    bind = op.get_bind()
+    # Revoked tokens can never be used again, so there is no point in hashing them
+    op.execute("DELETE FROM refresh_tokens WHERE is_revoked")
+    if bind.dialect.name == 'postgresql':
+        op.execute("UPDATE refresh_tokens SET token_hash = sha256(convert_to(token, 'UTF8'))")
+    else:
+        refresh_tokens = sa.table(
+            'refresh_tokens',
+            sa.column('id', sa.Integer),
+            sa.column('token', sa.String),
+            sa.column('token_hash', sa.LargeBinary)
+        )
+        rows = bind.execute(sa.select(refresh_tokens.c.id, refresh_tokens.c.token)).all()
+        for token_id, token in rows:
+            bind.execute(
+                refresh_tokens.update()
+                .where(refresh_tokens.c.id == token_id)
+                .values(token_hash=hashlib.sha256(token.encode('utf-8')).digest())
+            )
+
+    with op.batch_alter_table('refresh_tokens') as batch_op:
+        batch_op.drop_index('ix_refresh_tokens_token')
+        batch_op.drop_column('token')
+        batch_op.alter_column('token_hash', existing_type=sa.LargeBinary(length=32), nullable=False)
+        batch_op.create_index('ix_refresh_tokens_token_hash', ['token_hash'], unique=True)
+
+
+def downgrade() -> None:
+    # The plain tokens cannot be recovered; every session has to log in again
+    op.execute("DELETE FROM refresh_tokens")
+    with op.batch_alter_table('refresh_tokens') as batch_op:
+        batch_op.drop_index('ix_refresh_tokens_token_hash')
+        batch_op.drop_column('token_hash')
+        batch_op.add_column(sa.Column('token', sa.String(), nullable=True))
+        batch_op.create_index('ix_refresh_tokens_token', ['token'], unique=True)
@@ -1,20 +1,174 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+import logging
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Async drivers used by the API endpoints, per database backend
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """The same database with its async driver, e.g. postgresql:// -> postgresql+asyncpg://."""
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+# Set explicitly when the sync URL carries driver options asyncpg does not understand
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(SQLALCHEMY_DATABASE_URL)
+
+# Connection pool, per process. Size it so that workers * (size + overflow)
+# stays below the database's max_connections. "null" opens a connection per
+# checkout, for use behind an external pooler such as PgBouncer.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Checkouts waiting longer than this for a connection are logged
+DB_POOL_SLOW_CHECKOUT_SECONDS = float(os.getenv("DB_POOL_SLOW_CHECKOUT_SECONDS", "0.1"))
+
+
+class PoolMetrics:
+    """Counters for connection checkouts and the time spent waiting for them."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float, pool):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        if seconds > DB_POOL_SLOW_CHECKOUT_SECONDS:
+            logger.warning(f"Waited {seconds:.3f}s for a database connection ({pool.status()})")
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+
+class _InstrumentedPool:
+    """Records how long each checkout takes, waiting for a free slot included."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - started, self)
+
+
+# The sync engine serves the job workers, maintenance and scripts, the async
+# engine the API endpoints. Each has its own pool, so each gets its own counters.
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    metrics = pool_metrics
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    metrics = async_pool_metrics
+
+
+def _engine_options(url: str, poolclass=InstrumentedQueuePool) -> dict:
+    if DB_POOL_MODE == "null":
+        options = {"poolclass": NullPool, "pool_pre_ping": DB_POOL_PRE_PING}
+        if make_url(url).drivername == "postgresql+asyncpg":
+            # Prepared statements do not survive PgBouncer's transaction pooling
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+    if url.startswith("sqlite"):
+        # SQLite picks a pool suited to file or in-memory databases itself
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options(SQLALCHEMY_DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, InstrumentedAsyncQueuePool)
+)
+# Objects stay usable after commit; reloading them would need another await
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+@event.listens_for(engine, "checkout")
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_metrics.record_checkout()
+
+
+@event.listens_for(async_engine.sync_engine, "checkout")
+def _count_async_checkout(dbapi_connection, connection_record, connection_proxy):
+    async_pool_metrics.record_checkout()
+
+
+def _pool_stats(pool, metrics: PoolMetrics) -> dict:
+    stats = {
+        "pool_class": type(pool).__name__,
+        "checkouts": metrics.checkouts,
+        "timeouts": metrics.timeouts,
+        "wait_seconds_total": round(metrics.wait_seconds_total, 6),
+        "wait_seconds_max": round(metrics.wait_seconds_max, 6),
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "idle": pool.checkedin(),
+        })
+    return stats
+
+
+def pool_stats() -> dict:
+    """Current pool occupancy and checkout counters per engine, for sizing the pools."""
+    return {
+        "sync": _pool_stats(engine.pool, pool_metrics),
+        "async": _pool_stats(async_engine.sync_engine.pool, async_pool_metrics),
+    }
+
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -12,16 +13,22 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 @router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    user = await db.scalar(select(models.User).where(models.User.email == form_data.username))
+    if user:
+        password_valid, new_hash = await security.verify_and_update_password(form_data.password, user.hashed_password)
+    if not user or not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade hashes created with outdated settings, e.g. fewer bcrypt rounds
+    if new_hash:
+        user.hashed_password = new_hash
+    
     # Create access token
     access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
@@ -34,12 +41,12 @@ async def login_for_access_token(
     
     # Store refresh token in database
     db_refresh_token = models.RefreshToken(
-        token=refresh_token,
+        token_hash=security.hash_refresh_token(refresh_token),
         expires_at=refresh_token_expires,
         user_id=user.id
     )
     db.add(db_refresh_token)
-    db.commit()
+    await db.commit()
     
     return {
         "access_token": access_token,
@@ -50,12 +57,12 @@ async def login_for_access_token(
 @router.post("/refresh", response_model=schemas.Token)
 async def refresh_access_token(
     token_data: schemas.TokenRefresh,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Find the refresh token in the database
-    db_refresh_token = db.query(models.RefreshToken).filter(
-        models.RefreshToken.token == token_data.refresh_token
-    ).first()
+    db_refresh_token = await db.scalar(select(models.RefreshToken).where(
+        models.RefreshToken.token_hash == security.hash_refresh_token(token_data.refresh_token)
+    ))
     
     # Verify the refresh token
     if not security.verify_refresh_token(token_data.refresh_token, db_refresh_token):
@@ -77,7 +84,7 @@ async def refresh_access_token(
         refresh_token_expires = datetime.utcnow() + timedelta(days=security.REFRESH_TOKEN_EXPIRE_DAYS)
         
         # Check if token was already revoked (handle race condition)
-        db.refresh(db_refresh_token)
+        await db.refresh(db_refresh_token)
         if db_refresh_token.is_revoked:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -87,12 +94,12 @@ async def refresh_access_token(
         # Revoke old refresh token and create new one
         db_refresh_token.is_revoked = True
         new_db_refresh_token = models.RefreshToken(
-            token=new_refresh_token,
+            token_hash=security.hash_refresh_token(new_refresh_token),
             expires_at=refresh_token_expires,
             user_id=db_refresh_token.user_id
         )
         db.add(new_db_refresh_token)
-        db.commit()
+        await db.commit()
         
         return {
             "access_token": access_token,
@@ -100,7 +107,7 @@ async def refresh_access_token(
             "token_type": "bearer"
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Failed to refresh token"
@@ -110,9 +117,9 @@ async def refresh_access_token(
 async def create_user(
     user: schemas.UserCreate,
     current_user: Optional[dict],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -131,7 +138,7 @@ async def create_user(
             detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}"
         )
     
-    hashed_password = security.get_password_hash(user.password)
+    hashed_password = await security.hash_password(user.password)
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
@@ -139,22 +146,22 @@ async def create_user(
         role=user.role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/logout")
 async def logout(
     token_data: schemas.TokenRefresh,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Revoke the refresh token
-    db_refresh_token = db.query(models.RefreshToken).filter(
-        models.RefreshToken.token == token_data.refresh_token
-    ).first()
+    db_refresh_token = await db.scalar(select(models.RefreshToken).where(
+        models.RefreshToken.token_hash == security.hash_refresh_token(token_data.refresh_token)
+    ))
     
     if db_refresh_token:
         db_refresh_token.is_revoked = True
-        db.commit()
+        await db.commit()
     
     return {"message": "Successfully logged out"} 
\ No newline at end of file
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from .. import models, security, schemas
@@ -8,7 +9,7 @@ from ..database import get_db
 router = APIRouter(prefix="/ingredients", tags=["ingredients"])
 
 @router.get("/common", response_model=List[schemas.IngredientResponse])
-async def get_common_ingredients(db: Session = Depends(get_db)):
+async def get_common_ingredients(db: AsyncSession = Depends(get_db)):
     return [
         {"id": i, "name": name, "emoji": emoji, "quantity": 0, "unit": unit, "default_unit": unit}
         for i, (name, emoji, unit) in enumerate([
@@ -30,17 +31,17 @@ async def get_common_ingredients(db: Session = Depends(get_db)):
 @router.get("/user", response_model=List[schemas.IngredientResponse])
 async def get_user_ingredients(
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return db.query(models.UserIngredient).filter(
+    return (await db.scalars(select(models.UserIngredient).where(
         models.UserIngredient.user_id == current_user["user_id"]
-    ).all()
+    ))).all()
 
 @router.post("/user", response_model=schemas.IngredientResponse)
 async def add_user_ingredient(
     ingredient: schemas.IngredientCreate,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     db_ingredient = models.Ingredient(
         name=ingredient.name,
@@ -48,7 +49,7 @@ async def add_user_ingredient(
         default_unit=ingredient.default_unit or ingredient.unit
     )
     db.add(db_ingredient)
-    db.flush()
+    await db.flush()
 
     user_ingredient = models.UserIngredient(
         user_id=current_user["user_id"],
@@ -57,8 +58,8 @@ async def add_user_ingredient(
         unit=ingredient.unit
     )
     db.add(user_ingredient)
-    db.commit()
-    db.refresh(user_ingredient)
+    await db.commit()
+    await db.refresh(user_ingredient)
     return user_ingredient
 
 @router.put("/user/{ingredient_id}")
@@ -66,35 +67,35 @@ async def update_user_ingredient(
     ingredient_id: int,
     ingredient: schemas.IngredientBase,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_ingredient = db.query(models.UserIngredient).filter(
+    db_ingredient = await db.scalar(select(models.UserIngredient).where(
         models.UserIngredient.id == ingredient_id,
         models.UserIngredient.user_id == current_user["user_id"]
-    ).first()
+    ))
     
     if not db_ingredient:
         raise HTTPException(status_code=404, detail="Ingredient not found")
     
     db_ingredient.quantity = ingredient.quantity
     db_ingredient.unit = ingredient.unit
-    db.commit()
+    await db.commit()
     return {"message": "Ingredient updated successfully"}
 
 @router.delete("/user/{ingredient_id}")
 async def delete_user_ingredient(
     ingredient_id: int,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_ingredient = db.query(models.UserIngredient).filter(
+    db_ingredient = await db.scalar(select(models.UserIngredient).where(
         models.UserIngredient.id == ingredient_id,
         models.UserIngredient.user_id == current_user["user_id"]
-    ).first()
+    ))
     
     if not db_ingredient:
         raise HTTPException(status_code=404, detail="Ingredient not found")
     
-    db.delete(db_ingredient)
-    db.commit()
+    await db.delete(db_ingredient)
+    await db.commit()
     return {"message": "Ingredient deleted successfully"} 
\ No newline at end of file
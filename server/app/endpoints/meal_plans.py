@@ -1,22 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from pydantic import BaseModel
 import logging
 import json
-from typing import List, Literal, Optional
+import time
+from typing import Dict, List, Literal, Optional, Tuple
 from datetime import datetime, date
 from isoweek import Week
 
 from .. import models, security, schemas
-from ..database import get_db
+from ..database import AsyncSessionLocal, get_db
 from ..openrouter_client import OpenRouterClient
+from ..single_flight import SingleFlight
+from ..ingredient_resolver import resolve_ingredient_ids
+from ..plan_writer import write_meal_plan
+from ..plan_deletion import delete_meal_plans
+from ..plan_cache import cache_week_plan, get_cached_week_plan, invalidate_week_plan
+from ..etag import bump_revision, etag_matches, meal_plan_etag, not_modified
+from ..logging_config import log_payload
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/meal-plans", tags=["meal-plans"])
 openrouter_client = OpenRouterClient()
+meal_plan_flight = SingleFlight("meal_plan")
 
 def transform_meal_data(meal_name: str) -> dict:
     """Transform a meal name into the full meal object structure expected by the frontend."""
@@ -99,61 +109,135 @@ def transform_meal_data(meal_name: str) -> dict:
 
 def create_shopping_items(db: Session, meal_plan_id: int, recipe_data: dict):
     """Create shopping items for a recipe in the meal plan."""
-    logger.info(f"Creating shopping items for meal plan {meal_plan_id}")
+    logger.debug("Creating shopping items for meal plan %s", meal_plan_id)
     
     # Create a dictionary to aggregate quantities
-    # Key is (ingredient_name, unit) to prevent mixing different units
+    # Key is (ingredient_id, unit), the ShoppingKey the delta updates use as well,
+    # to prevent mixing different units
     aggregated_items = {}
     
     # Process new ingredients from recipe
     ingredients = recipe_data.get("recipe", {}).get("ingredientDetails", [])
+    ingredient_ids = resolve_ingredient_ids(db, [(i["name"], i["unit"]) for i in ingredients])
     for ingredient in ingredients:
-        key = (ingredient["name"].lower(), ingredient["unit"])
-        
-        # Get or create the ingredient
-        db_ingredient = db.query(models.Ingredient).filter(
-            models.Ingredient.name == ingredient["name"]
-        ).first()
-        
-        if not db_ingredient:
-            db_ingredient = models.Ingredient(
-                name=ingredient["name"],
-                default_unit=ingredient["unit"]
-            )
-            db.add(db_ingredient)
-            db.flush()
-            logger.info(f"Created new ingredient: {db_ingredient.name}")
+        key = (ingredient_ids[ingredient["name"]], ingredient["unit"])
         
         if key in aggregated_items:
             # Update quantity for existing ingredient
             aggregated_items[key]["quantity"] += ingredient["amount"]
-            logger.info(f"Updated quantity for {db_ingredient.name}: +{ingredient['amount']} {ingredient['unit']}")
+            logger.debug("Updated quantity for %s: +%s %s", ingredient["name"], ingredient["amount"], ingredient["unit"])
         else:
             # Add new ingredient to aggregation dictionary
             aggregated_items[key] = {
-                "ingredient_id": db_ingredient.id,
+                "name": ingredient["name"],
+                "ingredient_id": ingredient_ids[ingredient["name"]],
                 "quantity": ingredient["amount"],
                 "unit": ingredient["unit"],
                 "category": get_ingredient_category(ingredient["name"]),
                 "bought": False
             }
-            logger.info(f"Added new ingredient to aggregate: {db_ingredient.name} - {ingredient['amount']} {ingredient['unit']}")
-    
-    # Create new shopping items from aggregated data
-    for (name, unit), item_data in aggregated_items.items():
-        shopping_item = models.ShoppingItem(
-            meal_plan_id=meal_plan_id,
-            ingredient_id=item_data["ingredient_id"],
-            quantity_needed=item_data["quantity"],
-            unit=item_data["unit"],
-            category=item_data["category"],
-            bought=item_data["bought"]
-        )
-        db.add(shopping_item)
-        logger.info(f"Created shopping item: {name} - {item_data['quantity']} {unit}")
+            logger.debug("Added new ingredient to aggregate: %s - %s %s", ingredient["name"], ingredient["amount"], ingredient["unit"])
     
+    # Create new shopping items from aggregated data in one statement; nothing needs their ids,
+    # and an ORM flush would insert them one by one on databases that cannot batch RETURNING
+    rows = []
+    for item_data in aggregated_items.values():
+        rows.append({
+            "meal_plan_id": meal_plan_id,
+            "ingredient_id": item_data["ingredient_id"],
+            "quantity_needed": item_data["quantity"],
+            "unit": item_data["unit"],
+            "category": item_data["category"],
+            "bought": item_data["bought"]
+        })
+        logger.debug("Created shopping item: %s - %s %s", item_data["name"], item_data["quantity"], item_data["unit"])
+    if rows:
+        db.execute(insert(models.ShoppingItem), rows)
+    logger.debug("Finished creating shopping items")
+
+# Shopping items aggregate recipe ingredients per (ingredient_id, unit)
+ShoppingKey = Tuple[int, str]
+
+# Quantities this close to zero are float residue from repeated scaling
+SHOPPING_QUANTITY_EPSILON = 1e-6
+
+def recipe_contributions(db: Session, recipe_factors: Dict[int, float]) -> Dict[ShoppingKey, float]:
+    """Sum the ingredients of the given recipes per shopping key, each recipe scaled by its factor.
+
+    A factor of 1 adds a recipe to the shopping list, -1 removes it, and
+    ``new_servings / old_servings - 1`` accounts for a change of servings.
+    """
+    recipe_factors = {recipe_id: factor for recipe_id, factor in recipe_factors.items() if recipe_id and factor}
+    if not recipe_factors:
+        return {}
+
+    rows = db.query(
+        models.RecipeIngredient.recipe_id,
+        models.RecipeIngredient.ingredient_id,
+        models.RecipeIngredient.unit,
+        func.sum(models.RecipeIngredient.amount)
+    ).filter(
+        models.RecipeIngredient.recipe_id.in_(recipe_factors.keys())
+    ).group_by(
+        models.RecipeIngredient.recipe_id,
+        models.RecipeIngredient.ingredient_id,
+        models.RecipeIngredient.unit
+    ).all()
+
+    contributions = {}
+    for recipe_id, ingredient_id, unit, amount in rows:
+        key = (ingredient_id, unit)
+        contributions[key] = contributions.get(key, 0) + (amount or 0) * recipe_factors[recipe_id]
+    return contributions
+
+def apply_shopping_delta(db: Session, meal_plan_id: int, delta: Dict[ShoppingKey, float]):
+    """Apply quantity changes to a plan's shopping list, touching only the affected items.
+
+    Existing items keep their ``bought`` flag unless they now need more than
+    before, which has to be bought again. Items that drop to zero are removed
+    and ingredients that are new to the plan get an item of their own.
+    """
+    delta = {key: change for key, change in delta.items() if abs(change) > SHOPPING_QUANTITY_EPSILON}
+    if not delta:
+        return
+
+    items = db.query(models.ShoppingItem).filter(
+        models.ShoppingItem.meal_plan_id == meal_plan_id,
+        models.ShoppingItem.ingredient_id.in_({ingredient_id for ingredient_id, _ in delta})
+    ).all()
+    existing = {(item.ingredient_id, item.unit): item for item in items}
+
+    new_ingredient_ids = {key[0] for key, change in delta.items() if key not in existing and change > 0}
+    names = dict(db.query(models.Ingredient.id, models.Ingredient.name).filter(
+        models.Ingredient.id.in_(new_ingredient_ids)
+    ).all()) if new_ingredient_ids else {}
+
+    new_rows = []
+    for (ingredient_id, unit), change in delta.items():
+        item = existing.get((ingredient_id, unit))
+        if item is None:
+            if change > 0:
+                new_rows.append({
+                    "meal_plan_id": meal_plan_id,
+                    "ingredient_id": ingredient_id,
+                    "quantity_needed": change,
+                    "unit": unit,
+                    "category": get_ingredient_category(names.get(ingredient_id, "")),
+                    "bought": False
+                })
+            continue
+
+        item.quantity_needed = (item.quantity_needed or 0) + change
+        if change > 0:
+            item.bought = False
+        if item.quantity_needed <= SHOPPING_QUANTITY_EPSILON:
+            db.delete(item)
+
     db.flush()
-    logger.info("Finished creating shopping items")
+    # One statement for all new items, as in create_shopping_items
+    if new_rows:
+        db.execute(insert(models.ShoppingItem), new_rows)
+    logger.info(f"Applied {len(delta)} shopping list changes to meal plan {meal_plan_id}")
 
 def get_ingredient_category(name: str) -> str:
     """Determine the category of an ingredient."""
@@ -181,11 +265,14 @@ async def get_meal_details(
     day_index: int,
     meal_type: str,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
+    return await db.run_sync(_load_meal_details, current_user["user_id"], day_index, meal_type)
+
+def _load_meal_details(db: Session, user_id, day_index: int, meal_type: str) -> dict:
     # Get current meal plan
     meal_plan = db.query(models.MealPlan).filter(
-        models.MealPlan.user_id == current_user["user_id"]
+        models.MealPlan.user_id == user_id
     ).order_by(models.MealPlan.created_at.desc()).first()
     
     if not meal_plan:
@@ -266,370 +353,507 @@ def get_current_week_info() -> schemas.WeekInfo:
     week = Week.withdate(today)
     return schemas.WeekInfo(week_number=week.week, year=week.year)
 
+def meal_plan_request_key(user_id, week_info: schemas.WeekInfo, preferences: Optional[dict]) -> str:
+    """Key identifying identical meal plan generation requests."""
+    return json.dumps({
+        "user_id": str(user_id),
+        "year": week_info.year,
+        "week_number": week_info.week_number,
+        "preferences": preferences or {}
+    }, sort_keys=True, default=str)
+
 @router.post("/generate", response_model=schemas.MealPlanResponse)
 async def generate_meal_plan(
     meal_plan: schemas.MealPlanCreate,
     current_user: dict = Depends(security.get_subscriber_user),  # Only subscribers and admins
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Generate a meal plan based on user preferences."""
+    """Generate a meal plan based on user preferences.
+
+    A request that is identical to one still being generated (double submit,
+    client retry) waits for that generation instead of starting another one.
+    """
+    # If no week info provided, use current week
+    week_info = meal_plan.week_info or get_current_week_info()
+    user_id = current_user["user_id"]
+    preferences = meal_plan.preferences or {}  # Pass preferences directly from the request
+    key = meal_plan_request_key(user_id, week_info, meal_plan.preferences)
+
+    # Get user's language preference, and don't hold a transaction open while the LLM is working
+    user_language = await db.run_sync(get_user_language, user_id)
+    await db.commit()
+
+    # The shared generation outlives this request when its client goes away and answers the
+    # requests coalesced with it, so it works in sessions of its own, not in this request's
+    return await meal_plan_flight.do(
+        key,
+        lambda: _generate_meal_plan(user_id, week_info, preferences, user_language)
+    )
+
+def get_user_language(db: Session, user_id) -> str:
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    return user.language if user and user.language else "en"
+
+async def _generate_meal_plan(user_id, week_info: schemas.WeekInfo, preferences: dict, user_language: str):
     try:
-        # Get user's language preference
-        user = db.query(models.User).filter(models.User.id == current_user["user_id"]).first()
-        user_language = user.language if user else "en"
-        logger.info(f"Generating meal plan for user {current_user['user_id']} with language {user_language}")
-
-        # If no week info provided, use current week
-        if not meal_plan.week_info:
-            week_info = get_current_week_info()
-
-        # Delete existing meal plan for the specified week if it exists
-        existing_plan = db.query(models.MealPlan).filter(
-            models.MealPlan.user_id == current_user["user_id"],
-            models.MealPlan.week_number == week_info.week_number,
-            models.MealPlan.year == week_info.year
-        ).first()
-        if existing_plan:
-            db.delete(existing_plan)
-            db.commit()
-
-        # Create new meal plan
-        new_meal_plan = models.MealPlan(
-            user_id=current_user["user_id"],
-            week_number=week_info.week_number,
-            year=week_info.year
-        )
-        db.add(new_meal_plan)
-        db.flush()
+        logger.info(f"Generating meal plan for user {user_id} with language {user_language}")
 
         # Generate the meal plan with the user's language
-        meal_plan_data = openrouter_client.generate_meal_plan(
-            meal_plan.preferences or {},  # Pass preferences directly from the request
-            language=user_language
-        )
+        meal_plan_data = await openrouter_client.generate_meal_plan(preferences, language=user_language)
 
-        # Collect all ingredients from all meals
-        all_ingredients = []
-
-        # Process each day in the meal plan
-        for day_data in meal_plan_data["days"]:
-            day_index = day_data["day"]
-            for meal_type, meal_data in day_data["meals"].items():
-                # Skip if no meal data
-                if not meal_data:
-                    continue
-
-                # Create or get recipe
-                recipe_data = meal_data.get("recipe", meal_data)  # Handle both structures
-                
-                # Create nutrition record
-                nutrition = models.Nutrition(
-                    calories=recipe_data.get("nutrition", {}).get("calories", 500),
-                    protein=recipe_data.get("nutrition", {}).get("protein", 20),
-                    carbs=recipe_data.get("nutrition", {}).get("carbs", 50),
-                    fat=recipe_data.get("nutrition", {}).get("fat", 25)
-                )
-                db.add(nutrition)
-                db.flush()
-
-                # Create recipe record
-                recipe = models.Recipe(
-                    servings=recipe_data.get("servings", 4),
-                    prep_time=recipe_data.get("prep_time", 15),
-                    cook_time=recipe_data.get("cook_time", 20),
-                    difficulty=recipe_data.get("difficulty", "Medium"),
-                    instructions="\n".join(recipe_data.get("instructions", [])),
-                    tips="\n".join(recipe_data.get("tips", [])),
-                    nutrition_id=nutrition.id
-                )
-                db.add(recipe)
-                db.flush()
-
-                # Create meal
-                meal = models.Meal(
-                    name=meal_data["name"],
-                    description=meal_data.get("description", ""),
-                    emoji=meal_data.get("emoji", "🍽️"),
-                    recipe_id=recipe.id,
-                    servings=meal_data.get("servings", 4),
-                    leftover_from=meal_data.get("leftover_from"),
-                    makes_leftovers_for=meal_data.get("makes_leftovers_for")
-                )
-                db.add(meal)
-                db.flush()
-
-                # Create recipe ingredients and collect for shopping list
-                ingredients = []
-                for ingredient_data in recipe_data.get("ingredients", []):
-                    if not isinstance(ingredient_data, dict):
-                        continue
-                        
-                    # Get or create ingredient
-                    ingredient = db.query(models.Ingredient).filter(
-                        models.Ingredient.name == ingredient_data.get("name")
-                    ).first()
-                    
-                    if not ingredient:
-                        ingredient = models.Ingredient(
-                            name=ingredient_data.get("name", "Unknown Ingredient"),
-                            default_unit=ingredient_data.get("unit", "pieces")
-                        )
-                        db.add(ingredient)
-                        db.flush()
-                    
-                    # Create recipe ingredient
-                    recipe_ingredient = models.RecipeIngredient(
-                        recipe_id=recipe.id,
-                        ingredient_id=ingredient.id,
-                        amount=ingredient_data.get("amount", 1),
-                        unit=ingredient_data.get("unit", "pieces"),
-                        notes=ingredient_data.get("notes")
-                    )
-                    db.add(recipe_ingredient)
-                    
-                    # Add to ingredients list for shopping list
-                    ingredients.append({
-                        "name": ingredient_data.get("name"),
-                        "amount": ingredient_data.get("amount", 1),
-                        "unit": ingredient_data.get("unit", "pieces"),
-                        "notes": ingredient_data.get("notes")
-                    })
-                    all_ingredients.extend(ingredients)
-                
-                # Create daily meal
-                daily_meal = models.DailyMeal(
-                    meal_plan_id=new_meal_plan.id,
-                    day_of_week=(day_index - 1) % 7,  # Convert from 1-7 to 0-6
-                    meal_type=meal_type,
-                    meal_id=meal.id
-                )
-                db.add(daily_meal)
-
-        # Create shopping items for all collected ingredients
-        create_shopping_items(db, new_meal_plan.id, {"recipe": {"ingredientDetails": all_ingredients}})
-
-        db.commit()
-        return meal_plan_data
+        await _save_meal_plan_in_new_session(user_id, week_info, meal_plan_data)
+        # Answer with the stored plan; the raw LLM plan does not have the MealPlanResponse shape
+        async with AsyncSessionLocal() as db:
+            _, plan = await load_week_meal_plan(db, user_id, week_info.year, week_info.week_number)
+        return plan
 
     except Exception as e:
         logger.error(f"Error generating meal plan: {str(e)}")
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def save_meal_plan(db: Session, user_id, week_info: schemas.WeekInfo, meal_plan_data: dict) -> models.MealPlan:
+    """Persist a generated meal plan, replacing any existing plan for the same week.
+
+    The caller is responsible for committing the transaction.
+    """
+    # Delete existing meal plan for the specified week, with all its meals, if it exists
+    existing_plan_id = db.query(models.MealPlan.id).filter(
+        models.MealPlan.user_id == user_id,
+        models.MealPlan.week_number == week_info.week_number,
+        models.MealPlan.year == week_info.year
+    ).scalar()
+    if existing_plan_id:
+        delete_meal_plans(db, [existing_plan_id])
+
+    # Create new meal plan
+    new_meal_plan = models.MealPlan(
+        user_id=user_id,
+        week_number=week_info.week_number,
+        year=week_info.year
+    )
+    db.add(new_meal_plan)
+    db.flush()
+
+    # Insert all meals of the plan in a handful of batched statements
+    all_ingredients = write_meal_plan(db, new_meal_plan.id, meal_plan_data)
+
+    # Create shopping items for all collected ingredients
+    create_shopping_items(db, new_meal_plan.id, {"recipe": {"ingredientDetails": all_ingredients}})
+
+    return new_meal_plan
+
+def generated_meal_response(meal_data: dict) -> dict:
+    """Format a freshly generated meal the same way get_meal_details formats a stored one."""
+    recipe_data = meal_data.get("recipe", meal_data)
+    nutrition = recipe_data.get("nutrition", {})
+    return {
+        "name": meal_data["name"],
+        "description": meal_data.get("description", ""),
+        "emoji": meal_data.get("emoji", "🍽️"),
+        "recipe": {
+            "servings": recipe_data.get("servings", 4),
+            "prepTime": recipe_data.get("prep_time", 15),
+            "cookTime": recipe_data.get("cook_time", 20),
+            "difficulty": recipe_data.get("difficulty", "Medium"),
+            "instructions": recipe_data.get("instructions", []),
+            "ingredientDetails": [
+                {
+                    "name": ingredient.get("name"),
+                    "amount": ingredient.get("amount", 1),
+                    "unit": ingredient.get("unit", "pieces"),
+                    "notes": ingredient.get("notes")
+                }
+                for ingredient in recipe_data.get("ingredients", [])
+                if isinstance(ingredient, dict)
+            ],
+            "tips": recipe_data.get("tips", []),
+            "nutrition": {
+                "calories": nutrition.get("calories", 500),
+                "protein": nutrition.get("protein", 20),
+                "carbs": nutrition.get("carbs", 50),
+                "fat": nutrition.get("fat", 25)
+            }
+        }
+    }
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _save_meal_plan_in_new_session(user_id, week_info: schemas.WeekInfo, meal_plan_data: dict):
+    async with AsyncSessionLocal() as db:
+        try:
+            await db.run_sync(save_meal_plan, user_id, week_info, meal_plan_data)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    await invalidate_week_plan(user_id, week_info.year, week_info.week_number)
+
+@router.post("/generate/stream")
+async def stream_meal_plan(
+    meal_plan: schemas.MealPlanCreate,
+    current_user: dict = Depends(security.get_subscriber_user),  # Only subscribers and admins
+    db: AsyncSession = Depends(get_db)
+):
+    """Generate a meal plan and stream it as Server-Sent Events.
+
+    Sends a ``plan`` event with the high-level plan first, then a ``meal`` event
+    for each meal as soon as its recipe is ready, and a ``done`` event once the
+    plan has been saved. Failures are reported as an ``error`` event.
+    """
+    week_info = meal_plan.week_info or get_current_week_info()
+    user_id = current_user["user_id"]
+    user_language = await db.run_sync(get_user_language, user_id)
+    # The request's session is closed before the stream starts, so release it now
+    await db.commit()
+    logger.info(f"Streaming meal plan for user {user_id} with language {user_language}")
+
+    async def event_stream():
+        try:
+            async for event in openrouter_client.iter_meal_plan(
+                meal_plan.preferences or {},
+                language=user_language
+            ):
+                if event["type"] == "plan":
+                    yield format_sse("plan", {
+                        "week_number": week_info.week_number,
+                        "year": week_info.year,
+                        "total": event["total"],
+                        "days": event["plan"]["days"]
+                    })
+                elif event["type"] == "meal":
+                    yield format_sse("meal", {
+                        "day": event["day"],
+                        "day_index": (event["day"] - 1) % 7,  # Same 0-6 range as the other endpoints
+                        "meal_type": event["meal_type"],
+                        "completed": event["completed"],
+                        "total": event["total"],
+                        "meal": generated_meal_response(event["meal"])
+                    })
+                elif event["type"] == "done":
+                    await _save_meal_plan_in_new_session(user_id, week_info, event["plan"])
+                    yield format_sse("done", {
+                        "week_number": week_info.week_number,
+                        "year": week_info.year
+                    })
+        except Exception as e:
+            logger.error(f"Error streaming meal plan: {str(e)}")
+            yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def meal_plan_job_response(job: models.MealPlanJob, meal_plan: Optional[dict] = None) -> schemas.MealPlanJobResponse:
+    return schemas.MealPlanJobResponse(
+        job_id=job.id,
+        status=job.status,
+        week_number=job.week_number,
+        year=job.year,
+        progress=job.progress or 0,
+        total=job.total,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        meal_plan=meal_plan
+    )
+
+@router.post("/jobs", response_model=schemas.MealPlanJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_meal_plan_job(
+    meal_plan: schemas.MealPlanCreate,
+    current_user: dict = Depends(security.get_subscriber_user),  # Only subscribers and admins
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue a meal plan for background generation and return the job right away.
+
+    An identical job that is still pending or running is returned instead of queueing a new one.
+    """
+    week_info = meal_plan.week_info or get_current_week_info()
+    preferences = json.dumps(meal_plan.preferences or {}, sort_keys=True)
+
+    job = await db.scalar(select(models.MealPlanJob).where(
+        models.MealPlanJob.user_id == current_user["user_id"],
+        models.MealPlanJob.week_number == week_info.week_number,
+        models.MealPlanJob.year == week_info.year,
+        models.MealPlanJob.preferences == preferences,
+        models.MealPlanJob.status.in_(["pending", "running"])
+    ).limit(1))
+
+    if not job:
+        job = models.MealPlanJob(
+            user_id=current_user["user_id"],
+            week_number=week_info.week_number,
+            year=week_info.year,
+            preferences=preferences,
+            status="pending",
+            progress=0
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        logger.info(f"Queued meal plan job {job.id} for user {current_user['user_id']}")
+
+    return meal_plan_job_response(job)
+
+@router.get("/jobs/{job_id}", response_model=schemas.MealPlanJobResponse)
+async def get_meal_plan_job(
+    job_id: int,
+    current_user: dict = Depends(security.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Report the progress of a meal plan job, including the plan once it is completed."""
+    job = await db.scalar(select(models.MealPlanJob).where(
+        models.MealPlanJob.id == job_id,
+        models.MealPlanJob.user_id == current_user["user_id"]
+    ))
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Meal plan job not found")
+
+    meal_plan = None
+    if job.status == "completed" and job.meal_plan_id:
+        _, meal_plan = await load_week_meal_plan(db, current_user["user_id"], job.year, job.week_number)
+
+    return meal_plan_job_response(job, meal_plan)
+
+def _store_replacement_meal(db: Session, meal_plan_id: int, update: schemas.MealUpdateRequest, recipe_data: dict) -> dict:
+    """Store a generated meal in place of the planned one and return it formatted like get_meal_details."""
+    # Create nutrition record
+    nutrition = models.Nutrition(
+        calories=recipe_data.get("nutrition", {}).get("calories", 500),
+        protein=recipe_data.get("nutrition", {}).get("protein", 20),
+        carbs=recipe_data.get("nutrition", {}).get("carbs", 50),
+        fat=recipe_data.get("nutrition", {}).get("fat", 25)
+    )
+    db.add(nutrition)
+    db.flush()
+    
+    # Create recipe record
+    recipe = models.Recipe(
+        servings=recipe_data.get("servings", 4),
+        prep_time=recipe_data.get("prep_time", 15),
+        cook_time=recipe_data.get("cook_time", 20),
+        difficulty=recipe_data.get("difficulty", "Medium"),
+        instructions="\n".join(recipe_data.get("instructions", [])),
+        tips="\n".join(recipe_data.get("tips", [])) if recipe_data.get("tips") else None,
+        nutrition_id=nutrition.id
+    )
+    db.add(recipe)
+    db.flush()
+    
+    # Create meal
+    meal = models.Meal(
+        name=recipe_data.get("name", "New Meal"),
+        description=recipe_data.get("description", "A delicious meal"),
+        emoji=recipe_data.get("emoji", "🍽️"),
+        recipe_id=recipe.id
+    )
+    db.add(meal)
+    db.flush()
+    
+    # Create recipe ingredients
+    ingredients = []
+    recipe_ingredients_data = [i for i in recipe_data.get("ingredients", []) if isinstance(i, dict)]
+    ingredient_ids = resolve_ingredient_ids(db, [
+        (i.get("name") or "Unknown Ingredient", i.get("unit", "pieces")) for i in recipe_ingredients_data
+    ])
+    recipe_ingredient_rows = []
+    for ingredient_data in recipe_ingredients_data:
+        # Create recipe ingredient
+        recipe_ingredient_rows.append({
+            "recipe_id": recipe.id,
+            "ingredient_id": ingredient_ids[ingredient_data.get("name") or "Unknown Ingredient"],
+            "amount": ingredient_data.get("amount", 1),
+            "unit": ingredient_data.get("unit", "pieces"),
+            "notes": ingredient_data.get("notes")
+        })
+        
+        # Add to ingredients list for response
+        ingredients.append({
+            "name": ingredient_data.get("name"),
+            "amount": ingredient_data.get("amount", 1),
+            "unit": ingredient_data.get("unit", "pieces"),
+            "notes": ingredient_data.get("notes")
+        })
+    
+    # One statement instead of a flush per row; nothing needs their ids
+    if recipe_ingredient_rows:
+        db.execute(insert(models.RecipeIngredient), recipe_ingredient_rows)
+    
+    # Update daily meal
+    daily_meal = db.query(models.DailyMeal).filter(
+        models.DailyMeal.meal_plan_id == meal_plan_id,
+        models.DailyMeal.day_of_week == update.day_index % 7,  # Keep as 0-6 range
+        models.DailyMeal.meal_type == update.meal_type
+    ).first()
+    
+    old_recipe_id = None
+    if daily_meal:
+        if daily_meal.meal:
+            old_recipe_id = daily_meal.meal.recipe_id
+        daily_meal.meal_id = meal.id
+    else:
+        daily_meal = models.DailyMeal(
+            meal_plan_id=meal_plan_id,
+            day_of_week=update.day_index % 7,  # Keep as 0-6 range
+            meal_type=update.meal_type,
+            meal_id=meal.id
+        )
+        db.add(daily_meal)
+    
+    # Swap the old recipe's ingredients for the new one's on the shopping list
+    apply_shopping_delta(db, meal_plan_id, recipe_contributions(db, {recipe.id: 1, old_recipe_id: -1}))
+    db.execute(bump_revision(meal_plan_id))
+    
+    # Return the meal data in the same format as get_meal_details
+    return {
+        "name": meal.name,
+        "description": meal.description,
+        "emoji": meal.emoji,
+        "recipe": {
+            "servings": recipe.servings,
+            "prepTime": recipe.prep_time,
+            "cookTime": recipe.cook_time,
+            "difficulty": recipe.difficulty,
+            "instructions": recipe.instructions.split("\n") if recipe.instructions else [],
+            "ingredientDetails": ingredients,
+            "tips": recipe.tips.split("\n") if recipe.tips else [],
+            "nutrition": {
+                "calories": nutrition.calories,
+                "protein": nutrition.protein,
+                "carbs": nutrition.carbs,
+                "fat": nutrition.fat
+            }
+        }
+    }
+
 @router.put("/current/meals")
 async def update_meal_in_plan(
     update: schemas.MealUpdateRequest,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         # Get current meal plan
-        meal_plan = db.query(models.MealPlan).filter(
+        meal_plan = await db.scalar(select(models.MealPlan).where(
             models.MealPlan.user_id == current_user["user_id"]
-        ).order_by(models.MealPlan.created_at.desc()).first()
+        ).order_by(models.MealPlan.created_at.desc()).limit(1))
         
         if not meal_plan:
             raise HTTPException(status_code=404, detail="No active meal plan found")
         
         # Get user's language preference
-        user = db.query(models.User).filter(models.User.id == current_user["user_id"]).first()
-        user_language = user.language if user else "en"
+        user_language = await db.run_sync(get_user_language, current_user["user_id"])
         logger.info(f"Updating meal with language {user_language} for user {current_user['user_id']}")
         
+        # Don't hold a transaction open while the LLM is working
+        await db.commit()
+        
         # Generate new meal based on request
         meal_preferences = {
+            "meal_name": update.request,
             "meal_type": update.meal_type,
             "special_request": update.request,
             "generate_full_recipe": True  # Flag to tell the AI to generate full recipe details
         }
         
-        logger.debug(f"Generating recipe with preferences: {meal_preferences}")
-        recipe_data = openrouter_client.generate_recipe(meal_preferences, language=user_language)
-        logger.debug(f"Received recipe data: {recipe_data}")
+        logger.debug("Generating recipe with preferences: %s", meal_preferences)
+        recipe_data = await openrouter_client.generate_recipe(meal_preferences, language=user_language)
+        log_payload(logger, "Received recipe data", recipe_data)
         
         if not isinstance(recipe_data, dict):
             raise HTTPException(status_code=500, detail="Invalid recipe data received from AI")
         
-        # Create nutrition record
-        nutrition = models.Nutrition(
-            calories=recipe_data.get("nutrition", {}).get("calories", 500),
-            protein=recipe_data.get("nutrition", {}).get("protein", 20),
-            carbs=recipe_data.get("nutrition", {}).get("carbs", 50),
-            fat=recipe_data.get("nutrition", {}).get("fat", 25)
-        )
-        db.add(nutrition)
-        db.flush()
-        
-        # Create recipe record
-        recipe = models.Recipe(
-            servings=recipe_data.get("servings", 4),
-            prep_time=recipe_data.get("prep_time", 15),
-            cook_time=recipe_data.get("cook_time", 20),
-            difficulty=recipe_data.get("difficulty", "Medium"),
-            instructions="\n".join(recipe_data.get("instructions", [])),
-            tips="\n".join(recipe_data.get("tips", [])) if recipe_data.get("tips") else None,
-            nutrition_id=nutrition.id
-        )
-        db.add(recipe)
-        db.flush()
-        
-        # Create meal
-        meal = models.Meal(
-            name=recipe_data.get("name", "New Meal"),
-            description=recipe_data.get("description", "A delicious meal"),
-            emoji=recipe_data.get("emoji", "🍽️"),
-            recipe_id=recipe.id
-        )
-        db.add(meal)
-        db.flush()
-        
-        # Create recipe ingredients
-        ingredients = []
-        for ingredient_data in recipe_data.get("ingredients", []):
-            if not isinstance(ingredient_data, dict):
-                continue
-                
-            # Get or create ingredient
-            ingredient = db.query(models.Ingredient).filter(
-                models.Ingredient.name == ingredient_data.get("name")
-            ).first()
-            
-            if not ingredient:
-                ingredient = models.Ingredient(
-                    name=ingredient_data.get("name", "Unknown Ingredient"),
-                    default_unit=ingredient_data.get("unit", "pieces")
-                )
-                db.add(ingredient)
-                db.flush()
-            
-            # Create recipe ingredient
-            recipe_ingredient = models.RecipeIngredient(
-                recipe_id=recipe.id,
-                ingredient_id=ingredient.id,
-                amount=ingredient_data.get("amount", 1),
-                unit=ingredient_data.get("unit", "pieces"),
-                notes=ingredient_data.get("notes")
-            )
-            db.add(recipe_ingredient)
-            
-            # Add to ingredients list for response
-            ingredients.append({
-                "name": ingredient_data.get("name"),
-                "amount": ingredient_data.get("amount", 1),
-                "unit": ingredient_data.get("unit", "pieces"),
-                "notes": ingredient_data.get("notes")
-            })
-        
-        # Update daily meal
-        daily_meal = db.query(models.DailyMeal).filter(
-            models.DailyMeal.meal_plan_id == meal_plan.id,
-            models.DailyMeal.day_of_week == update.day_index % 7,  # Keep as 0-6 range
-            models.DailyMeal.meal_type == update.meal_type
-        ).first()
-        
-        if daily_meal:
-            daily_meal.meal_id = meal.id
-        else:
-            daily_meal = models.DailyMeal(
-                meal_plan_id=meal_plan.id,
-                day_of_week=update.day_index % 7,  # Keep as 0-6 range
-                meal_type=update.meal_type,
-                meal_id=meal.id
-            )
-            db.add(daily_meal)
-        
-        # Delete all existing shopping items before creating new ones
-        db.query(models.ShoppingItem).filter(
-            models.ShoppingItem.meal_plan_id == meal_plan.id
-        ).delete(synchronize_session=False)
-        db.flush()
-        
-        # Get all daily meals to collect all ingredients
-        all_daily_meals = db.query(models.DailyMeal).join(
-            models.Meal, models.DailyMeal.meal_id == models.Meal.id
-        ).join(
-            models.Recipe, models.Meal.recipe_id == models.Recipe.id
-        ).filter(
-            models.DailyMeal.meal_plan_id == meal_plan.id
-        ).all()
-        
-        all_ingredients = []
-        
-        # Collect ingredients from all meals
-        for dm in all_daily_meals:
-            if dm.meal and dm.meal.recipe:
-                current_recipe = dm.meal.recipe
-                recipe_ingredients = db.query(models.RecipeIngredient).filter(
-                    models.RecipeIngredient.recipe_id == current_recipe.id
-                ).all()
-                
-                # Add ingredients with their current amounts
-                for ri in recipe_ingredients:
-                    all_ingredients.append({
-                        "name": ri.ingredient.name,
-                        "amount": ri.amount,
-                        "unit": ri.unit
-                    })
-        
-        # Update shopping list items with all ingredients
-        if all_ingredients:
-            create_shopping_items(db, meal_plan.id, {"ingredients": all_ingredients})
-        
-        db.commit()
-        
-        # Return the meal data in the same format as get_meal_details
-        return {
-            "name": meal.name,
-            "description": meal.description,
-            "emoji": meal.emoji,
-            "recipe": {
-                "servings": recipe.servings,
-                "prepTime": recipe.prep_time,
-                "cookTime": recipe.cook_time,
-                "difficulty": recipe.difficulty,
-                "instructions": recipe.instructions.split("\n") if recipe.instructions else [],
-                "ingredientDetails": ingredients,
-                "tips": recipe.tips.split("\n") if recipe.tips else [],
-                "nutrition": {
-                    "calories": nutrition.calories,
-                    "protein": nutrition.protein,
-                    "carbs": nutrition.carbs,
-                    "fat": nutrition.fat
-                }
-            }
-        }
+        response = await db.run_sync(_store_replacement_meal, meal_plan.id, update, recipe_data)
+        await db.commit()
+        await invalidate_week_plan(current_user["user_id"], meal_plan.year, meal_plan.week_number)
+        return response
     except Exception as e:
         logger.error(f"Error updating meal: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+async def load_week_meal_plan(
+    db: AsyncSession, user_id, year: int, week_number: int, request: Optional[Request] = None
+) -> Tuple[str, Optional[dict]]:
+    """The rendered plan for a week with its ETag, from the week plan cache when possible.
+
+    Given the request, the plan is None when its If-None-Match already names the ETag.
+    """
+    # Plans only change on generate, meal replacement and servings updates, which invalidate this entry
+    cached = await get_cached_week_plan(user_id, year, week_number)
+    if cached is not None:
+        return cached["etag"], cached["plan"]
+
+    read_started = time.time()
+    loaded = await db.run_sync(_load_week_meal_plan, user_id, year, week_number, request)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="No meal plan found for the specified week")
+    etag, transformed_data = loaded
+    if transformed_data is None:
+        return etag, None
+    await cache_week_plan(user_id, year, week_number, {"etag": etag, "plan": transformed_data}, read_started)
+    return etag, transformed_data
+
 @router.get("/week/{year}/{week_number}")
 async def get_week_meal_plan(
     year: int,
     week_number: int,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get a meal plan for a specific week."""
+    """Get a meal plan for a specific week.
+
+    Answers 304 Not Modified when the client's If-None-Match still names the plan's ETag.
+    """
     # Validate week number
     if not 1 <= week_number <= 53:
         raise HTTPException(status_code=400, detail="Week number must be between 1 and 53")
 
+    etag, transformed_data = await load_week_meal_plan(db, current_user["user_id"], year, week_number, request)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    response.headers["ETag"] = etag
+    return transformed_data
+
+def _load_week_meal_plan(
+    db: Session, user_id, year: int, week_number: int, request: Optional[Request] = None
+) -> Optional[Tuple[str, Optional[dict]]]:
     # Get the meal plan for the specified week
     meal_plan = db.query(models.MealPlan).filter(
-        models.MealPlan.user_id == current_user["user_id"],
+        models.MealPlan.user_id == user_id,
         models.MealPlan.week_number == week_number,
         models.MealPlan.year == year
     ).first()
     
     if not meal_plan:
-        raise HTTPException(status_code=404, detail="No meal plan found for the specified week")
+        return None
     
-    # Get all daily meals for this plan
-    daily_meals = db.query(models.DailyMeal).filter(
-        models.DailyMeal.meal_plan_id == meal_plan.id
-    ).order_by(models.DailyMeal.day_of_week).all()
+    # The revision on the plan row is enough to answer a conditional request
+    etag = meal_plan_etag("plan", meal_plan)
+    if request is not None and etag_matches(request, etag):
+        return etag, None
     
+    daily_meals = _load_daily_meals(db, meal_plan.id)
+    return etag, render_week_meal_plan(year, week_number, daily_meals)
+
+def _load_daily_meals(db: Session, meal_plan_id: int) -> List[models.DailyMeal]:
+    # Get all daily meals for this plan with the whole meal graph in three queries:
+    # meals, recipes and nutrition are joined, recipe ingredients come in one batch
+    return db.query(models.DailyMeal).options(
+        joinedload(models.DailyMeal.meal).joinedload(models.Meal.recipe).joinedload(models.Recipe.nutrition),
+        joinedload(models.DailyMeal.meal).joinedload(models.Meal.recipe).selectinload(models.Recipe.ingredients).joinedload(models.RecipeIngredient.ingredient)
+    ).filter(
+        models.DailyMeal.meal_plan_id == meal_plan_id
+    ).order_by(models.DailyMeal.day_of_week).all()
+
+def render_week_meal_plan(year: int, week_number: int, daily_meals: List[models.DailyMeal]) -> dict:
+    """Build the week plan response from daily meals with their meal graph already loaded."""
     # Create the transformed data structure
     transformed_data = {
         "week_number": week_number,
@@ -696,88 +920,40 @@ async def get_week_meal_plan(
 
 @router.get("/current")
 async def get_current_meal_plan(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get the meal plan for the current week."""
     week_info = get_current_week_info()
-    return await get_week_meal_plan(week_info.year, week_info.week_number, current_user, db)
+    return await get_week_meal_plan(week_info.year, week_info.week_number, request, response, current_user, db)
 
 @router.delete("/reset", status_code=status.HTTP_204_NO_CONTENT)
 async def reset_meal_plans(
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete all meal plans and related data for the current user."""
     try:
         # Get all meal plans for the user
-        meal_plans = db.query(models.MealPlan).filter(
+        user_plans = (await db.execute(select(
+            models.MealPlan.id, models.MealPlan.year, models.MealPlan.week_number
+        ).where(
             models.MealPlan.user_id == current_user["user_id"]
-        ).all()
-
-        for meal_plan in meal_plans:
-            # First delete shopping items as they reference meal_plan_id
-            db.query(models.ShoppingItem).filter(
-                models.ShoppingItem.meal_plan_id == meal_plan.id
-            ).delete(synchronize_session=False)
-
-            # Get all daily meals to find related meals and recipes
-            daily_meals = db.query(models.DailyMeal).filter(
-                models.DailyMeal.meal_plan_id == meal_plan.id
-            ).all()
-
-            # Collect all meal, recipe and nutrition IDs to delete later
-            meal_ids = []
-            recipe_ids = []
-            nutrition_ids = []
-
-            # Collect all IDs first
-            for daily_meal in daily_meals:
-                if daily_meal.meal:
-                    meal_ids.append(daily_meal.meal_id)
-                    if daily_meal.meal.recipe:
-                        recipe_ids.append(daily_meal.meal.recipe.id)
-                        if daily_meal.meal.recipe.nutrition_id:
-                            nutrition_ids.append(daily_meal.meal.recipe.nutrition_id)
-
-            # Delete daily meals first (they reference meals)
-            db.query(models.DailyMeal).filter(
-                models.DailyMeal.meal_plan_id == meal_plan.id
-            ).delete(synchronize_session=False)
-
-            # Now safe to delete meals
-            for meal_id in meal_ids:
-                db.query(models.Meal).filter(
-                    models.Meal.id == meal_id
-                ).delete(synchronize_session=False)
-
-            # Now safe to delete recipe ingredients
-            for recipe_id in recipe_ids:
-                db.query(models.RecipeIngredient).filter(
-                    models.RecipeIngredient.recipe_id == recipe_id
-                ).delete(synchronize_session=False)
-
-            # Now safe to delete recipes
-            for recipe_id in recipe_ids:
-                db.query(models.Recipe).filter(
-                    models.Recipe.id == recipe_id
-                ).delete(synchronize_session=False)
-
-            # Finally safe to delete nutrition records
-            for nutrition_id in nutrition_ids:
-                db.query(models.Nutrition).filter(
-                    models.Nutrition.id == nutrition_id
-                ).delete(synchronize_session=False)
-
-            # Delete meal plan
-            db.delete(meal_plan)
-
-        db.commit()
+        ))).all()
+
+        # Delete them with their shopping items, meals, recipes and nutrition
+        await db.run_sync(delete_meal_plans, [meal_plan_id for meal_plan_id, _, _ in user_plans])
+
+        await db.commit()
+        for _, year, week_number in user_plans:
+            await invalidate_week_plan(current_user["user_id"], year, week_number)
         return None
 
     except Exception as e:
         logger.error(f"Error resetting meal plans: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to reset meal plans: {str(e)}"
@@ -791,222 +967,179 @@ class ServingsUpdateRequest(BaseModel):
 class BulkServingsUpdateRequest(BaseModel):
     servings: int
 
+def _update_meal_servings(db: Session, user_id, update: ServingsUpdateRequest) -> models.MealPlan:
+    """Scale one meal's recipe to the new servings and adjust the shopping list."""
+    # Get current week info
+    week_info = get_current_week_info()
+    
+    # Get current meal plan
+    meal_plan = db.query(models.MealPlan).filter(
+        models.MealPlan.user_id == user_id,
+        models.MealPlan.week_number == week_info.week_number,
+        models.MealPlan.year == week_info.year
+    ).first()
+    
+    if not meal_plan:
+        raise HTTPException(status_code=404, detail="Current meal plan not found")
+    
+    # Calculate day_of_week consistently
+    day_of_week = update.day_index % 7  # Convert to 0-6 range
+    logger.info(f"Looking for meal on day_of_week: {day_of_week}")
+    
+    # First, get and lock the daily meal
+    daily_meal = db.query(models.DailyMeal).with_for_update().filter(
+        models.DailyMeal.meal_plan_id == meal_plan.id,
+        models.DailyMeal.day_of_week == day_of_week,
+        models.DailyMeal.meal_type == update.meal_type
+    ).first()
+    
+    if not daily_meal:
+        logger.error(f"Meal not found for day {day_of_week} and type {update.meal_type}")
+        raise HTTPException(status_code=404, detail="Meal not found")
+    
+    # Then get and lock the meal
+    meal = db.query(models.Meal).with_for_update().filter(
+        models.Meal.id == daily_meal.meal_id
+    ).first()
+    
+    if not meal:
+        logger.error(f"Meal not found with id {daily_meal.meal_id}")
+        raise HTTPException(status_code=404, detail="Meal not found")
+    
+    # Finally get and lock the recipe
+    recipe = db.query(models.Recipe).with_for_update().filter(
+        models.Recipe.id == meal.recipe_id
+    ).first()
+    
+    if not recipe:
+        logger.error(f"Recipe not found for meal {meal.id}")
+        raise HTTPException(status_code=404, detail="Recipe not found")
+        
+    logger.info(f"Current recipe servings: {recipe.servings}")
+    logger.info(f"Updating to new servings: {update.servings}")
+    
+    # Store the original servings for ratio calculation
+    original_servings = recipe.servings
+    servings_ratio = update.servings / original_servings
+    
+    # Shopping list change is the recipe's current contribution scaled by the ratio
+    shopping_delta = recipe_contributions(db, {recipe.id: servings_ratio - 1})
+    
+    # Update the recipe servings
+    recipe.servings = update.servings
+    
+    # Get and update recipe ingredients
+    recipe_ingredients = db.query(models.RecipeIngredient).with_for_update().filter(
+        models.RecipeIngredient.recipe_id == recipe.id
+    ).all()
+    
+    # Update ingredient amounts
+    for ri in recipe_ingredients:
+        ri.amount = ri.amount * servings_ratio
+    
+    db.flush()
+    logger.info(f"Updated recipe servings to {recipe.servings}")
+    
+    apply_shopping_delta(db, meal_plan.id, shopping_delta)
+    db.execute(bump_revision(meal_plan.id))
+    return meal_plan
+
 @router.put("/current/servings")
 async def update_meal_servings(
     update: ServingsUpdateRequest,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update servings for a specific meal and recalculate shopping list."""
     try:
-        # Get current week info
-        week_info = get_current_week_info()
-        
-        # Get current meal plan
-        meal_plan = db.query(models.MealPlan).filter(
-            models.MealPlan.user_id == current_user["user_id"],
-            models.MealPlan.week_number == week_info.week_number,
-            models.MealPlan.year == week_info.year
-        ).first()
-        
-        if not meal_plan:
-            raise HTTPException(status_code=404, detail="Current meal plan not found")
-        
-        # Calculate day_of_week consistently
-        day_of_week = update.day_index % 7  # Convert to 0-6 range
-        logger.info(f"Looking for meal on day_of_week: {day_of_week}")
-        
-        # First, get and lock the daily meal
-        daily_meal = db.query(models.DailyMeal).with_for_update().filter(
-            models.DailyMeal.meal_plan_id == meal_plan.id,
-            models.DailyMeal.day_of_week == day_of_week,
-            models.DailyMeal.meal_type == update.meal_type
-        ).first()
-        
-        if not daily_meal:
-            logger.error(f"Meal not found for day {day_of_week} and type {update.meal_type}")
-            raise HTTPException(status_code=404, detail="Meal not found")
-        
-        # Then get and lock the meal
-        meal = db.query(models.Meal).with_for_update().filter(
-            models.Meal.id == daily_meal.meal_id
-        ).first()
-        
-        if not meal:
-            logger.error(f"Meal not found with id {daily_meal.meal_id}")
-            raise HTTPException(status_code=404, detail="Meal not found")
-        
-        # Finally get and lock the recipe
-        recipe = db.query(models.Recipe).with_for_update().filter(
-            models.Recipe.id == meal.recipe_id
-        ).first()
+        meal_plan = await db.run_sync(_update_meal_servings, current_user["user_id"], update)
+        await db.commit()
+        await invalidate_week_plan(current_user["user_id"], meal_plan.year, meal_plan.week_number)
+        return {"message": f"Servings updated successfully to {update.servings}"}
         
-        if not recipe:
-            logger.error(f"Recipe not found for meal {meal.id}")
-            raise HTTPException(status_code=404, detail="Recipe not found")
-            
-        logger.info(f"Current recipe servings: {recipe.servings}")
-        logger.info(f"Updating to new servings: {update.servings}")
+    except Exception as e:
+        logger.error(f"Error updating meal servings: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _update_all_meal_servings(db: Session, user_id, update: BulkServingsUpdateRequest) -> models.MealPlan:
+    """Scale every recipe of the current plan to the new servings and adjust the shopping list."""
+    # Get current week info
+    week_info = get_current_week_info()
+    
+    # Get current meal plan
+    meal_plan = db.query(models.MealPlan).filter(
+        models.MealPlan.user_id == user_id,
+        models.MealPlan.week_number == week_info.week_number,
+        models.MealPlan.year == week_info.year
+    ).first()
+    
+    if not meal_plan:
+        raise HTTPException(status_code=404, detail="Current meal plan not found")
+    
+    # Get all daily meals with their recipes
+    daily_meals = db.query(models.DailyMeal).with_for_update().filter(
+        models.DailyMeal.meal_plan_id == meal_plan.id
+    ).all()
+    
+    # Lock the meals and their recipes with one query each instead of two per meal
+    meal_ids = {daily_meal.meal_id for daily_meal in daily_meals if daily_meal.meal_id}
+    meals = db.query(models.Meal).with_for_update().filter(
+        models.Meal.id.in_(meal_ids)
+    ).all() if meal_ids else []
+    recipe_ids = {meal.recipe_id for meal in meals if meal.recipe_id}
+    recipes = db.query(models.Recipe).with_for_update().filter(
+        models.Recipe.id.in_(recipe_ids)
+    ).all() if recipe_ids else []
+    
+    recipe_factors = {}
+    
+    # Update servings for each recipe
+    for recipe in recipes:
+        logger.info(f"Updating recipe {recipe.id} servings from {recipe.servings} to {update.servings}")
         
-        # Store the original servings for ratio calculation
+        # Store original servings for ratio calculation
         original_servings = recipe.servings
         servings_ratio = update.servings / original_servings
+        recipe_factors[recipe.id] = servings_ratio - 1
         
-        # Update the recipe servings
+        # Update recipe servings
         recipe.servings = update.servings
-        
-        # Get and update recipe ingredients
-        recipe_ingredients = db.query(models.RecipeIngredient).with_for_update().filter(
-            models.RecipeIngredient.recipe_id == recipe.id
-        ).all()
-        
-        # Update ingredient amounts
-        for ri in recipe_ingredients:
-            ri.amount = ri.amount * servings_ratio
-        
-        db.flush()
-        logger.info(f"Updated recipe servings to {recipe.servings}")
-        
-        # Get all daily meals to preserve other meals' ingredients
-        all_daily_meals = db.query(models.DailyMeal).join(
-            models.Meal, models.DailyMeal.meal_id == models.Meal.id
-        ).join(
-            models.Recipe, models.Meal.recipe_id == models.Recipe.id
-        ).filter(
-            models.DailyMeal.meal_plan_id == meal_plan.id
-        ).all()
-        
-        all_ingredients = []
-        
-        # Collect ingredients from all meals
-        for dm in all_daily_meals:
-            if dm.meal and dm.meal.recipe:
-                current_recipe = dm.meal.recipe
-                recipe_ingredients = db.query(models.RecipeIngredient).filter(
-                    models.RecipeIngredient.recipe_id == current_recipe.id
-                ).all()
-                
-                # Add ingredients with their current amounts (already updated if this is the changed meal)
-                for ri in recipe_ingredients:
-                    all_ingredients.append({
-                        "name": ri.ingredient.name,
-                        "amount": ri.amount,
-                        "unit": ri.unit
-                    })
-        
-        # Delete all existing shopping items before creating new ones
-        db.query(models.ShoppingItem).filter(
-            models.ShoppingItem.meal_plan_id == meal_plan.id
-        ).delete(synchronize_session=False)
-        db.flush()
-        
-        # Update shopping list items with all ingredients
-        if all_ingredients:
-            create_shopping_items(db, meal_plan.id, {"ingredients": all_ingredients})
-        
-        db.commit()
-        
-        # Verify the update after commit
-        updated_recipe = db.query(models.Recipe).filter(
-            models.Recipe.id == recipe.id
-        ).first()
-        logger.info(f"Final verification - Recipe servings after commit: {updated_recipe.servings}")
-        
-        return {"message": f"Servings updated successfully to {update.servings}"}
-        
-    except Exception as e:
-        logger.error(f"Error updating meal servings: {str(e)}")
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    # Shopping list change, computed from the amounts before scaling
+    shopping_delta = recipe_contributions(db, recipe_factors)
+    
+    # Scale the ingredients with one statement per distinct factor; recipes
+    # usually share their servings, so this is mostly a single statement
+    recipes_by_factor = {}
+    for recipe_id, factor in recipe_factors.items():
+        recipes_by_factor.setdefault(factor, []).append(recipe_id)
+    for factor, factor_recipe_ids in recipes_by_factor.items():
+        db.query(models.RecipeIngredient).filter(
+            models.RecipeIngredient.recipe_id.in_(factor_recipe_ids)
+        ).update({
+            models.RecipeIngredient.amount: models.RecipeIngredient.amount * (factor + 1)
+        }, synchronize_session=False)
+    db.flush()
+    
+    apply_shopping_delta(db, meal_plan.id, shopping_delta)
+    db.execute(bump_revision(meal_plan.id))
+    return meal_plan
 
 @router.put("/current/servings/bulk")
 async def update_all_meal_servings(
     update: BulkServingsUpdateRequest,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update servings for all meals in the current plan."""
     try:
-        # Get current week info
-        week_info = get_current_week_info()
-        
-        # Get current meal plan
-        meal_plan = db.query(models.MealPlan).filter(
-            models.MealPlan.user_id == current_user["user_id"],
-            models.MealPlan.week_number == week_info.week_number,
-            models.MealPlan.year == week_info.year
-        ).first()
-        
-        if not meal_plan:
-            raise HTTPException(status_code=404, detail="Current meal plan not found")
-        
-        # Get all daily meals with their recipes
-        daily_meals = db.query(models.DailyMeal).with_for_update().filter(
-            models.DailyMeal.meal_plan_id == meal_plan.id
-        ).all()
-        
-        all_ingredients = []
-        
-        # Update servings for each meal and collect ingredients
-        for daily_meal in daily_meals:
-            if not daily_meal.meal:
-                continue
-                
-            # Get and lock the meal
-            meal = db.query(models.Meal).with_for_update().filter(
-                models.Meal.id == daily_meal.meal_id
-            ).first()
-            
-            if not meal or not meal.recipe:
-                continue
-                
-            # Get and lock the recipe
-            recipe = db.query(models.Recipe).with_for_update().filter(
-                models.Recipe.id == meal.recipe_id
-            ).first()
-            
-            if not recipe:
-                continue
-                
-            logger.info(f"Updating recipe {recipe.id} servings from {recipe.servings} to {update.servings}")
-            
-            # Store original servings for ratio calculation
-            original_servings = recipe.servings
-            servings_ratio = update.servings / original_servings
-            
-            # Update recipe servings
-            recipe.servings = update.servings
-            
-            # Get and update recipe ingredients
-            recipe_ingredients = db.query(models.RecipeIngredient).with_for_update().filter(
-                models.RecipeIngredient.recipe_id == recipe.id
-            ).all()
-            
-            # Update ingredient amounts and collect for shopping list
-            for ri in recipe_ingredients:
-                # Update the ingredient amount in the database
-                ri.amount = ri.amount * servings_ratio
-                
-                all_ingredients.append({
-                    "name": ri.ingredient.name,
-                    "amount": ri.amount,
-                    "unit": ri.unit
-                })
-        
-        # Delete all existing shopping items before creating new ones
-        db.query(models.ShoppingItem).filter(
-            models.ShoppingItem.meal_plan_id == meal_plan.id
-        ).delete(synchronize_session=False)
-        db.flush()
-        
-        # Update shopping list items with all ingredients
-        if all_ingredients:
-            create_shopping_items(db, meal_plan.id, {"ingredients": all_ingredients})
-        
-        db.commit()
+        meal_plan = await db.run_sync(_update_all_meal_servings, current_user["user_id"], update)
+        await db.commit()
+        await invalidate_week_plan(current_user["user_id"], meal_plan.year, meal_plan.week_number)
         return {"message": "All servings updated successfully"}
         
     except Exception as e:
         logger.error(f"Error updating all meal servings: {str(e)}")
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
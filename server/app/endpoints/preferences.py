@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import json
 
 from .. import models, security, schemas
@@ -10,11 +11,11 @@ router = APIRouter(prefix="/preferences", tags=["preferences"])
 @router.get("", response_model=schemas.UserPreferencesUpdate)
 async def get_preferences(
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    preferences = db.query(models.UserPreference).filter(
+    preferences = await db.scalar(select(models.UserPreference).where(
         models.UserPreference.user_id == current_user["user_id"]
-    ).first()
+    ))
     
     if not preferences:
         # Return default preferences
@@ -38,12 +39,12 @@ async def get_preferences(
 async def update_preferences(
     preferences: schemas.UserPreferencesUpdate,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     user_id = current_user["user_id"]
-    db_preferences = db.query(models.UserPreference).filter(
+    db_preferences = await db.scalar(select(models.UserPreference).where(
         models.UserPreference.user_id == user_id
-    ).first()
+    ))
     
     if not db_preferences:
         db_preferences = models.UserPreference(
@@ -54,5 +55,5 @@ async def update_preferences(
     else:
         db_preferences.preferences = json.dumps(preferences.dict())
     
-    db.commit()
+    await db.commit()
     return {"message": "Preferences updated successfully"} 
\ No newline at end of file
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from .. import models, security, schemas
@@ -10,9 +11,9 @@ router = APIRouter(prefix="/users", tags=["users"])
 @router.get("/profile", response_model=schemas.UserProfileResponse)
 async def get_profile(
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(models.User).filter(models.User.id == current_user["user_id"]).first()
+    user = await db.get(models.User, current_user["user_id"])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -21,9 +22,9 @@ async def get_profile(
 async def update_profile(
     profile_update: schemas.UserProfileUpdate,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(models.User).filter(models.User.id == current_user["user_id"]).first()
+    user = await db.get(models.User, current_user["user_id"])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -34,14 +35,15 @@ async def update_profile(
         user.language = profile_update.language
     if profile_update.email is not None:
         # Check if email is already taken by another user
-        existing_user = db.query(models.User).filter(
+        existing_user = await db.scalar(select(models.User).where(
             models.User.email == profile_update.email,
             models.User.id != user.id
-        ).first()
+        ))
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         user.email = profile_update.email
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    security.invalidate_user_cache(user.id)
+    await db.refresh(user)
     return user 
\ No newline at end of file
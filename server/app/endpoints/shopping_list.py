@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
 from datetime import date
@@ -8,6 +9,8 @@ import logging
 
 from .. import models, security
 from ..database import get_db
+from ..etag import bump_revision, meal_plan_etag, not_modified
+from ..plan_cache import invalidate_week_plan
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -27,28 +30,35 @@ def get_week_info(week_number: Optional[int] = None, year: Optional[int] = None)
 
 @router.get("/current")
 async def get_current_shopping_list(
+    request: Request,
+    response: Response,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get shopping list for current week."""
     week_number, year = get_week_info()
-    return await get_week_shopping_list(week_number, year, current_user, db)
+    return await get_week_shopping_list(week_number, year, request, response, current_user, db)
 
 @router.get("/week/{year}/{week_number}")
 async def get_week_shopping_list(
     week_number: int,
     year: int,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get shopping list for a specific week."""
+    """Get shopping list for a specific week.
+
+    Answers 304 Not Modified when the client's If-None-Match still names the list's ETag.
+    """
     logger.info(f"Getting shopping list for week {week_number}, year {year}, user {current_user['user_id']}")
     
-    meal_plan = db.query(models.MealPlan).filter(
+    meal_plan = await db.scalar(select(models.MealPlan).where(
         models.MealPlan.user_id == current_user["user_id"],
         models.MealPlan.week_number == week_number,
         models.MealPlan.year == year
-    ).first()
+    ))
     
     if not meal_plan:
         logger.info(f"No meal plan found for week {week_number}, year {year}")
@@ -56,9 +66,16 @@ async def get_week_shopping_list(
     
     logger.info(f"Found meal plan with ID {meal_plan.id}")
     
-    shopping_items = db.query(models.ShoppingItem).filter(
+    # The plan's revision moves with every change to its shopping items
+    etag = meal_plan_etag("shopping", meal_plan)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    response.headers["ETag"] = etag
+    
+    shopping_items = (await db.scalars(select(models.ShoppingItem).where(
         models.ShoppingItem.meal_plan_id == meal_plan.id
-    ).all()
+    ))).all()
 
     logger.info(f"Found {len(shopping_items)} shopping items")
 
@@ -75,7 +92,7 @@ async def get_week_shopping_list(
                 "category": item.category,
                 "bought": item.bought
             })
-            logger.debug(f"Added shopping item: {response_items[-1]}")
+            logger.debug("Added shopping item: %s", response_items[-1])
         else:
             logger.warning(f"Shopping item {item.id} has no ingredient")
     
@@ -87,23 +104,29 @@ async def update_shopping_item(
     item_id: int,
     update: ShoppingItemUpdate,
     current_user: dict = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a shopping item's bought status."""
-    # Get the shopping item
-    shopping_item = db.query(models.ShoppingItem).join(
+    # Get the shopping item, with the week of its plan for the cache invalidation
+    row = (await db.execute(select(
+        models.ShoppingItem, models.MealPlan.year, models.MealPlan.week_number
+    ).join(
         models.MealPlan
-    ).filter(
+    ).where(
         models.ShoppingItem.id == item_id,
         models.MealPlan.user_id == current_user["user_id"]
-    ).first()
+    ))).first()
     
-    if not shopping_item:
+    if not row:
         raise HTTPException(status_code=404, detail="Shopping item not found")
+    shopping_item, year, week_number = row
     
     # Update the bought status
     shopping_item.bought = update.bought
-    db.commit()
+    await db.execute(bump_revision(shopping_item.meal_plan_id))
+    await db.commit()
+    # The cached plan carries the ETag of the revision just replaced
+    await invalidate_week_plan(current_user["user_id"], year, week_number)
     
     return {
         "id": shopping_item.id,
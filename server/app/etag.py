@@ -0,0 +1,53 @@
+"""
+ETags for conditional GETs.
+
+Meal plans carry a revision counter that every write to the plan or its
+shopping list bumps, so a plan's ETag is known without rendering it.
+"""
+from datetime import timezone
+from typing import Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import update
+
+from . import models
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag from version parts, e.g. make_etag("plan", 12, 3)."""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def meal_plan_etag(kind: str, meal_plan: models.MealPlan) -> str:
+    # The creation time tells apart plans that reuse the id of a deleted one (SQLite does that).
+    # It is stored as naive UTC; read it as UTC so the tag does not depend on the host's timezone.
+    created = int(meal_plan.created_at.replace(tzinfo=timezone.utc).timestamp()) if meal_plan.created_at else 0
+    return make_etag(kind, meal_plan.id, meal_plan.revision, created)
+
+
+def bump_revision(meal_plan_id: int):
+    """Statement moving a meal plan to its next revision; execute it with every change to the plan."""
+    return (
+        update(models.MealPlan)
+        .where(models.MealPlan.id == meal_plan_id)
+        .values(revision=models.MealPlan.revision + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match names ``etag``, compared weakly."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response when the client already has ``etag``, otherwise None."""
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
@@ -0,0 +1,112 @@
+import logging
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+INGREDIENT_CACHE_SIZE = int(os.getenv("INGREDIENT_CACHE_SIZE", "10000"))
+
+# Ingredient rows are never deleted, so a committed name -> id mapping stays valid
+ingredient_id_cache = LRUCache(INGREDIENT_CACHE_SIZE)
+
+# Ids of ingredients created by a session's open transaction; cached only once it commits
+_PENDING_KEY = "pending_ingredient_ids"
+
+_UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def resolve_ingredient_ids(db: Session, ingredients: Iterable[Tuple[str, Optional[str]]]) -> Dict[str, int]:
+    """Map ingredient names to ids, creating the missing ingredients in one batch.
+
+    ``ingredients`` are (name, unit) pairs; the unit becomes the default unit of
+    newly created ingredients. Names found in the in-process cache cost no
+    query, nor do names this session created earlier in its transaction. The rest
+    are looked up and upserted with a constant number of statements.
+    """
+    default_units = {}
+    for name, unit in ingredients:
+        if name and name not in default_units:
+            default_units[name] = unit or "pieces"
+
+    pending = db.info.get(_PENDING_KEY, {})
+    ids = {}
+    missing = []
+    for name in default_units:
+        ingredient_id = pending.get(name) or ingredient_id_cache.get(name)
+        if ingredient_id is None:
+            missing.append(name)
+        else:
+            ids[name] = ingredient_id
+
+    if not missing:
+        return ids
+
+    for ingredient_id, name in db.execute(
+        select(models.Ingredient.id, models.Ingredient.name).where(models.Ingredient.name.in_(missing))
+    ):
+        ids[name] = ingredient_id
+        ingredient_id_cache.set(name, ingredient_id)
+
+    to_create = [name for name in missing if name not in ids]
+    if to_create:
+        created = _insert_ingredients(db, [
+            {"name": name, "default_unit": default_units[name]} for name in to_create
+        ])
+        ids.update(created)
+        db.info.setdefault(_PENDING_KEY, {}).update(created)
+
+        # Another transaction created these between our lookup and insert
+        raced = [name for name in to_create if name not in created]
+        if raced:
+            for ingredient_id, name in db.execute(
+                select(models.Ingredient.id, models.Ingredient.name).where(models.Ingredient.name.in_(raced))
+            ):
+                ids[name] = ingredient_id
+                ingredient_id_cache.set(name, ingredient_id)
+
+        logger.debug("Created %s new ingredients", len(created))
+
+    return ids
+
+
+def _insert_ingredients(db: Session, rows: list) -> Dict[str, int]:
+    """Insert ingredient rows, skipping names that already exist. Returns the created ids."""
+    dialect_insert = _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if dialect_insert is None:
+        # Generic fallback for databases without INSERT ... ON CONFLICT
+        created = {}
+        for row in rows:
+            ingredient = models.Ingredient(**row)
+            db.add(ingredient)
+            db.flush()
+            created[ingredient.name] = ingredient.id
+        return created
+
+    statement = dialect_insert(models.Ingredient).values(rows).on_conflict_do_nothing(
+        index_elements=["name"]
+    ).returning(models.Ingredient.id, models.Ingredient.name)
+    return {name: ingredient_id for ingredient_id, name in db.execute(statement)}
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed_ingredients(session: Session):
+    for name, ingredient_id in session.info.pop(_PENDING_KEY, {}).items():
+        ingredient_id_cache.set(name, ingredient_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_ingredients(session: Session):
+    session.info.pop(_PENDING_KEY, None)
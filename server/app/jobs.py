@@ -0,0 +1,248 @@
+"""
+Background generation of meal plans.
+
+Jobs are rows in the meal_plan_jobs table. Workers claim pending jobs with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers in any number of
+processes can share the queue without handing the same job out twice.
+Workers run inside the API process (MEAL_PLAN_WORKERS) or standalone with
+``python -m app.jobs [worker_count]``.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, or_
+
+from . import models, schemas
+from .database import SessionLocal
+from .endpoints import meal_plans
+from .plan_cache import invalidate_week_plan
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+MEAL_PLAN_WORKERS = int(os.getenv("MEAL_PLAN_WORKERS", "2"))
+MEAL_PLAN_JOB_POLL_INTERVAL = float(os.getenv("MEAL_PLAN_JOB_POLL_INTERVAL", "2"))
+# A running job whose worker has not reported progress for this long is handed out again
+MEAL_PLAN_JOB_STALE_SECONDS = int(os.getenv("MEAL_PLAN_JOB_STALE_SECONDS", "600"))
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+_worker_tasks: List[asyncio.Task] = []
+_stop_event: Optional[asyncio.Event] = None
+
+
+def claim_next_job(worker_id: str) -> Optional[Dict]:
+    """Claim the oldest runnable job and mark it as running.
+
+    Returns the job's parameters, or None when the queue is empty.
+    """
+    with SessionLocal() as db:
+        stale_before = datetime.utcnow() - timedelta(seconds=MEAL_PLAN_JOB_STALE_SECONDS)
+        job = db.query(models.MealPlanJob).filter(
+            or_(
+                models.MealPlanJob.status == JOB_PENDING,
+                and_(
+                    models.MealPlanJob.status == JOB_RUNNING,
+                    models.MealPlanJob.heartbeat_at < stale_before
+                )
+            )
+        ).order_by(
+            models.MealPlanJob.created_at
+        ).with_for_update(skip_locked=True).first()
+
+        if not job:
+            db.rollback()
+            return None
+
+        # Compare-and-set on top of the row lock, so databases without
+        # SKIP LOCKED support still never hand the same job to two workers
+        now = datetime.utcnow()
+        claimed_rows = db.query(models.MealPlanJob).filter(
+            models.MealPlanJob.id == job.id,
+            models.MealPlanJob.status == job.status,
+            models.MealPlanJob.heartbeat_at.is_(None) if job.heartbeat_at is None
+            else models.MealPlanJob.heartbeat_at == job.heartbeat_at
+        ).update({
+            "status": JOB_RUNNING,
+            "worker_id": worker_id,
+            "attempts": (job.attempts or 0) + 1,
+            "progress": 0,
+            "started_at": now,
+            "heartbeat_at": now
+        }, synchronize_session=False)
+        if claimed_rows != 1:
+            db.rollback()
+            return None
+
+        claimed = {
+            "id": job.id,
+            "user_id": job.user_id,
+            "week_info": schemas.WeekInfo(week_number=job.week_number, year=job.year),
+            "preferences": json.loads(job.preferences) if job.preferences else {},
+        }
+        db.commit()
+        return claimed
+
+
+def _update_progress(job_id: int, worker_id: str, progress: int, total: int):
+    with SessionLocal() as db:
+        # Recipes finish concurrently, so never move progress backwards
+        db.query(models.MealPlanJob).filter(
+            models.MealPlanJob.id == job_id,
+            models.MealPlanJob.worker_id == worker_id,
+            or_(models.MealPlanJob.progress.is_(None), models.MealPlanJob.progress < progress)
+        ).update({
+            "progress": progress,
+            "total": total,
+            "heartbeat_at": datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+
+
+def _get_language(user_id: int) -> str:
+    with SessionLocal() as db:
+        return meal_plans.get_user_language(db, user_id)
+
+
+def _complete_job(job: Dict, worker_id: str, meal_plan_data: Dict) -> bool:
+    """Save the generated plan and mark the job completed.
+
+    Returns False without saving anything when the job is no longer this
+    worker's, e.g. because it went stale and another worker claimed it.
+    """
+    with SessionLocal() as db:
+        try:
+            # Take the job first; the row stays locked until the plan is committed
+            completed_rows = db.query(models.MealPlanJob).filter(
+                models.MealPlanJob.id == job["id"],
+                models.MealPlanJob.worker_id == worker_id,
+                models.MealPlanJob.status == JOB_RUNNING
+            ).update({
+                "status": JOB_COMPLETED,
+                "progress": models.MealPlanJob.total,
+                "finished_at": datetime.utcnow()
+            }, synchronize_session=False)
+            if completed_rows != 1:
+                db.rollback()
+                return False
+
+            new_meal_plan = meal_plans.save_meal_plan(db, job["user_id"], job["week_info"], meal_plan_data)
+            db.query(models.MealPlanJob).filter(
+                models.MealPlanJob.id == job["id"]
+            ).update({"meal_plan_id": new_meal_plan.id}, synchronize_session=False)
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            raise
+
+
+def _fail_job(job_id: int, worker_id: str, error: str):
+    with SessionLocal() as db:
+        db.query(models.MealPlanJob).filter(
+            models.MealPlanJob.id == job_id,
+            models.MealPlanJob.worker_id == worker_id
+        ).update({
+            "status": JOB_FAILED,
+            "error": error,
+            "finished_at": datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+
+
+async def process_job(job: Dict, worker_id: str):
+    """Run the generation pipeline for a claimed job.
+
+    No database transaction is held while the LLM is working; progress and
+    the final plan are written in short transactions of their own.
+    """
+    logger.info(f"Worker {worker_id} processing meal plan job {job['id']}")
+
+    async def report_progress(completed: int, total: int):
+        await asyncio.to_thread(_update_progress, job["id"], worker_id, completed, total)
+
+    try:
+        language = await asyncio.to_thread(_get_language, job["user_id"])
+        meal_plan_data = await meal_plans.openrouter_client.generate_meal_plan(
+            job["preferences"],
+            language=language,
+            progress_callback=report_progress
+        )
+        if not await asyncio.to_thread(_complete_job, job, worker_id, meal_plan_data):
+            logger.warning(f"Meal plan job {job['id']} was taken over by another worker, discarding its plan")
+            return
+        await invalidate_week_plan(job["user_id"], job["week_info"].year, job["week_info"].week_number)
+        logger.info(f"Meal plan job {job['id']} completed")
+    except Exception as e:
+        logger.error(f"Meal plan job {job['id']} failed: {str(e)}")
+        await asyncio.to_thread(_fail_job, job["id"], worker_id, str(e))
+
+
+async def worker_loop(worker_id: str, stop_event: asyncio.Event):
+    logger.info(f"Meal plan worker {worker_id} started")
+    while not stop_event.is_set():
+        try:
+            job = await asyncio.to_thread(claim_next_job, worker_id)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} could not claim a job: {str(e)}")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=MEAL_PLAN_JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await process_job(job, worker_id)
+    logger.info(f"Meal plan worker {worker_id} stopped")
+
+
+def start_workers(count: int = MEAL_PLAN_WORKERS):
+    """Start ``count`` worker tasks on the running event loop."""
+    global _stop_event
+    if count <= 0:
+        logger.info("Meal plan workers disabled")
+        return
+    _stop_event = asyncio.Event()
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    for _ in range(count):
+        worker_id = f"{prefix}-{uuid.uuid4().hex[:8]}"
+        _worker_tasks.append(asyncio.create_task(worker_loop(worker_id, _stop_event)))
+
+
+async def stop_workers():
+    """Stop the worker tasks. Jobs that are interrupted are picked up again once stale."""
+    if _stop_event is not None:
+        _stop_event.set()
+    for task in _worker_tasks:
+        task.cancel()
+    await asyncio.gather(*_worker_tasks, return_exceptions=True)
+    _worker_tasks.clear()
+
+
+async def _run_standalone(count: int):
+    start_workers(count)
+    try:
+        await asyncio.gather(*_worker_tasks)
+    finally:
+        await meal_plans.openrouter_client.aclose()
+
+
+if __name__ == "__main__":
+    from .logging_config import setup_logging
+
+    setup_logging()
+    asyncio.run(_run_standalone(int(sys.argv[1]) if len(sys.argv) > 1 else max(MEAL_PLAN_WORKERS, 1)))
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Relative to the server directory unless set, so the file does not follow the working directory
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "llm_cache.sqlite3")
+)
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Expired entries are swept, and the size total recounted, at most this often unless the cache is full
+LLM_CACHE_EVICT_INTERVAL_SECONDS = int(os.getenv("LLM_CACHE_EVICT_INTERVAL_SECONDS", "60"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share a cache entry."""
+    return re.sub(r"\s+", " ", prompt).strip().lower()
+
+
+def make_cache_key(prompt: str, language: str, model: str, schema: Dict) -> str:
+    """Build a content-addressed key from everything that determines a completion."""
+    payload = json.dumps(
+        {
+            "prompt": normalize_prompt(prompt),
+            "language": language,
+            "model": model,
+            "schema": schema,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed cache of raw completion contents with TTL and size-based LRU eviction.
+
+    The database file can be shared by several worker processes on the same host.
+    Each process keeps a running estimate of the cache size, so writes do not scan
+    the table; the periodic sweep recounts it, picking up the other processes' writes.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES, evict_interval_seconds: int = LLM_CACHE_EVICT_INTERVAL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evict_interval_seconds = evict_interval_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, "
+            "value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        self._swept_at = time.time()
+        logger.info(f"LLM response cache at {path} (ttl={ttl_seconds}s, max_bytes={max_bytes})")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            # A replaced entry is counted twice until the next sweep, which errs towards evicting early
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes or now - self._swept_at >= self.evict_interval_seconds:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        self._swept_at = now
+        expired = self._conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        self.evictions += expired
+
+        total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        self._total_bytes = total_bytes
+        if total_bytes <= self.max_bytes:
+            return
+
+        # Drop least recently used entries until the cache is back under 90% of
+        # its size, so the writes right after this one do not sweep again
+        target_bytes = self.max_bytes * 0.9
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY accessed_at"
+        ).fetchall():
+            if total_bytes <= target_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total_bytes -= size
+            self.evictions += 1
+        self._total_bytes = total_bytes
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str):
+        await asyncio.to_thread(self.set, key, value)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._total_bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Return the process-wide cache, or None when LLM_CACHE_ENABLED is off."""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache()
+        return _llm_cache
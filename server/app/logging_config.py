@@ -1,36 +1,114 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Level of the root logger; records below it are dropped before any formatting
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_CONSOLE_LEVEL = os.getenv("LOG_CONSOLE_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "app.log")  # empty disables the file log
+LOG_FILE_LEVEL = os.getenv("LOG_FILE_LEVEL", "DEBUG").upper()
+# Per-logger overrides, e.g. "app.openrouter_client=DEBUG,sqlalchemy.engine=INFO"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# Share of debug payload logs (LLM responses, parsed plans) actually written, and their maximum length
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+
+DEFAULT_LOGGER_LEVELS = {
+    "sqlalchemy.engine": "WARNING",
+    "urllib3": "WARNING",
+    # httpx logs every OpenRouter request at INFO
+    "httpx": "WARNING",
+    "httpcore": "WARNING",
+}
+
+_listener: Optional[QueueListener] = None
+
+
+def parse_logger_levels(value: str) -> Dict[str, str]:
+    levels = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
 
 def setup_logging():
-    
+    """Route all records through a queue to the console and file handlers.
+
+    Callers only put records on the queue; a listener thread does the
+    writing, so a slow disk never blocks the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
     file_formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     console_formatter = logging.Formatter(
         '%(levelname)s - %(message)s'
     )
-    
-    
-    file_handler = RotatingFileHandler(
-        'app.log',
-        maxBytes=10485760,  
-        backupCount=5
-    )
-    file_handler.setFormatter(file_formatter)
-    file_handler.setLevel(logging.DEBUG)
-    
-    
+
+    handlers = []
+    if LOG_FILE:
+        file_handler = RotatingFileHandler(
+            LOG_FILE,
+            maxBytes=10485760,
+            backupCount=5
+        )
+        file_handler.setFormatter(file_formatter)
+        file_handler.setLevel(LOG_FILE_LEVEL)
+        handlers.append(file_handler)
+
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(console_formatter)
-    console_handler.setLevel(logging.INFO)
-    
-    
+    console_handler.setLevel(LOG_CONSOLE_LEVEL)
+    handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
-    
-    
-    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
-    logging.getLogger("urllib3").setLevel(logging.WARNING) 
\ No newline at end of file
+    root_logger.setLevel(LOG_LEVEL)
+    root_logger.addHandler(QueueHandler(log_queue))
+
+    for name, level in {**DEFAULT_LOGGER_LEVELS, **parse_logger_levels(LOG_LEVELS)}.items():
+        logging.getLogger(name).setLevel(level)
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_payload(logger: logging.Logger, label: str, payload: Any, level: int = logging.DEBUG):
+    """Log a large payload as compact, truncated JSON.
+
+    Nothing is serialized unless ``level`` is enabled for the logger, and
+    only a LOG_PAYLOAD_SAMPLE_RATE share of the calls is logged at all.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if LOG_PAYLOAD_SAMPLE_RATE < 1 and random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, default=str, ensure_ascii=False)
+    if len(text) > LOG_PAYLOAD_MAX_CHARS:
+        text = f"{text[:LOG_PAYLOAD_MAX_CHARS]}... ({len(text)} chars)"
+    logger.log(level, "%s: %s", label, text)
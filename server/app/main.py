@@ -1,9 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import os
-from . import models
-from .database import engine
+from . import models, jobs, maintenance, metrics, query_budget
+from .database import async_engine, engine
 from .endpoints import auth, preferences, ingredients, recipes, meal_plans, shopping_list, profile
 from .logging_config import setup_logging
 import uvicorn
@@ -11,6 +11,9 @@ import uvicorn
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# Serve Prometheus metrics at /metrics; keep the path away from the public internet
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
 models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="AI Meal Planner API")
@@ -24,6 +27,22 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+if METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(async_engine.sync_engine)
+    app.middleware("http")(metrics.metrics_middleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        content, content_type = metrics.render_metrics()
+        return Response(content=content, headers={"Content-Type": content_type})
+
+# Statements are only recorded inside a query_budget block or the middleware
+query_budget.instrument_engine(engine)
+query_budget.instrument_engine(async_engine.sync_engine)
+if query_budget.QUERY_BUDGET_MODE != "off":
+    app.middleware("http")(query_budget.query_budget_middleware)
+
 app.include_router(auth.router, prefix="/api")
 app.include_router(preferences.router, prefix="/api/users")
 app.include_router(ingredients.router, prefix="/api")
@@ -32,6 +51,31 @@ app.include_router(meal_plans.router, prefix="/api")
 app.include_router(shopping_list.router, prefix="/api")
 app.include_router(profile.router, prefix="/api")
 
+@app.on_event("startup")
+async def start_meal_plan_workers():
+    jobs.start_workers()
+
+@app.on_event("startup")
+async def start_maintenance_scheduler():
+    maintenance.start_scheduler()
+
+@app.on_event("shutdown")
+async def stop_meal_plan_workers():
+    await jobs.stop_workers()
+
+@app.on_event("shutdown")
+async def stop_maintenance_scheduler():
+    await maintenance.stop_scheduler()
+
+@app.on_event("shutdown")
+async def close_openrouter_clients():
+    await meal_plans.openrouter_client.aclose()
+    await recipes.openrouter_client.aclose()
+
+@app.on_event("shutdown")
+async def close_database_connections():
+    await async_engine.dispose()
+
 logger.info("Application startup complete")
 
 if __name__ == "__main__":
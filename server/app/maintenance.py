@@ -0,0 +1,269 @@
+"""
+Database maintenance tasks.
+
+``gc`` removes meal graphs that no plan references any more, such as the
+meal, recipe, recipe ingredients and nutrition left behind when a meal in a
+plan is replaced. ``purge-tokens`` removes refresh tokens that are revoked or
+expired. Both work in small batches, each in its own short transaction, so
+they never hold locks for long.
+
+Tasks run on a schedule inside the API process (MAINTENANCE_INTERVAL_SECONDS)
+or on demand with ``python -m app.maintenance gc|purge-tokens``.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import exists, func, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+from .plan_deletion import delete_where_in
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", "500"))
+# Meals younger than this are left alone, whatever references them
+GC_MIN_AGE_SECONDS = int(os.getenv("GC_MIN_AGE_SECONDS", "3600"))
+# Pause between batches so the GC yields to regular traffic
+GC_BATCH_PAUSE_SECONDS = float(os.getenv("GC_BATCH_PAUSE_SECONDS", "0.1"))
+TOKEN_PURGE_BATCH_SIZE = int(os.getenv("TOKEN_PURGE_BATCH_SIZE", "1000"))
+# How often the in-process scheduler runs the maintenance tasks (0 disables it)
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "86400"))
+
+_scheduler_task: Optional[asyncio.Task] = None
+
+
+def _rows_bytes(db: Session, model, column, ids) -> Optional[int]:
+    """On-disk size of the rows about to be deleted; only PostgreSQL can tell."""
+    if not ids or db.get_bind().dialect.name != "postgresql":
+        return None
+    table = model.__table__
+    return db.execute(
+        select(func.coalesce(func.sum(func.pg_column_size(literal_column(f"{table.name}.*"))), 0))
+        .select_from(table)
+        .where(column.in_(ids))
+    ).scalar_one()
+
+
+def _collect_orphans(db: Session, batch_size: int, created_before: datetime) -> Dict[str, List[int]]:
+    """Find the next batch of unreferenced meals and the recipe graphs only they use."""
+    meals = db.execute(
+        select(models.Meal.id, models.Meal.recipe_id)
+        .where(
+            ~exists().where(models.DailyMeal.meal_id == models.Meal.id),
+            models.Meal.created_at < created_before
+        )
+        .order_by(models.Meal.id)
+        .limit(batch_size)
+    ).all()
+    meal_ids = [meal_id for meal_id, _ in meals]
+
+    # A recipe stays while any meal outside this batch still uses it
+    candidate_recipe_ids = {recipe_id for _, recipe_id in meals if recipe_id is not None}
+    shared_recipe_ids = set(db.execute(
+        select(models.Meal.recipe_id).where(
+            models.Meal.recipe_id.in_(candidate_recipe_ids),
+            models.Meal.id.notin_(meal_ids)
+        )
+    ).scalars()) if candidate_recipe_ids else set()
+    recipe_ids = sorted(candidate_recipe_ids - shared_recipe_ids)
+
+    candidate_nutrition_ids = set(db.execute(
+        select(models.Recipe.nutrition_id).where(
+            models.Recipe.id.in_(recipe_ids),
+            models.Recipe.nutrition_id.isnot(None)
+        )
+    ).scalars()) if recipe_ids else set()
+    shared_nutrition_ids = set(db.execute(
+        select(models.Recipe.nutrition_id).where(
+            models.Recipe.nutrition_id.in_(candidate_nutrition_ids),
+            models.Recipe.id.notin_(recipe_ids)
+        )
+    ).scalars()) if candidate_nutrition_ids else set()
+    nutrition_ids = sorted(candidate_nutrition_ids - shared_nutrition_ids)
+
+    return {"meal_ids": meal_ids, "recipe_ids": recipe_ids, "nutrition_ids": nutrition_ids}
+
+
+def _delete_orphans(db: Session, orphans: Dict[str, List[int]], report: Dict):
+    targets = [
+        ("recipe_ingredients", models.RecipeIngredient, models.RecipeIngredient.recipe_id, orphans["recipe_ids"]),
+        ("meals", models.Meal, models.Meal.id, orphans["meal_ids"]),
+        ("recipes", models.Recipe, models.Recipe.id, orphans["recipe_ids"]),
+        ("nutrition", models.Nutrition, models.Nutrition.id, orphans["nutrition_ids"]),
+    ]
+    for name, model, column, ids in targets:
+        size = _rows_bytes(db, model, column, ids)
+        if size is not None:
+            report["bytes"] = (report["bytes"] or 0) + size
+        report[name] += delete_where_in(db, model, column, ids)
+
+
+def collect_garbage(
+    batch_size: int = GC_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+    min_age_seconds: int = GC_MIN_AGE_SECONDS,
+    pause_seconds: float = GC_BATCH_PAUSE_SECONDS,
+    dry_run: bool = False
+) -> Dict:
+    """Delete unreferenced meals with their recipes, recipe ingredients and nutrition.
+
+    Returns the number of rows reclaimed per table, and the reclaimed bytes on
+    PostgreSQL (None elsewhere).
+    """
+    created_before = datetime.now(timezone.utc) - timedelta(seconds=min_age_seconds)
+    report = {"batches": 0, "meals": 0, "recipes": 0, "recipe_ingredients": 0, "nutrition": 0, "bytes": None}
+    started = time.monotonic()
+
+    while max_batches is None or report["batches"] < max_batches:
+        with SessionLocal() as db:
+            try:
+                orphans = _collect_orphans(db, batch_size, created_before)
+                if not orphans["meal_ids"]:
+                    db.rollback()
+                    break
+                if dry_run:
+                    report["meals"] += len(orphans["meal_ids"])
+                    report["recipes"] += len(orphans["recipe_ids"])
+                    report["nutrition"] += len(orphans["nutrition_ids"])
+                    report["batches"] += 1
+                    db.rollback()
+                    # Nothing is deleted, so the next batch would find the same rows
+                    break
+                _delete_orphans(db, orphans, report)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        report["batches"] += 1
+        logger.debug("GC batch %s done: %s", report["batches"], report)
+        if len(orphans["meal_ids"]) < batch_size:
+            break
+        time.sleep(pause_seconds)
+
+    report["seconds"] = round(time.monotonic() - started, 3)
+    logger.info(f"Garbage collection {'(dry run) ' if dry_run else ''}finished: {report}")
+    return report
+
+
+def purge_refresh_tokens(
+    batch_size: int = TOKEN_PURGE_BATCH_SIZE,
+    pause_seconds: float = GC_BATCH_PAUSE_SECONDS
+) -> Dict:
+    """Delete revoked and expired refresh tokens. Returns the number of deleted rows."""
+    report = {"batches": 0, "refresh_tokens": 0}
+    started = time.monotonic()
+
+    while True:
+        with SessionLocal() as db:
+            try:
+                token_ids = list(db.execute(
+                    select(models.RefreshToken.id)
+                    .where(or_(
+                        models.RefreshToken.is_revoked.is_(True),
+                        models.RefreshToken.expires_at < datetime.utcnow()
+                    ))
+                    .limit(batch_size)
+                ).scalars())
+                if not token_ids:
+                    db.rollback()
+                    break
+                report["refresh_tokens"] += delete_where_in(db, models.RefreshToken, models.RefreshToken.id, token_ids)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        report["batches"] += 1
+        if len(token_ids) < batch_size:
+            break
+        time.sleep(pause_seconds)
+
+    report["seconds"] = round(time.monotonic() - started, 3)
+    logger.info(f"Refresh token purge finished: {report}")
+    return report
+
+
+# Tasks run by the scheduler, in order
+SCHEDULED_TASKS = [
+    ("gc", collect_garbage),
+    ("purge-tokens", purge_refresh_tokens),
+]
+
+
+async def run_scheduled_tasks():
+    for name, task in SCHEDULED_TASKS:
+        try:
+            await asyncio.to_thread(task)
+        except Exception as e:
+            logger.error(f"Maintenance task {name} failed: {str(e)}")
+
+
+async def _scheduler_loop(interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        await run_scheduled_tasks()
+
+
+def start_scheduler(interval: int = MAINTENANCE_INTERVAL_SECONDS):
+    """Run the maintenance tasks every ``interval`` seconds on the running event loop."""
+    global _scheduler_task
+    if interval <= 0:
+        logger.info("Maintenance scheduler disabled")
+        return
+    _scheduler_task = asyncio.create_task(_scheduler_loop(interval))
+
+
+async def stop_scheduler():
+    global _scheduler_task
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+        await asyncio.gather(_scheduler_task, return_exceptions=True)
+        _scheduler_task = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance", description="Database maintenance tasks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    gc_parser = subparsers.add_parser("gc", help="Delete meals, recipes and nutrition no plan references")
+    gc_parser.add_argument("--batch-size", type=int, default=GC_BATCH_SIZE)
+    gc_parser.add_argument("--max-batches", type=int, default=None)
+    gc_parser.add_argument("--min-age", type=int, default=GC_MIN_AGE_SECONDS, help="Seconds a meal must exist before it is collected")
+    gc_parser.add_argument("--pause", type=float, default=GC_BATCH_PAUSE_SECONDS, help="Seconds to sleep between batches")
+    gc_parser.add_argument("--dry-run", action="store_true", help="Count the first batch without deleting it")
+
+    tokens_parser = subparsers.add_parser("purge-tokens", help="Delete revoked and expired refresh tokens")
+    tokens_parser.add_argument("--batch-size", type=int, default=TOKEN_PURGE_BATCH_SIZE)
+    tokens_parser.add_argument("--pause", type=float, default=GC_BATCH_PAUSE_SECONDS, help="Seconds to sleep between batches")
+
+    args = parser.parse_args(argv)
+    report = None
+    if args.command == "gc":
+        report = collect_garbage(
+            batch_size=args.batch_size,
+            max_batches=args.max_batches,
+            min_age_seconds=args.min_age,
+            pause_seconds=args.pause,
+            dry_run=args.dry_run
+        )
+    elif args.command == "purge-tokens":
+        report = purge_refresh_tokens(batch_size=args.batch_size, pause_seconds=args.pause)
+
+    for key, value in report.items():
+        print(f"{key}: {value if value is not None else 'n/a'}")
+
+
+if __name__ == "__main__":
+    from .logging_config import setup_logging
+
+    setup_logging()
+    main()
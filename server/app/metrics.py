@@ -0,0 +1,171 @@
+"""
+Prometheus metrics, served in the text exposition format at /metrics.
+
+Request latency is recorded per route template, together with the number
+of database queries each request ran and the time they took. OpenRouter
+calls record latency, token usage and errors per kind (recipe, meal_plan)
+and language. Pools and caches are read when the endpoint is scraped.
+
+Each worker process keeps its own registry; scrape every worker, or run a
+single worker, to see all traffic.
+"""
+import contextvars
+import time
+from typing import Dict, Optional
+
+from fastapi import Request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LLM_LATENCY_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries run while serving a request",
+    ["method", "route"], buckets=QUERY_COUNT_BUCKETS
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in database queries while serving a request",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+DB_QUERIES = Counter("db_queries", "Database queries, in and outside of requests")
+
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "OpenRouter completion latency",
+    ["kind", "language"], buckets=LLM_LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("llm_tokens", "Tokens used by OpenRouter completions", ["kind", "language", "type"])
+LLM_ERRORS = Counter("llm_errors", "Failed OpenRouter completions", ["kind", "language", "error"])
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_QUERIES.inc()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+
+
+def instrument_engine(engine):
+    """Count queries and their duration on ``engine`` (a sync Engine or AsyncEngine.sync_engine)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+async def metrics_middleware(request: Request, call_next):
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        _request_stats.reset(token)
+        route = request.scope.get("route")
+        # Route templates keep the label set small; unmatched paths share one label
+        route_path = route.path if route is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.labels(request.method, route_path, str(status)).observe(time.perf_counter() - started)
+        HTTP_REQUEST_DB_QUERIES.labels(request.method, route_path).observe(stats.queries)
+        HTTP_REQUEST_DB_SECONDS.labels(request.method, route_path).observe(stats.query_seconds)
+
+
+def observe_llm_usage(kind: str, language: str, response_json: Dict):
+    usage = response_json.get("usage") or {}
+    for token_type in ("prompt_tokens", "completion_tokens"):
+        if usage.get(token_type):
+            LLM_TOKENS.labels(kind, language, token_type.removesuffix("_tokens")).inc(usage[token_type])
+
+
+class StateCollector:
+    """Pool, cache and single-flight state, read at scrape time."""
+
+    def describe(self):
+        # Keeps register() from calling collect() while the app modules are still importing
+        return []
+
+    def collect(self):
+        from .database import pool_stats
+        from .endpoints.meal_plans import meal_plan_flight, openrouter_client
+        from .openrouter_client import recipe_flight
+        from .plan_cache import week_plan_cache
+
+        pool_gauges = {
+            key: GaugeMetricFamily(f"db_pool_{key}", f"Connection pool {key.replace('_', ' ')}", labels=["engine"])
+            for key in ("size", "checked_out", "overflow", "idle", "wait_seconds_max")
+        }
+        pool_counters = {
+            key: CounterMetricFamily(f"db_pool_{key}", f"Connection pool {key.replace('_', ' ')}", labels=["engine"])
+            for key in ("checkouts", "timeouts", "wait_seconds")
+        }
+        for engine_name, stats in pool_stats().items():
+            for key, family in pool_gauges.items():
+                if key in stats:
+                    family.add_metric([engine_name], stats[key])
+            pool_counters["checkouts"].add_metric([engine_name], stats["checkouts"])
+            pool_counters["timeouts"].add_metric([engine_name], stats["timeouts"])
+            pool_counters["wait_seconds"].add_metric([engine_name], stats["wait_seconds_total"])
+        yield from pool_gauges.values()
+        yield from pool_counters.values()
+
+        flight = CounterMetricFamily("single_flight_calls", "Single-flight calls by outcome", labels=["name", "outcome"])
+        in_flight = GaugeMetricFamily("single_flight_in_flight", "Keys currently in flight", labels=["name"])
+        for single_flight in (meal_plan_flight, recipe_flight):
+            stats = single_flight.stats()
+            flight.add_metric([single_flight.name, "executed"], stats["executions"])
+            flight.add_metric([single_flight.name, "coalesced"], stats["coalesced"])
+            in_flight.add_metric([single_flight.name], stats["in_flight"])
+        yield flight
+        yield in_flight
+
+        if openrouter_client.cache is not None:
+            stats = openrouter_client.cache.stats()
+            lookups = CounterMetricFamily("llm_cache_lookups", "LLM response cache lookups", labels=["result"])
+            lookups.add_metric(["hit"], stats["hits"])
+            lookups.add_metric(["miss"], stats["misses"])
+            yield lookups
+            yield CounterMetricFamily("llm_cache_evictions", "LLM response cache evictions", value=stats["evictions"])
+            yield GaugeMetricFamily("llm_cache_entries", "LLM response cache entries", value=stats["entries"])
+            yield GaugeMetricFamily("llm_cache_bytes", "LLM response cache size", value=stats["bytes"])
+
+        if week_plan_cache is not None:
+            stats = week_plan_cache.stats()
+            lookups = CounterMetricFamily("week_plan_cache_lookups", "Week plan cache lookups", labels=["backend", "result"])
+            lookups.add_metric([stats["backend"], "hit"], stats["hits"])
+            lookups.add_metric([stats["backend"], "miss"], stats["misses"])
+            yield lookups
+
+
+REGISTRY.register(StateCollector())
+
+
+def render_metrics():
+    """The current metrics and their content type, for the /metrics endpoint."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, CheckConstraint, Boolean, JSON, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, CheckConstraint, Boolean, JSON, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -51,6 +51,10 @@ class Recipe(Base):
     ingredients = relationship("RecipeIngredient", back_populates="recipe")
     meals = relationship("Meal", back_populates="recipe")
 
+    __table_args__ = (
+        Index("ix_recipes_nutrition_id", "nutrition_id"),
+    )
+
 class RecipeIngredient(Base):
     __tablename__ = "recipe_ingredients"
     
@@ -64,6 +68,10 @@ class RecipeIngredient(Base):
     recipe = relationship("Recipe", back_populates="ingredients")
     ingredient = relationship("Ingredient", back_populates="recipe_ingredients")
 
+    __table_args__ = (
+        Index("ix_recipe_ingredients_recipe_id", "recipe_id"),
+    )
+
 class UserIngredient(Base):
     __tablename__ = "user_ingredients"
     
@@ -93,6 +101,10 @@ class Meal(Base):
     recipe = relationship("Recipe", back_populates="meals")
     daily_meals = relationship("DailyMeal", back_populates="meal")
 
+    __table_args__ = (
+        Index("ix_meals_recipe_id", "recipe_id"),
+    )
+
 class UserPreference(Base):
     __tablename__ = "user_preferences"
     
@@ -110,6 +122,8 @@ class MealPlan(Base):
     week_number = Column(Integer, nullable=False)  
     year = Column(Integer, nullable=False)  
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped on every change to the plan's meals or shopping list; part of their ETags
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
     
     user = relationship("User", back_populates="meal_plans")
     daily_meals = relationship("DailyMeal", back_populates="meal_plan")
@@ -119,6 +133,8 @@ class MealPlan(Base):
         
         CheckConstraint('week_number >= 1 AND week_number <= 53'),
         UniqueConstraint('user_id', 'week_number', 'year', name='unique_user_week_year'),
+        # Latest plan of a user
+        Index("ix_meal_plans_user_id_created_at", "user_id", "created_at"),
     )
 
 class DailyMeal(Base):
@@ -133,6 +149,12 @@ class DailyMeal(Base):
     meal_plan = relationship("MealPlan", back_populates="daily_meals")
     meal = relationship("Meal", back_populates="daily_meals")
 
+    __table_args__ = (
+        Index("ix_daily_meals_plan_day_type", "meal_plan_id", "day_of_week", "meal_type"),
+        # Finds meals no plan references any more
+        Index("ix_daily_meals_meal_id", "meal_id"),
+    )
+
 class Nutrition(Base):
     __tablename__ = "nutrition"
     
@@ -158,14 +180,42 @@ class ShoppingItem(Base):
     meal_plan = relationship("MealPlan", back_populates="shopping_items")
     ingredient = relationship("Ingredient", back_populates="shopping_items", lazy="joined")
 
+    __table_args__ = (
+        Index("ix_shopping_items_meal_plan_ingredient", "meal_plan_id", "ingredient_id"),
+    )
+
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
     
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, unique=True, index=True)
+    token_hash = Column(LargeBinary(32), unique=True, index=True, nullable=False)  # SHA-256 of the token
     expires_at = Column(DateTime, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
     is_revoked = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    user = relationship("User", back_populates="refresh_tokens") 
\ No newline at end of file
+    user = relationship("User", back_populates="refresh_tokens")
+
+class MealPlanJob(Base):
+    __tablename__ = "meal_plan_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    week_number = Column(Integer, nullable=False)
+    year = Column(Integer, nullable=False)
+    preferences = Column(Text)  # JSON encoded generation preferences
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    progress = Column(Integer, default=0)  # Recipes generated so far
+    total = Column(Integer, nullable=True)  # Recipes to generate, known once the outline exists
+    error = Column(Text, nullable=True)
+    meal_plan_id = Column(Integer, ForeignKey("meal_plans.id", ondelete="SET NULL"), nullable=True)
+    worker_id = Column(String, nullable=True)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_meal_plan_jobs_status_created_at", "status", "created_at"),
+    )
@@ -1,12 +1,19 @@
-import requests
+import asyncio
+import httpx
 import os
-from typing import Dict, List, Optional
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 import logging
 import json
 from sqlalchemy.orm import Session
 from app import models
 from app.database import get_db
+from app.llm_cache import LLMResponseCache, get_llm_cache, make_cache_key
+from app.single_flight import SingleFlight
+from app.ingredient_resolver import resolve_ingredient_ids
+from app.logging_config import log_payload
+from app.metrics import LLM_ERRORS, LLM_REQUEST_SECONDS, observe_llm_usage
 
 
 logger = logging.getLogger(__name__)
@@ -14,10 +21,206 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-API_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Point at benchmarks/stub_openrouter.py (e.g. http://localhost:8001/api/v1) to run without the real API
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+API_URL = f"{OPENROUTER_BASE_URL.rstrip('/')}/chat/completions"
+MODEL = "openai/gpt-4o-2024-11-20"
+# Maximum number of recipe requests in flight at once while fanning out a meal plan.
+# A value of 1 generates the recipes one after another.
+OPENROUTER_MAX_CONCURRENCY = int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "4"))
+# Connection pool and timeouts (in seconds) of the shared HTTP client.
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "10"))
+OPENROUTER_READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", "120"))
+OPENROUTER_MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20"))
+OPENROUTER_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_KEEPALIVE_CONNECTIONS", "10"))
+
+# Awaited with (completed, total) while the recipes of a meal plan are generated
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+# Identical recipe prompts that are generated at the same time share one OpenRouter call
+recipe_flight = SingleFlight("recipe")
+
+# Structured output schemas of the two completion kinds; also part of the LLM cache key
+RECIPE_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "name": {"type": "string", "description": "Recipe name"},
+        "description": {"type": "string", "description": "Recipe description"},
+        "emoji": {"type": "string", "description": "Recipe emoji"},
+        "servings": {"type": "integer", "description": "Number of servings"},
+        "prep_time": {"type": "integer", "description": "Preparation time in minutes"},
+        "cook_time": {"type": "integer", "description": "Cooking time in minutes"},
+        "difficulty": {"type": "string", "enum": ["easy", "medium", "hard"]},
+        "ingredients": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "properties": {
+                    "name": {"type": "string", "description": "Ingredient name"},
+                    "amount": {"type": "number", "description": "Quantity of the ingredient"},
+                    "unit": {"type": "string", "description": "Unit of measurement (e.g., g, ml, pieces)"},
+                    "notes": {"type": "string", "description": "Additional notes about the ingredient"}
+                },
+                "required": ["name", "amount", "unit", "notes"]
+            }
+        },
+        "instructions": {
+            "type": "array",
+            "items": {"type": "string"}
+        },
+        "tips": {
+            "type": "array",
+            "items": {"type": "string"}
+        },
+        "nutrition": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "calories": {"type": "integer"},
+                "protein": {"type": "integer"},
+                "carbs": {"type": "integer"},
+                "fat": {"type": "integer"}
+            },
+            "required": ["calories", "protein", "carbs", "fat"]
+        }
+    },
+    "required": ["name", "description", "emoji", "servings", "prep_time", "cook_time", "difficulty", "ingredients", "instructions", "tips", "nutrition"]
+}
+
+MEAL_PLAN_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "days": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "properties": {
+                    "day": {"type": "integer"},
+                    "meals": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "properties": {
+                            "breakfast": {
+                                "type": ["object", "null"],
+                                "additionalProperties": False,
+                                "properties": {
+                                    "name": {"type": "string"},
+                                    "servings": {"type": "integer"},
+                                    "prep_time": {"type": "integer"},
+                                    "cook_time": {"type": "integer"},
+                                    "difficulty": {"type": "string"},
+                                    "leftover_from": {"type": "integer", "nullable": True},
+                                    "makes_leftovers_for": {"type": "integer", "nullable": True},
+                                    "ingredients": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "object",
+                                            "additionalProperties": False,
+                                            "properties": {
+                                                "name": {"type": "string", "description": "Ingredient name"},
+                                                "amount": {"type": "number", "description": "Quantity of the ingredient"},
+                                                "unit": {"type": "string", "description": "Unit of measurement (e.g., g, ml, pieces)"},
+                                                "notes": {"type": "string", "description": "Additional notes about the ingredient"}
+                                            },
+                                            "required": ["name", "amount", "unit", "notes"]
+                                        }
+                                    }
+                                },
+                                "required": ["name", "servings", "prep_time", "cook_time", "difficulty", "leftover_from", "makes_leftovers_for", "ingredients"]
+                            },
+                            "lunch": {
+                                "type": ["object", "null"],
+                                "additionalProperties": False,
+                                "properties": {
+                                    "name": {"type": "string"},
+                                    "servings": {"type": "integer"},
+                                    "prep_time": {"type": "integer"},
+                                    "cook_time": {"type": "integer"},
+                                    "difficulty": {"type": "string"},
+                                    "leftover_from": {"type": "integer", "nullable": True},
+                                    "makes_leftovers_for": {"type": "integer", "nullable": True},
+                                    "ingredients": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "object",
+                                            "additionalProperties": False,
+                                            "properties": {
+                                                "name": {"type": "string", "description": "Ingredient name"},
+                                                "amount": {"type": "number", "description": "Quantity of the ingredient"},
+                                                "unit": {"type": "string", "description": "Unit of measurement (e.g., g, ml, pieces)"},
+                                                "notes": {"type": "string", "description": "Additional notes about the ingredient"}
+                                            },
+                                            "required": ["name", "amount", "unit", "notes"]
+                                        }
+                                    }
+                                },
+                                "required": ["name", "servings", "prep_time", "cook_time", "difficulty", "leftover_from", "makes_leftovers_for", "ingredients"]
+                            },
+                            "dinner": {
+                                "type": "object",
+                                "additionalProperties": False,
+                                "properties": {
+                                    "name": {"type": "string"},
+                                    "servings": {"type": "integer"},
+                                    "prep_time": {"type": "integer"},
+                                    "cook_time": {"type": "integer"},
+                                    "difficulty": {"type": "string"},
+                                    "leftover_from": {"type": "integer", "nullable": True},
+                                    "makes_leftovers_for": {"type": "integer", "nullable": True},
+                                    "ingredients": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "object",
+                                            "additionalProperties": False,
+                                            "properties": {
+                                                "name": {"type": "string", "description": "Ingredient name"},
+                                                "amount": {"type": "number", "description": "Quantity of the ingredient"},
+                                                "unit": {"type": "string", "description": "Unit of measurement (e.g., g, ml, pieces)"},
+                                                "notes": {"type": "string", "description": "Additional notes about the ingredient"}
+                                            },
+                                            "required": ["name", "amount", "unit", "notes"]
+                                        }
+                                    }
+                                },
+                                "required": ["name", "servings", "prep_time", "cook_time", "difficulty", "leftover_from", "makes_leftovers_for", "ingredients"]
+                            }
+                        },
+                        "required": ["breakfast", "lunch", "dinner"]
+                    }
+                },
+                "required": ["day", "meals"]
+            }
+        }
+    },
+    "required": ["days"]
+}
+
+
+def completion_request_body(schema_name: str, schema: Dict, prompt: str) -> Dict:
+    """The chat completion request asking for output that matches ``schema``."""
+    return {
+        "model": MODEL,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": schema_name,
+                "strict": True,
+                "schema": schema
+            }
+        }
+    }
+
 
 class OpenRouterClient:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = OPENROUTER_MAX_CONCURRENCY,
+                 cache: Optional[LLMResponseCache] = None):
         logger.debug("Initializing OpenRouterClient")
         if not OPENROUTER_API_KEY:
             logger.error("OPENROUTER_API_KEY environment variable is not set")
@@ -27,6 +230,9 @@ class OpenRouterClient:
             "Authorization": f"Bearer {OPENROUTER_API_KEY}",
             "Content-Type": "application/json",
         }
+        self.max_concurrency = max(1, max_concurrency)
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self.cache = cache if cache is not None else get_llm_cache()
         
         self.language_prompts = {
             "en": {
@@ -88,6 +294,71 @@ class OpenRouterClient:
         
         logger.debug("OpenRouterClient initialized successfully")
 
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP client, creating it on first use.
+
+        The client is created lazily so that it binds to the running event loop
+        and keeps TLS connections to OpenRouter alive between requests.
+        """
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(OPENROUTER_READ_TIMEOUT, connect=OPENROUTER_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=OPENROUTER_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENROUTER_MAX_KEEPALIVE_CONNECTIONS
+                )
+            )
+        return self._http_client
+
+    async def aclose(self):
+        """Close the pooled HTTP client and its connections."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def _cache_get(self, key: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        try:
+            return await self.cache.aget(key)
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed, calling OpenRouter instead: {str(e)}")
+            return None
+
+    async def _cache_set(self, key: str, content: str):
+        if self.cache is None:
+            return
+        try:
+            await self.cache.aset(key, content)
+        except Exception as e:
+            logger.warning(f"Failed to store OpenRouter response in LLM cache: {str(e)}")
+
+    async def _post_completion(self, schema_name: str, schema: Dict, prompt: str, language: str) -> httpx.Response:
+        """Send a structured-output chat completion request to OpenRouter.
+
+        Latency and failed requests are recorded per schema name and language.
+        """
+        started = time.perf_counter()
+        try:
+            response = await self._send_completion(schema_name, schema, prompt)
+        except httpx.TimeoutException:
+            LLM_ERRORS.labels(schema_name, language, "timeout").inc()
+            raise
+        except httpx.HTTPError:
+            LLM_ERRORS.labels(schema_name, language, "network").inc()
+            raise
+        LLM_REQUEST_SECONDS.labels(schema_name, language).observe(time.perf_counter() - started)
+        if response.status_code != 200:
+            LLM_ERRORS.labels(schema_name, language, f"http_{response.status_code}").inc()
+        return response
+
+    async def _send_completion(self, schema_name: str, schema: Dict, prompt: str) -> httpx.Response:
+        return await self._get_http_client().post(
+            API_URL,
+            json=completion_request_body(schema_name, schema, prompt)
+        )
+
     def parse_ingredient_string(self, ingredient_str: str) -> dict:
         """Parse an ingredient string into amount, unit, and name components."""
         import re
@@ -140,8 +411,8 @@ class OpenRouterClient:
         
         return processed
 
-    def generate_recipe(self, preferences: Dict, language: str = "en") -> Dict:
-        logger.debug(f"Generating recipe with preferences: {preferences} in {language}")
+    async def generate_recipe(self, preferences: Dict, language: str = "en") -> Dict:
+        logger.debug("Generating recipe with preferences: %s in %s", preferences, language)
         
         prompt_template = self.language_prompts.get(language, self.language_prompts["en"])["recipe"]
         prompt = prompt_template.format(
@@ -152,82 +423,20 @@ class OpenRouterClient:
             prep_time=preferences.get('max_prep_time', 'Any')
         )
 
-        recipe_schema = {
-            "type": "object",
-            "additionalProperties": False,
-            "properties": {
-                "name": {"type": "string", "description": "Recipe name"},
-                "description": {"type": "string", "description": "Recipe description"},
-                "emoji": {"type": "string", "description": "Recipe emoji"},
-                "servings": {"type": "integer", "description": "Number of servings"},
-                "prep_time": {"type": "integer", "description": "Preparation time in minutes"},
-                "cook_time": {"type": "integer", "description": "Cooking time in minutes"},
-                "difficulty": {"type": "string", "enum": ["easy", "medium", "hard"]},
-                "ingredients": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "additionalProperties": False,
-                        "properties": {
-                            "name": {"type": "string", "description": "Ingredient name"},
-                            "amount": {"type": "number", "description": "Quantity of the ingredient"},
-                            "unit": {"type": "string", "description": "Unit of measurement (e.g., g, ml, pieces)"},
-                            "notes": {"type": "string", "description": "Additional notes about the ingredient"}
-                        },
-                        "required": ["name", "amount", "unit", "notes"]
-                    }
-                },
-                "instructions": {
-                    "type": "array",
-                    "items": {"type": "string"}
-                },
-                "tips": {
-                    "type": "array",
-                    "items": {"type": "string"}
-                },
-                "nutrition": {
-                    "type": "object",
-                    "additionalProperties": False,
-                    "properties": {
-                        "calories": {"type": "integer"},
-                        "protein": {"type": "integer"},
-                        "carbs": {"type": "integer"},
-                        "fat": {"type": "integer"}
-                    },
-                    "required": ["calories", "protein", "carbs", "fat"]
-                }
-            },
-            "required": ["name", "description", "emoji", "servings", "prep_time", "cook_time", "difficulty", "ingredients", "instructions", "tips", "nutrition"]
-        }
+        cache_key = make_cache_key(prompt, language, MODEL, RECIPE_SCHEMA)
 
         try:
-            response = requests.post(
-                API_URL,
-                headers=self.headers,
-                json={
-                    "model": "openai/gpt-4o-2024-11-20",
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ],
-                    "response_format": {
-                        "type": "json_schema",
-                        "json_schema": {
-                            "name": "recipe",
-                            "strict": True,
-                            "schema": recipe_schema
-                        }
-                    }
-                }
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"OpenRouter API error: {response.text}")
-            
-            response_json = response.json()
-            logger.debug(f"Successfully received response from OpenRouter: {response_json}")
-            
-            
-            recipe_content = json.loads(response_json["choices"][0]["message"]["content"])
+            content = await self._cache_get(cache_key)
+
+            if content is not None:
+                logger.debug("Recipe served from LLM cache (key %s)", cache_key[:12])
+            else:
+                content = await recipe_flight.do(
+                    cache_key,
+                    lambda: self._request_recipe_content(RECIPE_SCHEMA, prompt, cache_key, language)
+                )
+
+            recipe_content = json.loads(content)
             
             
             if "prepTime" in recipe_content:
@@ -235,7 +444,7 @@ class OpenRouterClient:
             if "cookTime" in recipe_content:
                 recipe_content["cook_time"] = recipe_content.pop("cookTime")
                 
-            logger.debug(f"Parsed recipe content: {recipe_content}")
+            log_payload(logger, "Parsed recipe content", recipe_content)
 
             
             if "ingredients" in recipe_content:
@@ -243,7 +452,7 @@ class OpenRouterClient:
 
             return recipe_content
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             error_msg = f"Network error while calling OpenRouter API: {str(e)}"
             logger.error(error_msg)
             raise Exception(error_msg)
@@ -256,125 +465,59 @@ class OpenRouterClient:
             logger.error(error_msg)
             raise Exception(error_msg)
 
-    def generate_meal_plan(self, preferences: Dict, days: int = 7, language: str = "en") -> Dict:
-        logger.debug(f"Generating meal plan with preferences: {preferences} for {days} days in {language}")
+    async def _request_recipe_content(self, recipe_schema: Dict, prompt: str, cache_key: str, language: str) -> str:
+        """Fetch a recipe completion from OpenRouter and store it in the LLM cache."""
+        response = await self._post_completion("recipe", recipe_schema, prompt, language)
+
+        if response.status_code != 200:
+            raise Exception(f"OpenRouter API error: {response.text}")
+
+        response_json = response.json()
+        log_payload(logger, "Recipe response from OpenRouter", response_json)
+        observe_llm_usage("recipe", language, response_json)
+
+        # Only cache content that actually parses
+        try:
+            content = response_json["choices"][0]["message"]["content"]
+            json.loads(content)
+        except (KeyError, IndexError, json.JSONDecodeError):
+            LLM_ERRORS.labels("recipe", language, "invalid_response").inc()
+            raise
+        await self._cache_set(cache_key, content)
+        return content
+
+    async def generate_meal_plan(self, preferences: Dict, days: int = 7, language: str = "en",
+                                 progress_callback: Optional[ProgressCallback] = None) -> Dict:
+        """Generate a complete meal plan, with a recipe for every meal.
+
+        ``progress_callback`` is awaited with (completed, total) after each generated recipe.
+        """
+        meal_plan = None
+        async for event in self.iter_meal_plan(preferences, days, language):
+            if event["type"] == "meal" and not event["leftover"] and progress_callback is not None:
+                try:
+                    await progress_callback(event["completed"], event["total"])
+                except Exception as e:
+                    logger.warning(f"Progress callback failed: {str(e)}")
+            elif event["type"] == "done":
+                meal_plan = event["plan"]
+        return meal_plan
+
+    async def iter_meal_plan(self, preferences: Dict, days: int = 7, language: str = "en") -> AsyncIterator[Dict]:
+        """Generate a meal plan step by step.
+
+        Yields a ``plan`` event with the high-level plan as soon as it exists,
+        a ``meal`` event for every meal once its recipe is ready (in completion
+        order, leftovers right after the meal they come from) and finally a
+        ``done`` event with the complete plan.
+        """
+        logger.debug("Generating meal plan with preferences: %s for %s days in %s", preferences, days, language)
         
         
         if language not in self.language_prompts:
             logger.warning(f"Language '{language}' not supported, defaulting to English")
             language = "en"
         
-        
-        high_level_plan_schema = {
-            "type": "object",
-            "additionalProperties": False,
-            "properties": {
-                "days": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "additionalProperties": False,
-                        "properties": {
-                            "day": {"type": "integer"},
-                            "meals": {
-                                "type": "object",
-                                "additionalProperties": False,
-                                "properties": {
-                                    "breakfast": {
-                                        "type": ["object", "null"],
-                                        "additionalProperties": False,
-                                        "properties": {
-                                            "name": {"type": "string"},
-                                            "servings": {"type": "integer"},
-                                            "prep_time": {"type": "integer"},
-                                            "cook_time": {"type": "integer"},
-                                            "difficulty": {"type": "string"},
-                                            "leftover_from": {"type": "integer", "nullable": True},
-                                            "makes_leftovers_for": {"type": "integer", "nullable": True},
-                                            "ingredients": {
-                                                "type": "array",
-                                                "items": {
-                                                    "type": "object",
-                                                    "additionalProperties": False,
-                                                    "properties": {
-                                                        "name": {"type": "string", "description": "Ingredient name"},
-                                                        "amount": {"type": "number", "description": "Quantity of the ingredient"},
-                                                        "unit": {"type": "string", "description": "Unit of measurement (e.g., g, ml, pieces)"},
-                                                        "notes": {"type": "string", "description": "Additional notes about the ingredient"}
-                                                    },
-                                                    "required": ["name", "amount", "unit", "notes"]
-                                                }
-                                            }
-                                        },
-                                        "required": ["name", "servings", "prep_time", "cook_time", "difficulty", "leftover_from", "makes_leftovers_for", "ingredients"]
-                                    },
-                                    "lunch": {
-                                        "type": ["object", "null"],
-                                        "additionalProperties": False,
-                                        "properties": {
-                                            "name": {"type": "string"},
-                                            "servings": {"type": "integer"},
-                                            "prep_time": {"type": "integer"},
-                                            "cook_time": {"type": "integer"},
-                                            "difficulty": {"type": "string"},
-                                            "leftover_from": {"type": "integer", "nullable": True},
-                                            "makes_leftovers_for": {"type": "integer", "nullable": True},
-                                            "ingredients": {
-                                                "type": "array",
-                                                "items": {
-                                                    "type": "object",
-                                                    "additionalProperties": False,
-                                                    "properties": {
-                                                        "name": {"type": "string", "description": "Ingredient name"},
-                                                        "amount": {"type": "number", "description": "Quantity of the ingredient"},
-                                                        "unit": {"type": "string", "description": "Unit of measurement (e.g., g, ml, pieces)"},
-                                                        "notes": {"type": "string", "description": "Additional notes about the ingredient"}
-                                                    },
-                                                    "required": ["name", "amount", "unit", "notes"]
-                                                }
-                                            }
-                                        },
-                                        "required": ["name", "servings", "prep_time", "cook_time", "difficulty", "leftover_from", "makes_leftovers_for", "ingredients"]
-                                    },
-                                    "dinner": {
-                                        "type": "object",
-                                        "additionalProperties": False,
-                                        "properties": {
-                                            "name": {"type": "string"},
-                                            "servings": {"type": "integer"},
-                                            "prep_time": {"type": "integer"},
-                                            "cook_time": {"type": "integer"},
-                                            "difficulty": {"type": "string"},
-                                            "leftover_from": {"type": "integer", "nullable": True},
-                                            "makes_leftovers_for": {"type": "integer", "nullable": True},
-                                            "ingredients": {
-                                                "type": "array",
-                                                "items": {
-                                                    "type": "object",
-                                                    "additionalProperties": False,
-                                                    "properties": {
-                                                        "name": {"type": "string", "description": "Ingredient name"},
-                                                        "amount": {"type": "number", "description": "Quantity of the ingredient"},
-                                                        "unit": {"type": "string", "description": "Unit of measurement (e.g., g, ml, pieces)"},
-                                                        "notes": {"type": "string", "description": "Additional notes about the ingredient"}
-                                                    },
-                                                    "required": ["name", "amount", "unit", "notes"]
-                                                }
-                                            }
-                                        },
-                                        "required": ["name", "servings", "prep_time", "cook_time", "difficulty", "leftover_from", "makes_leftovers_for", "ingredients"]
-                                    }
-                                },
-                                "required": ["breakfast", "lunch", "dinner"]
-                            }
-                        },
-                        "required": ["day", "meals"]
-                    }
-                }
-            },
-            "required": ["days"]
-        }
-
         prompt_template = self.language_prompts.get(language, self.language_prompts["en"])["meal_plan"]
         
         
@@ -392,71 +535,90 @@ class OpenRouterClient:
         prompt += f"\nPlease only generate meals for: {', '.join(meal_types)}"
 
         try:
-            response = requests.post(
-                API_URL,
-                headers=self.headers,
-                json={
-                    "model": "openai/gpt-4o-2024-11-20",
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ],
-                    "response_format": {
-                        "type": "json_schema",
-                        "json_schema": {
-                            "name": "meal_plan",
-                            "strict": True,
-                            "schema": high_level_plan_schema
-                        }
-                    }
-                }
-            )
+            response = await self._post_completion("meal_plan", MEAL_PLAN_SCHEMA, prompt, language)
             
             if response.status_code != 200:
                 logger.error(f"OpenRouter API returned non-200 status code: {response.status_code}")
                 logger.error(f"Response text: {response.text}")
                 raise Exception(f"OpenRouter API error: {response.text}")
                 
-            logger.debug(f"Raw API response: {response.text}")
             response_json = response.json()
-            logger.debug(f"Parsed API response JSON: {json.dumps(response_json, indent=2)}")
+            observe_llm_usage("meal_plan", language, response_json)
             
             try:
                 content = response_json["choices"][0]["message"]["content"]
-                logger.debug(f"Content to parse: {content}")
                 high_level_plan = json.loads(content)
-                logger.debug(f"Successfully parsed high-level plan: {json.dumps(high_level_plan, indent=2)}")
+                # The plan is the response content, so it is logged once rather than as raw text, JSON and plan
+                log_payload(logger, "Parsed high-level plan", high_level_plan)
             except (KeyError, IndexError) as e:
+                LLM_ERRORS.labels("meal_plan", language, "invalid_response").inc()
                 logger.error(f"Error accessing response structure: {str(e)}")
-                logger.error(f"Response JSON structure: {json.dumps(response_json, indent=2)}")
+                log_payload(logger, "Response JSON structure", response_json, logging.ERROR)
                 raise Exception(f"Unexpected API response structure: {str(e)}")
             except json.JSONDecodeError as e:
+                LLM_ERRORS.labels("meal_plan", language, "invalid_response").inc()
                 logger.error(f"Error parsing content as JSON: {str(e)}")
                 logger.error(f"Content that failed to parse: {content}")
                 raise Exception(f"Invalid JSON in API response content: {str(e)}")
             
             
+            # Split the plan into meals that need a recipe of their own and
+            # leftovers that reuse the recipe of the meal they were cooked with.
+            meals_to_generate = []
+            leftovers = []
             for day in high_level_plan["days"]:
-                for meal_type in meal_types:  
-                    if meal_type in day["meals"] and day["meals"][meal_type]:
-                        meal = day["meals"][meal_type]
-                        if meal.get("leftover_from"):
-                            
-                            original_day = meal["leftover_from"]
-                            original_meal = next(
-                                d["meals"][meal_type] for d in high_level_plan["days"] 
-                                if d["day"] == original_day
-                            )
-                            meal["recipe"] = original_meal["recipe"]
-                        else:
-                            
-                            recipe = self.generate_recipe({
-                                "meal_name": meal["name"],
-                                "meal_type": meal_type,
-                                "dietary_restrictions": preferences.get("dietary_restrictions"),
-                                "cuisine_type": preferences.get("cuisine_preferences"),
-                                "skill_level": preferences.get("meal_complexity")
-                            }, language)
-                            meal["recipe"] = recipe
+                for meal_type in meal_types:
+                    meal = day["meals"].get(meal_type)
+                    if not meal:
+                        continue
+                    source = self._find_leftover_source(high_level_plan, meal_type, meal)
+                    if source is not None and source is not meal:
+                        leftovers.append((meal, source))
+                    else:
+                        meals_to_generate.append((meal_type, meal))
+
+            total = len(meals_to_generate)
+            yield {"type": "plan", "plan": high_level_plan, "total": total}
+
+            leftovers_by_source = {}
+            for meal, source in leftovers:
+                leftovers_by_source.setdefault(id(source), []).append(meal)
+            meal_days = {
+                id(meal): day["day"]
+                for day in high_level_plan["days"]
+                for meal in day["meals"].values()
+                if meal
+            }
+
+            completed = 0
+            async for index, recipe in self._iter_recipes(
+                [self._recipe_preferences(meal, meal_type, preferences) for meal_type, meal in meals_to_generate],
+                language
+            ):
+                meal_type, meal = meals_to_generate[index]
+                meal["recipe"] = recipe
+                completed += 1
+                yield {
+                    "type": "meal",
+                    "day": meal_days[id(meal)],
+                    "meal_type": meal_type,
+                    "meal": meal,
+                    "leftover": False,
+                    "completed": completed,
+                    "total": total
+                }
+
+                for leftover in leftovers_by_source.get(id(meal), []):
+                    leftover["recipe"] = recipe
+                    yield {
+                        "type": "meal",
+                        "day": meal_days[id(leftover)],
+                        "meal_type": meal_type,
+                        "meal": leftover,
+                        "leftover": True,
+                        "completed": completed,
+                        "total": total
+                    }
             
             
             for day in high_level_plan["days"]:
@@ -464,13 +626,66 @@ class OpenRouterClient:
                     if meal and "ingredients" in meal:
                         meal["ingredients"] = self.process_ingredients(meal["ingredients"])
 
-            return high_level_plan
+            yield {"type": "done", "plan": high_level_plan}
             
         except Exception as e:
             error_msg = f"Error processing meal plan: {str(e)}"
             logger.error(error_msg)
             raise Exception(error_msg)
 
+    def _recipe_preferences(self, meal: Dict, meal_type: str, preferences: Dict) -> Dict:
+        return {
+            "meal_name": meal["name"],
+            "meal_type": meal_type,
+            "dietary_restrictions": preferences.get("dietary_restrictions"),
+            "cuisine_type": preferences.get("cuisine_preferences"),
+            "skill_level": preferences.get("meal_complexity")
+        }
+
+    def _find_leftover_source(self, plan: Dict, meal_type: str, meal: Dict) -> Optional[Dict]:
+        """Follow the leftover_from chain of a meal back to the meal that is actually cooked.
+
+        Returns None when the chain points at a day or meal that does not exist
+        or loops back on itself, in which case the meal gets a recipe of its own.
+        """
+        seen_days = set()
+        while meal.get("leftover_from"):
+            day_number = meal["leftover_from"]
+            if day_number in seen_days:
+                return None
+            seen_days.add(day_number)
+            meal = next(
+                (d["meals"].get(meal_type) for d in plan["days"] if d["day"] == day_number),
+                None
+            )
+            if not meal:
+                return None
+        return meal
+
+    async def _iter_recipes(self, recipe_preferences: List[Dict], language: str) -> AsyncIterator[Tuple[int, Dict]]:
+        """Generate one recipe per entry and yield (index, recipe) pairs as they complete.
+
+        Up to ``max_concurrency`` requests are sent to OpenRouter at the same time.
+        """
+        if not recipe_preferences:
+            return
+
+        logger.info(f"Generating {len(recipe_preferences)} recipes with concurrency {self.max_concurrency}")
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def generate(index: int, prefs: Dict) -> Tuple[int, Dict]:
+            async with semaphore:
+                return index, await self.generate_recipe(prefs, language)
+
+        tasks = [asyncio.ensure_future(generate(index, prefs)) for index, prefs in enumerate(recipe_preferences)]
+        try:
+            for next_recipe in asyncio.as_completed(tasks):
+                yield await next_recipe
+        finally:
+            # Don't keep paying for recipes of a plan that has failed or been abandoned
+            for task in tasks:
+                task.cancel()
+
     def _create_recipe_prompt(self, preferences: Dict) -> str:
         return f"""Create a recipe that matches these preferences:
         Dietary restrictions: {preferences.get('dietary_restrictions', 'None')}
@@ -517,24 +732,13 @@ class OpenRouterClient:
         db.flush()
 
         
+        ingredient_ids = resolve_ingredient_ids(db, [
+            (ingredient_data["name"], ingredient_data["unit"]) for ingredient_data in recipe_data.get("ingredients", [])
+        ])
         for ingredient_data in recipe_data.get("ingredients", []):
-            
-            ingredient = db.query(models.Ingredient).filter(
-                models.Ingredient.name == ingredient_data["name"]
-            ).first()
-            
-            if not ingredient:
-                ingredient = models.Ingredient(
-                    name=ingredient_data["name"],
-                    default_unit=ingredient_data["unit"]
-                )
-                db.add(ingredient)
-                db.flush()
-            
-            
             recipe_ingredient = models.RecipeIngredient(
                 recipe_id=recipe.id,
-                ingredient_id=ingredient.id,
+                ingredient_id=ingredient_ids[ingredient_data["name"]],
                 amount=ingredient_data["amount"],
                 unit=ingredient_data["unit"],
                 notes=ingredient_data.get("notes")
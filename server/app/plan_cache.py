@@ -0,0 +1,172 @@
+"""
+Read-through cache of rendered week plans, keyed by (user, year, week).
+
+Every endpoint or job that changes a plan invalidates its entry after the
+commit. The ``memory`` backend keeps entries in a per-process LRU, so with
+several worker processes an invalidation only reaches the process that made
+the change and the others serve their copy until the TTL runs out. Use the
+``redis`` backend (``pip install redis``) to share entries and invalidations
+between processes.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# memory, redis or none
+WEEK_PLAN_CACHE_BACKEND = os.getenv("WEEK_PLAN_CACHE_BACKEND", "memory").lower()
+WEEK_PLAN_CACHE_SIZE = int(os.getenv("WEEK_PLAN_CACHE_SIZE", "1000"))
+WEEK_PLAN_CACHE_TTL_SECONDS = int(os.getenv("WEEK_PLAN_CACHE_TTL_SECONDS", "300"))
+WEEK_PLAN_CACHE_REDIS_URL = os.getenv("WEEK_PLAN_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+PlanKey = Tuple[int, int, int]
+
+
+class MemoryWeekPlanCache:
+    """Per-process LRU of week plans.
+
+    A read that started before an invalidation of the same key does not store
+    its result, so a slow read cannot put back a plan that was just replaced.
+    """
+
+    def __init__(self, maxsize: int = WEEK_PLAN_CACHE_SIZE, ttl: float = WEEK_PLAN_CACHE_TTL_SECONDS):
+        self._plans = LRUCache(maxsize, ttl=ttl)
+        self._invalidated_at = LRUCache(maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    async def get(self, key: PlanKey) -> Optional[Dict]:
+        return self._plans.get(key)
+
+    async def set(self, key: PlanKey, plan: Dict, read_started: float):
+        with self._lock:
+            invalidated_at = self._invalidated_at.get(key)
+            if invalidated_at is not None and invalidated_at >= read_started:
+                return
+            self._plans.set(key, plan)
+
+    async def invalidate(self, key: PlanKey):
+        with self._lock:
+            self._invalidated_at.set(key, time.time())
+            self._plans.pop(key)
+
+    def stats(self) -> Dict:
+        return {"backend": "memory", "hits": self._plans.hits, "misses": self._plans.misses, "entries": len(self._plans)}
+
+
+# Store the plan unless the key was invalidated at or after the read started
+_SET_UNLESS_INVALIDATED = """
+local invalidated_at = redis.call('GET', KEYS[2])
+if invalidated_at and tonumber(invalidated_at) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+"""
+
+
+class RedisWeekPlanCache:
+    """Week plans stored as JSON in Redis, shared by all worker processes.
+
+    Invalidations leave a timestamp next to the plan, and a read that started
+    before it does not store its result, as with the memory backend. The
+    timestamps come from the clocks of the API hosts, which must agree to
+    within the time a plan read takes.
+    """
+
+    def __init__(self, url: str = WEEK_PLAN_CACHE_REDIS_URL, ttl: int = WEEK_PLAN_CACHE_TTL_SECONDS):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._set_unless_invalidated = self._redis.register_script(_SET_UNLESS_INVALIDATED)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _name(key: PlanKey) -> str:
+        user_id, year, week_number = key
+        return f"week_plan:{user_id}:{year}:{week_number}"
+
+    @staticmethod
+    def _invalidated_name(key: PlanKey) -> str:
+        user_id, year, week_number = key
+        return f"week_plan_invalidated:{user_id}:{year}:{week_number}"
+
+    async def get(self, key: PlanKey) -> Optional[Dict]:
+        value = await self._redis.get(self._name(key))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, key: PlanKey, plan: Dict, read_started: float):
+        await self._set_unless_invalidated(
+            keys=[self._name(key), self._invalidated_name(key)],
+            args=[json.dumps(plan), repr(read_started), self.ttl]
+        )
+
+    async def invalidate(self, key: PlanKey):
+        async with self._redis.pipeline(transaction=True) as pipe:
+            # Outlives any read that could still store the old plan
+            pipe.set(self._invalidated_name(key), repr(time.time()), ex=self.ttl)
+            pipe.delete(self._name(key))
+            await pipe.execute()
+
+    def stats(self) -> Dict:
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses}
+
+
+def _create_cache():
+    if WEEK_PLAN_CACHE_BACKEND == "none" or WEEK_PLAN_CACHE_SIZE <= 0:
+        logger.info("Week plan cache disabled")
+        return None
+    if WEEK_PLAN_CACHE_BACKEND == "redis":
+        try:
+            return RedisWeekPlanCache()
+        except ImportError:
+            logger.warning("WEEK_PLAN_CACHE_BACKEND=redis needs the redis package, using the in-process cache")
+    return MemoryWeekPlanCache()
+
+
+week_plan_cache = _create_cache()
+
+
+async def get_cached_week_plan(user_id: int, year: int, week_number: int) -> Optional[Dict]:
+    if week_plan_cache is None:
+        return None
+    try:
+        return await week_plan_cache.get((user_id, year, week_number))
+    except Exception as e:
+        logger.warning(f"Week plan cache lookup failed, reading from the database: {str(e)}")
+        return None
+
+
+async def cache_week_plan(user_id: int, year: int, week_number: int, plan: Dict, read_started: float):
+    """Store a plan that was read from the database at ``read_started`` (time.time())."""
+    if week_plan_cache is None:
+        return
+    try:
+        await week_plan_cache.set((user_id, year, week_number), plan, read_started)
+    except Exception as e:
+        logger.warning(f"Failed to store week plan in cache: {str(e)}")
+
+
+async def invalidate_week_plan(user_id: int, year: int, week_number: int):
+    """Drop the cached plan; call after committing any change to it."""
+    if week_plan_cache is None:
+        return
+    try:
+        await week_plan_cache.invalidate((user_id, year, week_number))
+    except Exception as e:
+        logger.error(f"Failed to invalidate cached week plan {user_id}/{year}/{week_number}: {str(e)}")
@@ -0,0 +1,62 @@
+import logging
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Ids per DELETE statement, well below SQLite's bound parameter limit
+DELETE_CHUNK_SIZE = 5000
+
+
+def delete_where_in(db: Session, model, column, ids: Iterable[int]) -> int:
+    """Delete the rows of ``model`` whose ``column`` is in ``ids``, in chunks. Returns the row count."""
+    ids = sorted(set(ids))
+    deleted = 0
+    for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+        result = db.execute(
+            delete(model).where(column.in_(ids[start:start + DELETE_CHUNK_SIZE])),
+            execution_options={"synchronize_session": False}
+        )
+        deleted += result.rowcount
+    return deleted
+
+
+def delete_meal_plans(db: Session, meal_plan_ids: List[int]) -> Dict[str, int]:
+    """Delete meal plans together with their shopping items, meals, recipes and nutrition.
+
+    One query collects the plan graph and each table is then cleared with a
+    single set-based DELETE, children before parents, so the statement count
+    does not grow with the number of plans. Objects already loaded in the
+    session are not updated. The caller is responsible for committing.
+    Returns the number of deleted rows per table.
+    """
+    meal_plan_ids = list(meal_plan_ids)
+    if not meal_plan_ids:
+        return {}
+
+    graph = db.execute(
+        select(models.Meal.id, models.Meal.recipe_id, models.Recipe.nutrition_id)
+        .select_from(models.DailyMeal)
+        .join(models.Meal, models.DailyMeal.meal_id == models.Meal.id)
+        .outerjoin(models.Recipe, models.Meal.recipe_id == models.Recipe.id)
+        .where(models.DailyMeal.meal_plan_id.in_(meal_plan_ids))
+    ).all()
+    meal_ids = {meal_id for meal_id, _, _ in graph}
+    recipe_ids = {recipe_id for _, recipe_id, _ in graph if recipe_id is not None}
+    nutrition_ids = {nutrition_id for _, _, nutrition_id in graph if nutrition_id is not None}
+
+    deleted = {
+        "shopping_items": delete_where_in(db, models.ShoppingItem, models.ShoppingItem.meal_plan_id, meal_plan_ids),
+        "daily_meals": delete_where_in(db, models.DailyMeal, models.DailyMeal.meal_plan_id, meal_plan_ids),
+        "meals": delete_where_in(db, models.Meal, models.Meal.id, meal_ids),
+        "recipe_ingredients": delete_where_in(db, models.RecipeIngredient, models.RecipeIngredient.recipe_id, recipe_ids),
+        "recipes": delete_where_in(db, models.Recipe, models.Recipe.id, recipe_ids),
+        "nutrition": delete_where_in(db, models.Nutrition, models.Nutrition.id, nutrition_ids),
+        "meal_plans": delete_where_in(db, models.MealPlan, models.MealPlan.id, meal_plan_ids),
+    }
+    logger.info(f"Deleted meal plans {meal_plan_ids}: {deleted}")
+    return deleted
@@ -0,0 +1,139 @@
+import logging
+from typing import Dict, List
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .ingredient_resolver import resolve_ingredient_ids
+
+logger = logging.getLogger(__name__)
+
+
+def _insert_returning_ids(db: Session, model, rows: List[Dict]) -> List[int]:
+    """Insert ``rows`` in batched multi-row statements and return their ids in row order."""
+    if not rows:
+        return []
+
+    # Insert into the table rather than the mapped class: an ORM bulk insert
+    # splits the rows into one statement per run of rows with the same None
+    # columns, e.g. around every leftover meal
+    table = model.__table__
+
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite cannot return ids of a multi-row insert in parameter order, so
+        # SQLAlchemy would fall back to one statement per row. SQLite has a single
+        # writer and the caller has already written in this transaction, so the
+        # next ids can be allocated up front without racing anyone.
+        first_id = db.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar_one() + 1
+        ids = list(range(first_id, first_id + len(rows)))
+        db.execute(insert(table), [dict(row, id=row_id) for row, row_id in zip(rows, ids)])
+        return ids
+
+    result = db.execute(
+        insert(table).returning(table.c.id, sort_by_parameter_order=True),
+        rows
+    )
+    return list(result.scalars())
+
+
+def _insert_rows(db: Session, model, rows: List[Dict]):
+    if rows:
+        db.execute(insert(model.__table__), rows)
+
+
+def write_meal_plan(db: Session, meal_plan_id: int, meal_plan_data: dict) -> List[Dict]:
+    """Insert the meals of a generated plan with a fixed number of set-based statements.
+
+    Nutrition, recipe and meal rows are each inserted in one batch whose
+    RETURNING ids feed the next level, followed by one batch each for
+    recipe_ingredients and daily_meals. Returns every ingredient of the plan
+    for building the shopping list. Must run in a transaction that has
+    already written, e.g. after flushing the meal plan row.
+    """
+    entries = []
+    for day_data in meal_plan_data["days"]:
+        for meal_type, meal_data in day_data["meals"].items():
+            # Skip if no meal data
+            if not meal_data:
+                continue
+            recipe_data = meal_data.get("recipe", meal_data)  # Handle both structures
+            ingredients = [
+                ingredient_data for ingredient_data in recipe_data.get("ingredients", [])
+                if isinstance(ingredient_data, dict)
+            ]
+            entries.append((day_data["day"], meal_type, meal_data, recipe_data, ingredients))
+
+    ingredient_ids = resolve_ingredient_ids(db, [
+        (ingredient_data.get("name") or "Unknown Ingredient", ingredient_data.get("unit", "pieces"))
+        for _, _, _, _, ingredients in entries
+        for ingredient_data in ingredients
+    ])
+
+    nutrition_ids = _insert_returning_ids(db, models.Nutrition, [
+        {
+            "calories": recipe_data.get("nutrition", {}).get("calories", 500),
+            "protein": recipe_data.get("nutrition", {}).get("protein", 20),
+            "carbs": recipe_data.get("nutrition", {}).get("carbs", 50),
+            "fat": recipe_data.get("nutrition", {}).get("fat", 25)
+        }
+        for _, _, _, recipe_data, _ in entries
+    ])
+
+    recipe_ids = _insert_returning_ids(db, models.Recipe, [
+        {
+            "servings": recipe_data.get("servings", 4),
+            "prep_time": recipe_data.get("prep_time", 15),
+            "cook_time": recipe_data.get("cook_time", 20),
+            "difficulty": recipe_data.get("difficulty", "Medium"),
+            "instructions": "\n".join(recipe_data.get("instructions", [])),
+            "tips": "\n".join(recipe_data.get("tips", [])),
+            "nutrition_id": nutrition_id
+        }
+        for (_, _, _, recipe_data, _), nutrition_id in zip(entries, nutrition_ids)
+    ])
+
+    meal_ids = _insert_returning_ids(db, models.Meal, [
+        {
+            "name": meal_data["name"],
+            "description": meal_data.get("description", ""),
+            "emoji": meal_data.get("emoji", "🍽️"),
+            "recipe_id": recipe_id,
+            "servings": meal_data.get("servings", 4),
+            "leftover_from": meal_data.get("leftover_from"),
+            "makes_leftovers_for": meal_data.get("makes_leftovers_for")
+        }
+        for (_, _, meal_data, _, _), recipe_id in zip(entries, recipe_ids)
+    ])
+
+    recipe_ingredient_rows = []
+    daily_meal_rows = []
+    all_ingredients = []
+    for (day_index, meal_type, _, _, ingredients), recipe_id, meal_id in zip(entries, recipe_ids, meal_ids):
+        for ingredient_data in ingredients:
+            recipe_ingredient_rows.append({
+                "recipe_id": recipe_id,
+                "ingredient_id": ingredient_ids[ingredient_data.get("name") or "Unknown Ingredient"],
+                "amount": ingredient_data.get("amount", 1),
+                "unit": ingredient_data.get("unit", "pieces"),
+                "notes": ingredient_data.get("notes")
+            })
+            all_ingredients.append({
+                "name": ingredient_data.get("name") or "Unknown Ingredient",
+                "amount": ingredient_data.get("amount", 1),
+                "unit": ingredient_data.get("unit", "pieces"),
+                "notes": ingredient_data.get("notes")
+            })
+
+        daily_meal_rows.append({
+            "meal_plan_id": meal_plan_id,
+            "day_of_week": (day_index - 1) % 7,  # Convert from 1-7 to 0-6
+            "meal_type": meal_type,
+            "meal_id": meal_id
+        })
+
+    _insert_rows(db, models.RecipeIngredient, recipe_ingredient_rows)
+    _insert_rows(db, models.DailyMeal, daily_meal_rows)
+
+    logger.info(f"Wrote {len(entries)} meals with {len(recipe_ingredient_rows)} ingredients for meal plan {meal_plan_id}")
+    return all_ingredients
@@ -0,0 +1,167 @@
+"""
+Query budgets per endpoint and a probable N+1 detector.
+
+Every statement a request sends to the database is recorded with its shape
+(the SQL text with IN lists collapsed, so the same query with a different
+number of ids has the same shape). A request that runs more statements than
+its route's budget is a violation, reported with every shape that ran at
+least QUERY_BUDGET_REPEAT_THRESHOLD times, the usual sign of a lazy load or
+a query inside a loop.
+
+tests/test_query_budgets.py drives every route through the query_budget
+fixture of tests/conftest.py, so a change that adds statements to a route
+fails the tests. In a running app, QUERY_BUDGET_MODE selects what a request
+over budget does: ``off`` (default) checks nothing, ``warn`` logs it and
+``raise`` raises QueryBudgetExceeded. Code outside a request (jobs, scripts,
+single helpers) can be checked with ``query_budget``, which always raises:
+
+    with query_budget(4, "week plan"):
+        _load_week_meal_plan(db, user_id, year, week_number)
+"""
+import contextvars
+import logging
+import os
+import re
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# off, warn or raise
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off").lower()
+# Budget of routes missing from QUERY_BUDGETS
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "10"))
+# A shape that runs this often in one request is reported as a probable N+1
+QUERY_BUDGET_REPEAT_THRESHOLD = int(os.getenv("QUERY_BUDGET_REPEAT_THRESHOLD", "3"))
+
+# Statements per request, by method and route template, with cold caches and
+# including the role lookup of the authentication dependency and the body of
+# streamed responses. Raise a budget only together with the change that needs
+# the extra statements.
+QUERY_BUDGETS: Dict[str, int] = {
+    "POST /api/auth/token": 3,
+    "POST /api/auth/refresh": 4,
+    "POST /api/auth/register": 3,
+    "POST /api/auth/logout": 2,
+    "GET /api/users/profile": 2,
+    "PUT /api/users/profile": 4,
+    "GET /api/users/preferences": 2,
+    "PUT /api/users/preferences": 4,
+    "GET /api/ingredients/common": 2,
+    "GET /api/ingredients/user": 2,
+    "POST /api/ingredients/user": 4,
+    "PUT /api/ingredients/user/{ingredient_id}": 4,
+    "DELETE /api/ingredients/user/{ingredient_id}": 4,
+    "POST /api/recipes/generate": 6,
+    "GET /api/recipes/{recipe_id}": 2,
+    "POST /api/meal-plans/generate": 27,
+    "POST /api/meal-plans/generate/stream": 22,
+    "POST /api/meal-plans/jobs": 4,
+    "GET /api/meal-plans/jobs/{job_id}": 5,
+    "GET /api/meal-plans/current": 4,
+    "GET /api/meal-plans/week/{year}/{week_number}": 4,
+    "GET /api/meal-plans/current/meals/{day_index}/{meal_type}": 3,
+    "PUT /api/meal-plans/current/meals": 17,
+    "PUT /api/meal-plans/current/servings": 12,
+    "PUT /api/meal-plans/current/servings/bulk": 12,
+    "DELETE /api/meal-plans/reset": 10,
+    "GET /api/shopping-list/current": 3,
+    "GET /api/shopping-list/week/{year}/{week_number}": 3,
+    "PATCH /api/shopping-list/items/{item_id}": 4,
+}
+
+# IN (?, ?, ?), IN (%(id_1)s, %(id_2)s) and IN ($1, $2) all become IN (...)
+_PLACEHOLDER = r"(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def statement_shape(statement: str) -> str:
+    return _PLACEHOLDER_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def repeated_shapes(self, threshold: int = QUERY_BUDGET_REPEAT_THRESHOLD) -> List[Tuple[str, int]]:
+        counts = Counter(statement_shape(statement) for statement in self.statements)
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+    def report(self, label: str, budget: int) -> str:
+        lines = [f"{label} ran {len(self)} statements, budget {budget}"]
+        for shape, count in self.repeated_shapes():
+            lines.append(f"  probable N+1, {count}x: {shape[:300]}")
+        return "\n".join(lines)
+
+
+_recorder: contextvars.ContextVar[Optional[QueryRecorder]] = contextvars.ContextVar("query_recorder", default=None)
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.statements.append(statement)
+
+
+def instrument_engine(engine):
+    """Record the statements of ``engine`` (a sync Engine or AsyncEngine.sync_engine)."""
+    event.listen(engine, "before_cursor_execute", _record_statement)
+
+
+def budget_for(method: str, route_path: str) -> int:
+    return QUERY_BUDGETS.get(f"{method} {route_path}", QUERY_BUDGET_DEFAULT)
+
+
+def _check(recorder: QueryRecorder, label: str, budget: int, mode: str):
+    if len(recorder) <= budget:
+        return
+    message = recorder.report(label, budget)
+    if mode == "raise":
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def query_budget(budget: int, label: str = "block", mode: str = "raise") -> Iterator[QueryRecorder]:
+    """Record the statements run inside the block and fail if there are more than ``budget``.
+
+    Only statements of engines passed to instrument_engine are seen; main.py
+    instruments both of the app's engines.
+    """
+    recorder = QueryRecorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+    _check(recorder, label, budget, mode)
+
+
+async def query_budget_middleware(request: Request, call_next):
+    recorder = QueryRecorder()
+    token = _recorder.set(recorder)
+    try:
+        response = await call_next(request)
+    finally:
+        _recorder.reset(token)
+    route = request.scope.get("route")
+    if route is not None:
+        # Statements of a streamed body run after this point and are not counted,
+        # so a streamed route is only checked up to the start of its body here
+        _check(recorder, f"{request.method} {route.path}", budget_for(request.method, route.path), QUERY_BUDGET_MODE)
+    return response
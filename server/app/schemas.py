@@ -119,4 +119,16 @@ class DayMealsResponse(BaseModel):
 class MealPlanResponse(BaseModel):
     week_number: int
     year: int
-    days: List[DayMealsResponse] 
\ No newline at end of file
+    days: List[DayMealsResponse]
+
+class MealPlanJobResponse(BaseModel):
+    job_id: int
+    status: str
+    week_number: int
+    year: int
+    progress: int
+    total: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    meal_plan: Optional[Dict] = None
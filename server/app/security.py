@@ -1,5 +1,7 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -7,7 +9,11 @@ from fastapi.security import OAuth2PasswordBearer
 import os
 from dotenv import load_dotenv
 import secrets
-from sqlalchemy.orm import Session
+import hashlib
+import hmac
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import LRUCache
 from app.database import get_db
 from app.models import User
 
@@ -18,10 +24,34 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# Cost of new password hashes; existing hashes below it are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads hashing passwords off the event loop (bcrypt releases the GIL)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Authenticated requests read the user's role from here instead of the database.
+# Entries expire after the TTL, which bounds how long other processes see a stale role.
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS
+)
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="token_optional")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="token_optional", auto_error=False)
+
+user_role_cache = LRUCache(USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+_NOT_CACHED = object()
+
+def invalidate_user_cache(user_id):
+    """Drop the cached role of a user, e.g. after their profile or role changed."""
+    user_role_cache.pop(str(user_id))
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -29,6 +59,22 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def hash_password(password: str) -> str:
+    """get_password_hash on the password hashing pool, keeping the event loop free."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_hash_executor, pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password on the password hashing pool.
+
+    Returns whether it matched and, when the stored hash uses outdated
+    settings, a new hash to store in its place.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_hash_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -42,6 +88,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 def create_refresh_token() -> str:
     return secrets.token_urlsafe(32)
 
+def hash_refresh_token(refresh_token: str) -> bytes:
+    """Refresh tokens are stored and looked up by their fixed-size SHA-256 digest."""
+    return hashlib.sha256(refresh_token.encode("utf-8")).digest()
+
 def verify_refresh_token(refresh_token: str, db_refresh_token) -> bool:
     if not db_refresh_token:
         return False
@@ -49,9 +99,9 @@ def verify_refresh_token(refresh_token: str, db_refresh_token) -> bool:
         return False
     if db_refresh_token.expires_at < datetime.utcnow():
         return False
-    return refresh_token == db_refresh_token.token
+    return hmac.compare_digest(hash_refresh_token(refresh_token), db_refresh_token.token_hash)
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -59,22 +109,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+        # asyncpg binds parameters by their exact type, so ids are ints from here on
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
         raise credentials_exception
     
-    
-    db = next(get_db())
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
-    return {"user_id": user_id, "role": user.role}
+    role = user_role_cache.get(str(user_id), _NOT_CACHED)
+    if role is _NOT_CACHED:
+        # Uses the request's own session, shared with the endpoint
+        role = (await db.execute(select(User.role).where(User.id == user_id))).scalar_one_or_none()
+        if role is None:
+            raise credentials_exception
+        user_role_cache.set(str(user_id), role)
+    return {"user_id": user_id, "role": role}
 
-async def get_current_user_optional(token: str = Depends(oauth2_scheme_optional)):
+async def get_current_user_optional(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    db: AsyncSession = Depends(get_db)
+):
+    if token is None:
+        return None
     try:
-        return await get_current_user(token)
+        return await get_current_user(token, db)
     except HTTPException:
         return None
 
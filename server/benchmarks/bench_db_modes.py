@@ -0,0 +1,170 @@
+"""
+Week plan reads per second on a single worker, with the previous sync
+session on the event loop versus the AsyncSession the endpoints now use.
+
+Both modes load the same plan through the same query code; only the session
+differs. Each request also runs one ``sleep_ms`` query (``pg_sleep`` on
+PostgreSQL) to stand in for the network round trip to a remote database.
+A sync driver waits for it on the event loop thread, an async driver does
+not, which shows up as loop lag and lost throughput under concurrency.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_db_modes [--requests 200] [--concurrency 20] [--latency-ms 5]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--requests", type=int, default=200)
+parser.add_argument("--concurrency", type=int, default=20)
+parser.add_argument("--latency-ms", type=float, default=5, help="simulated database round trip per request")
+parser.add_argument("--database-url", default=None, help="sync URL of a scratch database (default: temporary SQLite)")
+args = parser.parse_args()
+
+# Configure the app before importing it
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    database_path = os.path.join(tempfile.mkdtemp(), "bench_db_modes.sqlite3")
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+os.environ["MEAL_PLAN_WORKERS"] = "0"
+os.environ["MAINTENANCE_INTERVAL_SECONDS"] = "0"
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import event, func, select
+
+from app import models, schemas
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.endpoints import meal_plans
+from benchmarks.bench_plan_writer import build_plan
+
+logging.disable(logging.INFO)
+
+WEEK = schemas.WeekInfo(week_number=1, year=2030)
+
+
+def _sleep_ms(ms):
+    time.sleep(ms / 1000)
+    return ms
+
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _register_sleep(dbapi_connection, connection_record):
+        dbapi_connection.create_function("sleep_ms", 1, _sleep_ms)
+
+    def latency_query():
+        return select(func.sleep_ms(args.latency_ms))
+else:
+    def latency_query():
+        return select(func.pg_sleep(args.latency_ms / 1000))
+
+
+bench = FastAPI()
+
+
+@bench.get("/sync/{user_id}")
+async def read_week_sync(user_id: int):
+    """The previous behaviour: a sync session used straight from the async endpoint."""
+    with SessionLocal() as db:
+        db.execute(latency_query())
+        return meal_plans._load_week_meal_plan(db, user_id, WEEK.year, WEEK.week_number)[1]
+
+
+@bench.get("/async/{user_id}")
+async def read_week_async(user_id: int):
+    async with AsyncSessionLocal() as db:
+        await db.execute(latency_query())
+        _, plan = await db.run_sync(meal_plans._load_week_meal_plan, user_id, WEEK.year, WEEK.week_number)
+        return plan
+
+
+def create_plans(count: int) -> list:
+    models.Base.metadata.create_all(bind=engine)
+    user_ids = []
+    with SessionLocal() as db:
+        for n in range(count):
+            user = models.User(email=f"bench-db-{n}-{time.time_ns()}@example.com", name="Bench", hashed_password="-", role="user")
+            db.add(user)
+            db.flush()
+            meal_plans.save_meal_plan(db, user.id, WEEK, build_plan(7))
+            user_ids.append(user.id)
+        db.commit()
+    return user_ids
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run_mode(name: str, user_ids: list) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=bench)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def read(n: int):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(f"/{name}/{user_ids[n % len(user_ids)]}")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        # Warm up connections and caches outside the measurement
+        await asyncio.gather(*(read(n) for n in range(args.concurrency)))
+        latencies.clear()
+
+        stop = asyncio.Event()
+        lags = []
+        probe = asyncio.create_task(measure_loop_lag(stop, lags))
+        started = time.perf_counter()
+        await asyncio.gather(*(read(n) for n in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    latencies.sort()
+    return {
+        "mode": name,
+        "requests_per_second": args.requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max_loop_lag_ms": max(lags, default=0) * 1000,
+    }
+
+
+async def main():
+    user_ids = create_plans(args.concurrency)
+    results = [await run_mode("sync", user_ids), await run_mode("async", user_ids)]
+    await async_engine.dispose()
+
+    print(
+        f"{args.requests} week plan reads, concurrency {args.concurrency}, "
+        f"{args.latency_ms:g} ms simulated latency, {engine.dialect.name}"
+    )
+    for result in results:
+        print(
+            f"  {result['mode']:<6} {result['requests_per_second']:>8.1f} req/s"
+            f"  p50 {result['p50_ms']:>7.1f} ms  p95 {result['p95_ms']:>7.1f} ms"
+            f"  max loop lag {result['max_loop_lag_ms']:>7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""
+Logins per second on a single worker, with bcrypt on the event loop versus
+on the password hashing pool.
+
+Requests go through the ASGI app in-process against a throwaway SQLite
+database. Next to the logins, a probe coroutine measures how late the event
+loop wakes it up, which is the stall every other request on the worker sees.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_login [--requests 64] [--concurrency 16] [--rounds 12]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--requests", type=int, default=64)
+parser.add_argument("--concurrency", type=int, default=16)
+parser.add_argument("--rounds", type=int, default=12, help="bcrypt rounds of the stored hashes")
+args = parser.parse_args()
+
+# Configure the app before importing it
+database_path = os.path.join(tempfile.mkdtemp(), "bench_login.sqlite3")
+os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+os.environ["MEAL_PLAN_WORKERS"] = "0"
+os.environ["MAINTENANCE_INTERVAL_SECONDS"] = "0"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import httpx
+
+from app import models, security
+from app.database import SessionLocal
+from app.main import app
+
+logging.disable(logging.INFO)
+
+PASSWORD = "benchmark-password"
+
+
+async def blocking_verify_and_update_password(plain_password, hashed_password):
+    """The previous behaviour: bcrypt runs on the event loop thread."""
+    return security.pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def create_users(count: int):
+    hashed_password = security.get_password_hash(PASSWORD)
+    with SessionLocal() as db:
+        db.add_all([
+            models.User(email=f"bench-{n}@example.com", name="Bench", hashed_password=hashed_password, role="user")
+            for n in range(count)
+        ])
+        db.commit()
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def run_logins(client: httpx.AsyncClient, total: int, concurrency: int) -> list:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login(n: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/auth/token",
+                data={"username": f"bench-{n % concurrency}@example.com", "password": PASSWORD}
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(login(n) for n in range(total)))
+    return latencies
+
+
+async def run_mode(name: str) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        stop = asyncio.Event()
+        lags = []
+        probe = asyncio.create_task(measure_loop_lag(stop, lags))
+        started = time.perf_counter()
+        latencies = await run_logins(client, args.requests, args.concurrency)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    latencies.sort()
+    return {
+        "mode": name,
+        "logins_per_second": args.requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max_loop_lag_ms": max(lags, default=0) * 1000,
+    }
+
+
+async def main():
+    create_users(args.concurrency)
+    offloaded = security.verify_and_update_password
+
+    results = []
+    security.verify_and_update_password = blocking_verify_and_update_password
+    results.append(await run_mode("event loop"))
+    security.verify_and_update_password = offloaded
+    results.append(await run_mode(f"pool ({security.PASSWORD_HASH_WORKERS} threads)"))
+
+    print(f"{args.requests} logins, concurrency {args.concurrency}, bcrypt rounds {args.rounds}")
+    for result in results:
+        print(
+            f"  {result['mode']:<20} {result['logins_per_second']:>7.1f} logins/s"
+            f"  p50 {result['p50_ms']:>7.1f} ms  p95 {result['p95_ms']:>7.1f} ms"
+            f"  max loop lag {result['max_loop_lag_ms']:>7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+"""
+Compare database round trips when persisting a generated meal plan.
+
+The legacy writer flushes after every nutrition, recipe and meal row to get
+its primary key; app.plan_writer inserts each table in one batched statement.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_plan_writer [--days 7] [--runs 20] [--database-url sqlite://]
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.ingredient_resolver import ingredient_id_cache, resolve_ingredient_ids
+from app.plan_writer import write_meal_plan
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+
+
+def build_plan(days: int) -> dict:
+    return {
+        "days": [
+            {
+                "day": day,
+                "meals": {
+                    meal_type: {
+                        "name": f"{meal_type.title()} {day}",
+                        "description": "Benchmark meal",
+                        "servings": 4,
+                        "recipe": {
+                            "servings": 4,
+                            "instructions": ["Prepare", "Cook", "Serve"],
+                            "tips": ["Enjoy"],
+                            "nutrition": {"calories": 500, "protein": 30, "carbs": 50, "fat": 20},
+                            "ingredients": [
+                                {"name": f"Ingredient {(day * 7 + n) % 40}", "amount": 100, "unit": "g"}
+                                for n in range(8)
+                            ]
+                        }
+                    }
+                    for meal_type in MEAL_TYPES
+                }
+            }
+            for day in range(1, days + 1)
+        ]
+    }
+
+
+def legacy_write_meal_plan(db, meal_plan_id: int, meal_plan_data: dict):
+    """The previous per-row writer: one flush per nutrition, recipe and meal."""
+    ingredient_ids = resolve_ingredient_ids(db, [
+        (ingredient_data["name"], ingredient_data["unit"])
+        for day_data in meal_plan_data["days"]
+        for meal_data in day_data["meals"].values()
+        for ingredient_data in meal_data["recipe"]["ingredients"]
+    ])
+    for day_data in meal_plan_data["days"]:
+        for meal_type, meal_data in day_data["meals"].items():
+            recipe_data = meal_data["recipe"]
+            nutrition = models.Nutrition(**recipe_data["nutrition"])
+            db.add(nutrition)
+            db.flush()
+
+            recipe = models.Recipe(
+                servings=recipe_data["servings"],
+                instructions="\n".join(recipe_data["instructions"]),
+                tips="\n".join(recipe_data["tips"]),
+                nutrition_id=nutrition.id
+            )
+            db.add(recipe)
+            db.flush()
+
+            meal = models.Meal(name=meal_data["name"], recipe_id=recipe.id, servings=meal_data["servings"])
+            db.add(meal)
+            db.flush()
+
+            for ingredient_data in recipe_data["ingredients"]:
+                db.add(models.RecipeIngredient(
+                    recipe_id=recipe.id,
+                    ingredient_id=ingredient_ids[ingredient_data["name"]],
+                    amount=ingredient_data["amount"],
+                    unit=ingredient_data["unit"]
+                ))
+
+            db.add(models.DailyMeal(
+                meal_plan_id=meal_plan_id,
+                day_of_week=(day_data["day"] - 1) % 7,
+                meal_type=meal_type,
+                meal_id=meal.id
+            ))
+    db.flush()
+
+
+def run(writer, session_factory, counter: dict, plan: dict, runs: int) -> dict:
+    statements = []
+    durations = []
+    for run_index in range(runs):
+        with session_factory() as db:
+            user = models.User(email=f"bench-{writer.__name__}-{run_index}@example.com", name="Bench")
+            db.add(user)
+            db.flush()
+            meal_plan = models.MealPlan(user_id=user.id, week_number=1 + run_index % 52, year=2000 + run_index)
+            db.add(meal_plan)
+            db.flush()
+
+            # Ingredients are resolved the same way by both writers; start each run cold
+            ingredient_id_cache.clear()
+            counter["statements"] = 0
+            started = time.perf_counter()
+            writer(db, meal_plan.id, plan)
+            durations.append(time.perf_counter() - started)
+            statements.append(counter["statements"])
+            db.rollback()
+    return {
+        "statements": statistics.median(statements),
+        "median_ms": statistics.median(durations) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    models.Base.metadata.create_all(engine)
+    counter = {"statements": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*_):
+        counter["statements"] += 1
+
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    plan = build_plan(args.days)
+    meals = args.days * len(MEAL_TYPES)
+
+    print(f"Persisting a {args.days}-day plan ({meals} meals), median of {args.runs} runs")
+    for writer in (legacy_write_meal_plan, write_meal_plan):
+        result = run(writer, session_factory, counter, plan, args.runs)
+        print(f"  {writer.__name__:<24} {result['statements']:>6.0f} statements  {result['median_ms']:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+End-to-end load test against a running API.
+
+Logs in a pool of subscriber users, gives each one a meal plan for the
+current week, then sends a weighted mix of logins, meal plan generations and
+meal plan / shopping list reads at a fixed request rate. Requests are started
+on schedule whether or not earlier ones have finished, and latency is
+measured from the scheduled start, so a stalled server shows up in the
+percentiles instead of silently lowering the rate.
+
+Run the app against the OpenRouter stub so generations cost nothing:
+
+    python -m benchmarks.stub_openrouter --latency-ms 800 &
+    OPENROUTER_BASE_URL=http://localhost:8001/api/v1 uvicorn app.main:app &
+    python -m benchmarks.load_test [--rate 20] [--duration 60] [--users 20] [--mix token=1,generate=1,current=10,shopping=10]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+PASSWORD = "load-test-password"
+
+ENDPOINTS = {
+    "token": ("POST", "/api/auth/token"),
+    "generate": ("POST", "/api/meal-plans/generate"),
+    "current": ("GET", "/api/meal-plans/current"),
+    "shopping": ("GET", "/api/shopping-list/current"),
+}
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split("=", 1)
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}, expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class User:
+    def __init__(self, email: str):
+        self.email = email
+        self.token = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+async def login(client: httpx.AsyncClient, user: User) -> httpx.Response:
+    response = await client.post("/api/auth/token", data={"username": user.email, "password": PASSWORD})
+    if response.status_code == 200:
+        user.token = response.json()["access_token"]
+    return response
+
+
+async def generate(client: httpx.AsyncClient, user: User) -> httpx.Response:
+    return await client.post(
+        "/api/meal-plans/generate",
+        json={"preferences": {"meal_types": ["dinner"]}},
+        headers=user.headers
+    )
+
+
+async def send(client: httpx.AsyncClient, name: str, user: User) -> httpx.Response:
+    if name == "token":
+        return await login(client, user)
+    if name == "generate":
+        return await generate(client, user)
+    _, path = ENDPOINTS[name]
+    return await client.get(path, headers=user.headers)
+
+
+async def setup_users(client: httpx.AsyncClient, count: int, concurrency: int) -> List[User]:
+    run_id = int(time.time())
+    users = [User(f"load-{run_id}-{n}@example.com") for n in range(count)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def prepare(user: User):
+        async with semaphore:
+            # The endpoint requires a current_user body field; null counts as missing
+            response = await client.post("/api/auth/register", json={
+                "user": {"email": user.email, "password": PASSWORD, "name": "Load test", "role": "subscriber"},
+                "current_user": {}
+            })
+            response.raise_for_status()
+            (await login(client, user)).raise_for_status()
+            (await generate(client, user)).raise_for_status()
+
+    await asyncio.gather(*(prepare(user) for user in users))
+    return users
+
+
+async def run_load(client: httpx.AsyncClient, users: List[User], mix: Dict[str, float],
+                   rate: float, duration: float) -> Tuple[Dict[str, List], float]:
+    """(latency, ok) samples per endpoint, and the seconds until the last request finished."""
+    results = {name: [] for name in mix}
+    names, weights = list(mix), list(mix.values())
+    total = int(rate * duration)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def request(n: int, name: str, user: User):
+        scheduled = started + n / rate
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        try:
+            response = await send(client, name, user)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        results[name].append((loop.time() - scheduled, ok))
+
+    await asyncio.gather(*(
+        request(n, random.choices(names, weights)[0], random.choice(users))
+        for n in range(total)
+    ))
+    return results, loop.time() - started
+
+
+def summarize(results: Dict[str, List], elapsed: float) -> Dict:
+    summary = {"elapsed_seconds": elapsed, "endpoints": {}}
+    everything = []
+    for name, samples in list(results.items()) + [("all", None)]:
+        if samples is None:
+            samples = everything
+        else:
+            everything.extend(samples)
+        latencies = sorted(latency for latency, _ in samples)
+        summary["endpoints"][name] = {
+            "requests": len(samples),
+            "errors": sum(1 for _, ok in samples if not ok),
+            "throughput_per_second": len(samples) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rate", type=float, default=20, help="requests started per second")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of load after setup")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("token=1,generate=1,current=10,shopping=10"),
+                        help="relative weight of each endpoint")
+    parser.add_argument("--timeout", type=float, default=300, help="per-request timeout in seconds")
+    parser.add_argument("--json", dest="json_path", help="also write the summary to this file")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        setup_started = time.perf_counter()
+        users = await setup_users(client, args.users, concurrency=10)
+        print(f"Set up {len(users)} users with a meal plan each in {time.perf_counter() - setup_started:.1f}s")
+        results, elapsed = await run_load(client, users, args.mix, args.rate, args.duration)
+
+    summary = summarize(results, elapsed)
+    summary.update({"rate": args.rate, "duration": args.duration, "users": args.users, "mix": args.mix})
+
+    print(f"{args.rate:g} req/s for {args.duration:g}s against {args.base_url}, finished in {summary['elapsed_seconds']:.1f}s")
+    for name, endpoint in summary["endpoints"].items():
+        print(
+            f"  {name:<9} {endpoint['requests']:>6} req  {endpoint['errors']:>5} err"
+            f"  {endpoint['throughput_per_second']:>7.1f} req/s"
+            f"  p50 {endpoint['p50_ms']:>8.1f} ms  p95 {endpoint['p95_ms']:>8.1f} ms  p99 {endpoint['p99_ms']:>8.1f} ms"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
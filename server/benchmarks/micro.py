@@ -0,0 +1,266 @@
+"""
+Micro-benchmarks of the CPU-bound hot paths: ingredient parsing, shopping
+list aggregation, ingredient categories, week plan rendering and the JSON
+encoding of OpenRouter request bodies.
+
+Each benchmark is timed with timeit: the loop count is chosen so one repeat
+takes at least 0.2 s, and the per-call time of every repeat is recorded.
+Results can be written to JSON and compared between commits; the median is
+compared, and benchmarks that got slower by more than the threshold are
+flagged (exit status 1).
+
+Run from the server directory:
+
+    python -m benchmarks.micro [--repeat 7] [--filter render] [--output before.json]
+    python -m benchmarks.micro --output after.json --compare before.json
+    python -m benchmarks.micro --compare before.json after.json [--threshold 0.1]
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from typing import Callable, Dict
+
+from sqlalchemy import select
+
+# Configure the app before importing it
+database_path = os.path.join(tempfile.mkdtemp(), "bench_micro.sqlite3")
+os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from app import models, schemas
+from app.database import SessionLocal, engine
+from app.endpoints import meal_plans
+from app.ingredient_resolver import resolve_ingredient_ids
+from app.llm_cache import make_cache_key
+from app.openrouter_client import MEAL_PLAN_SCHEMA, MODEL, RECIPE_SCHEMA, OpenRouterClient, completion_request_body
+from benchmarks.bench_plan_writer import build_plan
+
+logging.disable(logging.INFO)
+
+WEEK = schemas.WeekInfo(week_number=1, year=2030)
+
+INGREDIENT_STRINGS = [
+    "200 g chicken breast", "2 cups milk", "1.5 tbsp olive oil", "3 pieces garlic",
+    "500 grams potatoes", "1 tsp salt", "250 ml cream", "4 stk eggs",
+    "salt to taste", "a handful of basil", "2 pounds beef", "8 oz cheddar cheese",
+]
+
+RAW_INGREDIENTS = [
+    {"name": "chicken breast", "amount": 200, "unit": "g", "notes": ""},
+    {"name": "rice", "amount": 300, "unit": "g"},
+    {"name": "milk", "unit": "2 cups"},
+    {"name": "olive oil", "unit": "1 tbsp"},
+    {"name": "onion"},
+    {"name": "tomato", "amount": "4", "unit": "pieces", "notes": "diced"},
+    "3 pieces garlic",
+    "salt to taste",
+    {"name": "pasta", "amount": 400, "unit": "g", "notes": ""},
+    {"name": "butter", "unit": "50g"},
+]
+
+INGREDIENT_NAMES = [
+    "Chicken breast", "Ground beef", "Salmon fillet", "Tofu", "Eggs",
+    "Carrot", "Red onion", "Garlic", "Bell pepper", "Cherry tomatoes",
+    "Apple", "Banana", "Blueberries", "Whole milk", "Greek yogurt",
+    "Parmesan cheese", "Basmati rice", "Spaghetti pasta", "Sourdough bread", "Flour",
+    "Sea salt", "Fresh herbs", "Olive oil", "Soy sauce", "Chicken stock",
+    "Quinoa", "Lentils", "Spinach", "Zucchini", "Coriander",
+]
+
+PROMPT = "Create a recipe for Dinner 1 that matches these preferences:\nDietary restrictions: None\nCuisine: Any"
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    """Register a setup function that returns the callable to time."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark("parse_ingredient_string")
+def bench_parse_ingredient_string():
+    client = OpenRouterClient()
+    return lambda: [client.parse_ingredient_string(text) for text in INGREDIENT_STRINGS]
+
+
+@benchmark("process_ingredients")
+def bench_process_ingredients():
+    client = OpenRouterClient()
+    # process_ingredients updates the dicts it is given, so every call gets fresh copies
+    return lambda: client.process_ingredients([dict(i) if isinstance(i, dict) else i for i in RAW_INGREDIENTS])
+
+
+@benchmark("get_ingredient_category")
+def bench_get_ingredient_category():
+    return lambda: [meal_plans.get_ingredient_category(name) for name in INGREDIENT_NAMES]
+
+
+def saved_plan_id() -> int:
+    """A committed seven day plan with three meals a day, created on first use."""
+    with SessionLocal() as db:
+        meal_plan_id = db.scalar(select(models.MealPlan.id).where(
+            models.MealPlan.year == WEEK.year, models.MealPlan.week_number == WEEK.week_number
+        ))
+        if meal_plan_id is None:
+            user = models.User(email="bench-micro@example.com", name="Bench", hashed_password="-", role="user")
+            db.add(user)
+            db.flush()
+            meal_plan_id = meal_plans.save_meal_plan(db, user.id, WEEK, build_plan(7)).id
+            db.commit()
+        return meal_plan_id
+
+
+@benchmark("create_shopping_items (sqlite, 21 meals)")
+def bench_create_shopping_items():
+    plan = build_plan(7)
+    recipe_data = {"recipe": {"ingredientDetails": [
+        ingredient
+        for day in plan["days"]
+        for meal in day["meals"].values()
+        for ingredient in meal["recipe"]["ingredients"]
+    ]}}
+    meal_plan_id = saved_plan_id()
+    db = SessionLocal()
+    # Ingredients exist and are cached, as they are for a warm worker
+    resolve_ingredient_ids(db, [(i["name"], i["unit"]) for i in recipe_data["recipe"]["ingredientDetails"]])
+    db.commit()
+
+    def run():
+        meal_plans.create_shopping_items(db, meal_plan_id, recipe_data)
+        db.rollback()
+    return run
+
+
+@benchmark("render_week_meal_plan (21 meals)")
+def bench_render_week_meal_plan():
+    # Only the rendering is timed; the meal graph is loaded once up front
+    with SessionLocal() as db:
+        daily_meals = meal_plans._load_daily_meals(db, saved_plan_id())
+    return lambda: meal_plans.render_week_meal_plan(WEEK.year, WEEK.week_number, daily_meals)
+
+
+@benchmark("completion body json (recipe)")
+def bench_recipe_body():
+    return lambda: json.dumps(completion_request_body("recipe", RECIPE_SCHEMA, PROMPT)).encode("utf-8")
+
+
+@benchmark("completion body json (meal_plan)")
+def bench_meal_plan_body():
+    return lambda: json.dumps(completion_request_body("meal_plan", MEAL_PLAN_SCHEMA, PROMPT)).encode("utf-8")
+
+
+@benchmark("make_cache_key (recipe)")
+def bench_make_cache_key():
+    return lambda: make_cache_key(PROMPT, "en", MODEL, RECIPE_SCHEMA)
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    # autorange stops at >= 0.2 s per loop; use the same count for every repeat
+    per_call = [total / number * 1e6 for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_us": min(per_call),
+        "median_us": statistics.median(per_call),
+        "mean_us": statistics.fmean(per_call),
+        "stdev_us": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(pattern: str, repeat: int) -> Dict:
+    models.Base.metadata.create_all(bind=engine)
+    selected = {name: setup for name, setup in BENCHMARKS.items() if pattern in name}
+    print(f"Running {len(selected)} benchmarks, {repeat} repeats each")
+    results = {}
+    for name, setup in selected.items():
+        results[name] = measure(setup(), repeat)
+        print(f"  {name:<42} {results[name]['median_us']:>10.1f} us  (min {results[name]['min_us']:.1f}, "
+              f"stdev {results[name]['stdev_us']:.1f}, {results[name]['number']} loops x {repeat})")
+    return {
+        "metadata": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        },
+        "benchmarks": results,
+    }
+
+
+def compare(old: Dict, new: Dict, threshold: float) -> bool:
+    """Print the change in median per benchmark; True when something regressed past ``threshold``."""
+    print(f"{old['metadata']['commit']} -> {new['metadata']['commit']} (median per call)")
+    regressed = False
+    for name, result in new["benchmarks"].items():
+        before = old["benchmarks"].get(name)
+        if before is None:
+            print(f"  {name:<42} {result['median_us']:>10.1f} us  (new)")
+            continue
+        change = result["median_us"] / before["median_us"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"  {name:<42} {before['median_us']:>10.1f} -> {result['median_us']:>10.1f} us  {change:>+7.1%}{flag}")
+    return regressed
+
+
+def load(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs="+", metavar="RESULTS",
+                        help="compare this run with a results file, or two results files without running")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes one or two results files")
+
+    if args.compare and len(args.compare) == 2:
+        new = load(args.compare[1])
+    else:
+        new = run(args.filter, args.repeat)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(new, f, indent=2)
+
+    if args.compare:
+        sys.exit(1 if compare(load(args.compare[0]), new, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Stand-in for the OpenRouter chat completions API, for load tests that should
+not spend money or depend on the real service.
+
+Answers ``POST /api/v1/chat/completions`` with content that matches the
+``recipe`` and ``meal_plan`` schemas the app sends, after a configurable
+latency, and fails a configurable share of the requests. Some planned meals
+are leftovers of the same meal the day before, so leftover chains occur too.
+Point the app at it with ``OPENROUTER_BASE_URL``:
+
+    python -m benchmarks.stub_openrouter [--port 8001] [--latency-ms 800] [--jitter-ms 200] [--error-rate 0.01]
+    OPENROUTER_BASE_URL=http://localhost:8001/api/v1 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Dict, List
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+
+# Shared between meals so the shopping list has something to aggregate
+INGREDIENTS = [
+    ("chicken breast", 500, "g"),
+    ("rice", 300, "g"),
+    ("onion", 2, "pieces"),
+    ("garlic", 3, "pieces"),
+    ("olive oil", 2, "tbsp"),
+    ("tomato", 4, "pieces"),
+    ("milk", 250, "ml"),
+    ("egg", 4, "pieces"),
+    ("pasta", 400, "g"),
+    ("cheddar cheese", 100, "g"),
+    ("spinach", 200, "g"),
+    ("salmon", 400, "g"),
+    ("potato", 600, "g"),
+    ("carrot", 3, "pieces"),
+    ("butter", 50, "g"),
+    ("lemon", 1, "pieces"),
+]
+
+
+class StubSettings:
+    latency_ms = 800.0
+    jitter_ms = 200.0
+    error_rate = 0.0
+    error_status = 500
+    leftover_rate = 0.2
+
+
+settings = StubSettings()
+rng = random.Random()
+app = FastAPI(title="OpenRouter stub")
+stats = {"requests": 0, "errors": 0}
+
+
+def pick_ingredients(rng: random.Random, count: int) -> List[Dict]:
+    return [
+        {"name": name, "amount": amount, "unit": unit, "notes": ""}
+        for name, amount, unit in rng.sample(INGREDIENTS, count)
+    ]
+
+
+def fake_meal(rng: random.Random, meal_type: str, day: int) -> Dict:
+    return {
+        "name": f"{meal_type.title()} {day}",
+        "servings": 4,
+        "prep_time": rng.randint(5, 30),
+        "cook_time": rng.randint(10, 60),
+        "difficulty": rng.choice(["easy", "medium", "hard"]),
+        "leftover_from": None,
+        "makes_leftovers_for": None,
+        "ingredients": pick_ingredients(rng, 5),
+    }
+
+
+def fake_meal_plan(rng: random.Random, prompt: str) -> Dict:
+    # "Create a 7-day ...", "Lag en 7-dagers ...", "Lav en 7-dages ..."
+    days_match = re.search(r"(\d+)-(?:day|dag)", prompt)
+    days = int(days_match.group(1)) if days_match else 7
+    types_match = re.search(r"Please only generate meals for: (.+)$", prompt)
+    meal_types = [t.strip() for t in types_match.group(1).split(",")] if types_match else ["dinner"]
+
+    plan = {
+        "days": [
+            {
+                "day": day,
+                "meals": {
+                    # dinner is not nullable in the schema
+                    meal_type: fake_meal(rng, meal_type, day)
+                    if meal_type in meal_types or meal_type == "dinner" else None
+                    for meal_type in MEAL_TYPES
+                },
+            }
+            for day in range(1, days + 1)
+        ]
+    }
+
+    # Eat some meals again the next day; consecutive leftovers form a chain
+    for previous_day, day in zip(plan["days"], plan["days"][1:]):
+        for meal_type, meal in day["meals"].items():
+            source = previous_day["meals"][meal_type]
+            if meal and source and rng.random() < settings.leftover_rate:
+                meal["leftover_from"] = previous_day["day"]
+                source["makes_leftovers_for"] = day["day"]
+    return plan
+
+
+def fake_recipe(rng: random.Random) -> Dict:
+    return {
+        "name": f"Stub recipe {rng.randint(1, 10_000)}",
+        "description": "Generated by the OpenRouter stub",
+        "emoji": "🍲",
+        "servings": 4,
+        "prep_time": rng.randint(5, 30),
+        "cook_time": rng.randint(10, 60),
+        "difficulty": rng.choice(["easy", "medium", "hard"]),
+        "ingredients": pick_ingredients(rng, rng.randint(4, 8)),
+        "instructions": ["Prepare the ingredients", "Cook", "Serve"],
+        "tips": ["Season to taste"],
+        "nutrition": {
+            "calories": rng.randint(300, 900),
+            "protein": rng.randint(10, 50),
+            "carbs": rng.randint(20, 100),
+            "fat": rng.randint(5, 40),
+        },
+    }
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    delay = max(0.0, settings.latency_ms + rng.uniform(-settings.jitter_ms, settings.jitter_ms))
+    await asyncio.sleep(delay / 1000)
+
+    if rng.random() < settings.error_rate:
+        stats["errors"] += 1
+        return JSONResponse(
+            status_code=settings.error_status,
+            content={"error": {"message": "Injected by the OpenRouter stub", "code": settings.error_status}}
+        )
+
+    schema_name = body.get("response_format", {}).get("json_schema", {}).get("name")
+    prompt = body["messages"][-1]["content"]
+    if schema_name == "meal_plan":
+        content = fake_meal_plan(rng, prompt)
+    elif schema_name == "recipe":
+        content = fake_recipe(rng)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown schema: {schema_name}")
+
+    content_json = json.dumps(content, ensure_ascii=False)
+    return {
+        "id": f"stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "model": body.get("model"),
+        "choices": [
+            {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content_json}}
+        ],
+        "usage": {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(content_json) // 4,
+            "total_tokens": len(prompt) // 4 + len(content_json) // 4,
+        },
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=800, help="mean time before each completion is returned")
+    parser.add_argument("--jitter-ms", type=float, default=200, help="latency varies uniformly by up to this much")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=500, help="e.g. 429 to simulate rate limiting")
+    parser.add_argument("--leftover-rate", type=float, default=0.2, help="share of meals planned as leftovers")
+    parser.add_argument("--seed", type=int, default=None, help="make latencies, errors and content repeatable")
+    args = parser.parse_args()
+
+    settings.latency_ms = args.latency_ms
+    settings.jitter_ms = args.jitter_ms
+    settings.error_rate = args.error_rate
+    settings.error_status = args.error_status
+    settings.leftover_rate = args.leftover_rate
+    rng.seed(args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
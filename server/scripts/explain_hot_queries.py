@@ -0,0 +1,92 @@
+"""
+Print the database's query plans for the hot meal plan and shopping list queries.
+
+Each plan should use one of the access path indexes rather than a sequential
+scan once the tables hold real data. Run from the server directory against
+the database in DATABASE_URL:
+
+    python -m scripts.explain_hot_queries [--user-id 1] [--analyze]
+"""
+import argparse
+
+from sqlalchemy import select, text
+
+from app import models
+from app.database import engine
+
+
+def hot_queries(user_id: int, meal_plan_id: int, recipe_ids: list, ingredient_ids: list) -> dict:
+    return {
+        "latest meal plan of a user": select(models.MealPlan).where(
+            models.MealPlan.user_id == user_id
+        ).order_by(models.MealPlan.created_at.desc()).limit(1),
+        "meal plan of a week": select(models.MealPlan).where(
+            models.MealPlan.user_id == user_id,
+            models.MealPlan.week_number == 1,
+            models.MealPlan.year == 2025
+        ),
+        "daily meals of a plan": select(models.DailyMeal).where(
+            models.DailyMeal.meal_plan_id == meal_plan_id
+        ).order_by(models.DailyMeal.day_of_week),
+        "daily meal by day and type": select(models.DailyMeal).where(
+            models.DailyMeal.meal_plan_id == meal_plan_id,
+            models.DailyMeal.day_of_week == 0,
+            models.DailyMeal.meal_type == "dinner"
+        ),
+        "ingredients of recipes": select(models.RecipeIngredient).where(
+            models.RecipeIngredient.recipe_id.in_(recipe_ids)
+        ),
+        "shopping list of a plan": select(models.ShoppingItem).where(
+            models.ShoppingItem.meal_plan_id == meal_plan_id
+        ),
+        "shopping items for a delta": select(models.ShoppingItem).where(
+            models.ShoppingItem.meal_plan_id == meal_plan_id,
+            models.ShoppingItem.ingredient_id.in_(ingredient_ids)
+        ),
+    }
+
+
+def sample_ids(connection, user_id: int):
+    """Pick real ids from the latest plan of the user so the plans reflect actual data."""
+    meal_plan_id = connection.execute(
+        select(models.MealPlan.id).where(models.MealPlan.user_id == user_id)
+        .order_by(models.MealPlan.created_at.desc()).limit(1)
+    ).scalar() or 1
+    recipe_ids = list(connection.execute(
+        select(models.Meal.recipe_id).join(models.DailyMeal, models.DailyMeal.meal_id == models.Meal.id)
+        .where(models.DailyMeal.meal_plan_id == meal_plan_id).limit(21)
+    ).scalars()) or [1]
+    ingredient_ids = list(connection.execute(
+        select(models.ShoppingItem.ingredient_id).where(models.ShoppingItem.meal_plan_id == meal_plan_id).limit(5)
+    ).scalars()) or [1]
+    return meal_plan_id, recipe_ids, ingredient_ids
+
+
+def explain_prefix(dialect_name: str, analyze: bool) -> str:
+    if dialect_name == "sqlite":
+        return "EXPLAIN QUERY PLAN"
+    if dialect_name == "postgresql":
+        return "EXPLAIN (ANALYZE, BUFFERS)" if analyze else "EXPLAIN"
+    return "EXPLAIN"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--analyze", action="store_true", help="Execute the queries (PostgreSQL only)")
+    args = parser.parse_args()
+
+    prefix = explain_prefix(engine.dialect.name, args.analyze)
+    with engine.connect() as connection:
+        meal_plan_id, recipe_ids, ingredient_ids = sample_ids(connection, args.user_id)
+        for title, query in hot_queries(args.user_id, meal_plan_id, recipe_ids, ingredient_ids).items():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            print(f"== {title}")
+            for row in connection.execute(text(f"{prefix} {sql}")):
+                # SQLite returns (id, parent, notused, detail); other databases one column of text
+                print(f"   {row[-1]}")
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Fixtures for tests that drive the API through TestClient.
+
+The app runs against a throwaway SQLite database, and both OpenRouter clients
+talk to benchmarks.stub_openrouter in-process without latency. Caches that
+would hide statements from the query budgets are off or cleared.
+
+Run from the server directory:
+
+    python -m pytest
+"""
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+# Configure the app before importing it
+database_path = os.path.join(tempfile.mkdtemp(), "tests.sqlite3")
+os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["WEEK_PLAN_CACHE_BACKEND"] = "none"
+os.environ["MEAL_PLAN_WORKERS"] = "0"
+os.environ["MAINTENANCE_INTERVAL_SECONDS"] = "0"
+os.environ["QUERY_BUDGET_MODE"] = "off"
+os.environ["METRICS_ENABLED"] = "false"
+os.environ["LOG_FILE"] = ""
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ.setdefault("SECRET_KEY", "tests")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("OPENROUTER_API_KEY", "tests")
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models, security
+from app.database import SessionLocal
+from app.endpoints import meal_plans, recipes
+from app.ingredient_resolver import ingredient_id_cache
+from app.main import app
+from app.query_budget import QUERY_BUDGETS, query_budget as check_query_budget
+from benchmarks import stub_openrouter
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+PASSWORD = "test-password"
+
+
+def week_plan_data() -> dict:
+    """A generated plan with all three meals on all seven days, each with ingredients and nutrition."""
+    return {
+        "days": [
+            {
+                "day": day,
+                "meals": {
+                    meal_type: {
+                        "name": f"{meal_type.title()} {day}",
+                        "description": "Test meal",
+                        "servings": 4,
+                        "recipe": {
+                            "servings": 4,
+                            "prep_time": 10,
+                            "cook_time": 20,
+                            "difficulty": "easy",
+                            "instructions": ["Prepare", "Cook", "Serve"],
+                            "tips": ["Enjoy"],
+                            "nutrition": {"calories": 500, "protein": 30, "carbs": 50, "fat": 20},
+                            "ingredients": [
+                                {"name": f"Test ingredient {(day * 3 + n) % 12}", "amount": 100, "unit": "g"}
+                                for n in range(5)
+                            ]
+                        }
+                    }
+                    for meal_type in MEAL_TYPES
+                }
+            }
+            for day in range(1, 8)
+        ]
+    }
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def openrouter_stub(monkeypatch):
+    monkeypatch.setattr(stub_openrouter.settings, "latency_ms", 0.0)
+    monkeypatch.setattr(stub_openrouter.settings, "jitter_ms", 0.0)
+    monkeypatch.setattr(stub_openrouter.settings, "error_rate", 0.0)
+    for openrouter_client in (meal_plans.openrouter_client, recipes.openrouter_client):
+        transport = httpx.ASGITransport(app=stub_openrouter.app)
+        monkeypatch.setattr(openrouter_client, "_http_client", httpx.AsyncClient(transport=transport))
+
+
+@pytest.fixture
+def user() -> dict:
+    """A new subscriber; ``headers`` authenticate requests as them."""
+    email = f"test-{uuid.uuid4().hex}@example.com"
+    with SessionLocal() as db:
+        db_user = models.User(
+            email=email, name="Test", hashed_password=security.get_password_hash(PASSWORD), role="subscriber"
+        )
+        db.add(db_user)
+        db.commit()
+        user_id = db_user.id
+    token = security.create_access_token({"sub": str(user_id)})
+    return {"id": user_id, "email": email, "password": PASSWORD, "headers": {"Authorization": f"Bearer {token}"}}
+
+
+@pytest.fixture
+def week_plan() -> dict:
+    """The generated data of the meal_plan fixture; change it before that fixture saves it."""
+    return week_plan_data()
+
+
+@pytest.fixture
+def meal_plan(user, week_plan) -> models.MealPlan:
+    """The user's plan for the current week, saved the way a generated plan is."""
+    week_info = meal_plans.get_current_week_info()
+    with SessionLocal() as db:
+        plan = meal_plans.save_meal_plan(db, user["id"], week_info, week_plan)
+        db.commit()
+        db.refresh(plan)
+        db.expunge(plan)
+    return plan
+
+
+@pytest.fixture
+def query_budget():
+    """Fail the test when the requests inside the block exceed their route's budget in QUERY_BUDGETS.
+
+        with query_budget("GET /api/meal-plans/current"):
+            client.get("/api/meal-plans/current", headers=user["headers"])
+
+    The failure lists every statement shape that repeated, the usual sign of an N+1.
+    """
+    @contextmanager
+    def check(route: str):
+        # The budgets are measured with cold caches
+        security.user_role_cache.clear()
+        ingredient_id_cache.clear()
+        with check_query_budget(QUERY_BUDGETS[route], route) as recorder:
+            yield recorder
+
+    return check
@@ -0,0 +1,48 @@
+"""
+Meal plan jobs are claimed, handed out again once stale, and completed only by their current worker.
+"""
+import json
+from datetime import datetime, timedelta
+
+from app import jobs, models
+from app.database import SessionLocal
+from app.endpoints import meal_plans
+
+
+def test_stale_job_is_completed_by_the_worker_that_reclaimed_it(user, week_plan):
+    week_info = meal_plans.get_current_week_info()
+    with SessionLocal() as db:
+        # Older than any job other tests leave behind, so it is claimed first
+        job = models.MealPlanJob(
+            user_id=user["id"], week_number=week_info.week_number, year=week_info.year,
+            preferences=json.dumps({}), status=jobs.JOB_PENDING, created_at=datetime(2000, 1, 1)
+        )
+        db.add(job)
+        db.commit()
+        job_id = job.id
+
+    first_claim = jobs.claim_next_job("worker-a")
+    assert first_claim["id"] == job_id
+
+    # Worker A stops reporting progress
+    with SessionLocal() as db:
+        stale_at = datetime.utcnow() - timedelta(seconds=jobs.MEAL_PLAN_JOB_STALE_SECONDS + 1)
+        db.query(models.MealPlanJob).filter(models.MealPlanJob.id == job_id).update({"heartbeat_at": stale_at})
+        db.commit()
+
+    second_claim = jobs.claim_next_job("worker-b")
+    assert second_claim["id"] == job_id
+
+    # Worker A finishing late saves nothing
+    assert not jobs._complete_job(first_claim, "worker-a", week_plan)
+    with SessionLocal() as db:
+        job = db.get(models.MealPlanJob, job_id)
+        assert (job.status, job.worker_id, job.attempts, job.meal_plan_id) == (jobs.JOB_RUNNING, "worker-b", 2, None)
+        assert db.query(models.MealPlan).filter(models.MealPlan.user_id == user["id"]).count() == 0
+
+    assert jobs._complete_job(second_claim, "worker-b", week_plan)
+    with SessionLocal() as db:
+        job = db.get(models.MealPlanJob, job_id)
+        plan_ids = [plan_id for plan_id, in db.query(models.MealPlan.id).filter(models.MealPlan.user_id == user["id"])]
+        assert job.status == jobs.JOB_COMPLETED
+        assert plan_ids == [job.meal_plan_id]
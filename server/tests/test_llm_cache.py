@@ -0,0 +1,88 @@
+"""
+The LLM response cache expires entries after their TTL and evicts the least recently used ones when full.
+"""
+import pytest
+
+from app import llm_cache
+from app.llm_cache import LLMResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def statements() -> list:
+    return []
+
+
+@pytest.fixture
+def make_cache(tmp_path, statements):
+    def make(**options) -> LLMResponseCache:
+        cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite3"), **options)
+        cache._conn.set_trace_callback(statements.append)
+        return cache
+    return make
+
+
+def test_entry_expires_after_its_ttl(clock, make_cache):
+    cache = make_cache(ttl_seconds=60)
+    cache.set("key", "value")
+
+    clock.now += 60
+    assert cache.get("key") == "value"
+
+    clock.now += 1
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_sweep_removes_expired_entries(clock, make_cache):
+    cache = make_cache(ttl_seconds=60, evict_interval_seconds=30)
+    cache.set("old", "value")
+
+    clock.now += 61
+    cache.set("new", "value")
+    assert cache.stats()["entries"] == 1
+    assert cache.get("new") == "value"
+
+
+def test_least_recently_used_entries_are_evicted_when_full(clock, make_cache):
+    cache = make_cache(max_bytes=250)
+    for key in ("a", "b"):
+        clock.now += 1
+        cache.set(key, key * 100)
+    # Reading "a" makes "b" the least recently used entry
+    clock.now += 1
+    assert cache.get("a") == "a" * 100
+
+    clock.now += 1
+    cache.set("c", "c" * 100)
+    assert cache.get("b") is None
+    assert cache.get("a") == "a" * 100
+    assert cache.get("c") == "c" * 100
+    assert cache.stats()["bytes"] == 200
+
+
+def test_writes_below_the_limit_do_not_scan_the_table(clock, make_cache, statements):
+    cache = make_cache(max_bytes=1000, evict_interval_seconds=60)
+    statements.clear()
+    for key in ("a", "b", "c"):
+        clock.now += 1
+        cache.set(key, "value")
+    assert not [statement for statement in statements if "SUM(size)" in statement]
+
+    clock.now += 60
+    cache.set("d", "value")
+    assert [statement for statement in statements if "SUM(size)" in statement]
@@ -0,0 +1,56 @@
+"""
+Leftover meals reuse the recipe of the meal they were cooked with.
+"""
+import asyncio
+
+from app.endpoints import meal_plans
+from app.openrouter_client import OpenRouterClient
+from benchmarks import stub_openrouter
+
+
+def plan(*dinners) -> dict:
+    """A plan with one dinner per day; each argument is the day that dinner is a leftover of, or None."""
+    return {
+        "days": [
+            {"day": day, "meals": {"dinner": {"name": f"Dinner {day}", "leftover_from": leftover_from}}}
+            for day, leftover_from in enumerate(dinners, start=1)
+        ]
+    }
+
+
+def dinner(meal_plan: dict, day: int) -> dict:
+    return meal_plan["days"][day - 1]["meals"]["dinner"]
+
+
+def test_cooked_meal_is_its_own_source():
+    meal_plan = plan(None, 1)
+    assert OpenRouterClient()._find_leftover_source(meal_plan, "dinner", dinner(meal_plan, 1)) is dinner(meal_plan, 1)
+
+
+def test_chained_leftover_leads_to_the_cooked_meal():
+    meal_plan = plan(None, 1, 2)
+    assert OpenRouterClient()._find_leftover_source(meal_plan, "dinner", dinner(meal_plan, 3)) is dinner(meal_plan, 1)
+
+
+def test_leftover_loop_has_no_source():
+    meal_plan = plan(2, 1, 3)
+    client = OpenRouterClient()
+    assert client._find_leftover_source(meal_plan, "dinner", dinner(meal_plan, 1)) is None
+    assert client._find_leftover_source(meal_plan, "dinner", dinner(meal_plan, 3)) is None
+
+
+def test_leftover_of_a_missing_day_has_no_source():
+    meal_plan = plan(None, 9)
+    assert OpenRouterClient()._find_leftover_source(meal_plan, "dinner", dinner(meal_plan, 2)) is None
+
+
+def test_leftovers_share_the_recipe_of_their_source(monkeypatch):
+    # Every dinner after the first is a leftover of the day before
+    monkeypatch.setattr(stub_openrouter.settings, "leftover_rate", 1.0)
+
+    generated = asyncio.run(meal_plans.openrouter_client.generate_meal_plan({"meal_types": ["dinner"]}, days=3))
+
+    dinners = [day["meals"]["dinner"] for day in generated["days"]]
+    assert [meal["leftover_from"] for meal in dinners] == [None, 1, 2]
+    assert dinners[0]["recipe"]
+    assert all(meal["recipe"] == dinners[0]["recipe"] for meal in dinners)
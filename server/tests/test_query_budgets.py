@@ -0,0 +1,293 @@
+"""
+Every API route stays within its statement budget in app.query_budget.QUERY_BUDGETS.
+
+Each test drives one route against a seeded database inside the query_budget
+fixture, which fails the test when the request runs more statements than the
+route's budget.
+"""
+import json
+import uuid
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from app import models
+from app.database import SessionLocal
+from app.main import app
+from app.query_budget import QUERY_BUDGETS
+
+MEAL_PLANS = "/api/meal-plans"
+
+
+@pytest.fixture
+def lenient_client(client):
+    """A client that answers server errors with a 500 instead of raising them in the test.
+
+    Not entered as a context manager, so the app's startup and shutdown handlers don't run again.
+    """
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def login(client, user) -> dict:
+    response = client.post("/api/auth/token", data={"username": user["email"], "password": user["password"]})
+    assert response.status_code == 200
+    return response.json()
+
+
+def add_user_ingredient(user) -> int:
+    with SessionLocal() as db:
+        ingredient = models.Ingredient(name=f"Pantry item {uuid.uuid4().hex[:8]}", default_unit="g")
+        db.add(ingredient)
+        db.flush()
+        user_ingredient = models.UserIngredient(
+            user_id=user["id"], ingredient_id=ingredient.id, quantity=500, unit="g"
+        )
+        db.add(user_ingredient)
+        db.commit()
+        return user_ingredient.id
+
+
+def test_every_api_route_has_a_budget():
+    routes = {
+        f"{method} {route.path}"
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.path.startswith("/api/")
+        for method in route.methods
+    }
+    assert routes == set(QUERY_BUDGETS)
+
+
+# Auth
+
+def test_token(client, user, query_budget):
+    with query_budget("POST /api/auth/token"):
+        login(client, user)
+
+
+def test_refresh(client, user, query_budget):
+    tokens = login(client, user)
+    with query_budget("POST /api/auth/refresh"):
+        response = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+
+
+def test_register(client, query_budget):
+    # The endpoint requires a current_user body field; null counts as missing
+    body = {
+        "user": {"email": f"new-{uuid.uuid4().hex}@example.com", "password": "secret", "name": "New"},
+        "current_user": {}
+    }
+    with query_budget("POST /api/auth/register"):
+        response = client.post("/api/auth/register", json=body)
+    assert response.status_code == 200
+
+
+def test_logout(client, user, query_budget):
+    tokens = login(client, user)
+    with query_budget("POST /api/auth/logout"):
+        response = client.post("/api/auth/logout", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+
+
+# Users
+
+def test_get_profile(client, user, query_budget):
+    with query_budget("GET /api/users/profile"):
+        response = client.get("/api/users/profile", headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_update_profile(client, user, query_budget):
+    with query_budget("PUT /api/users/profile"):
+        response = client.put("/api/users/profile", json={"name": "Renamed", "language": "da"}, headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_get_preferences(client, user, query_budget):
+    with query_budget("GET /api/users/preferences"):
+        response = client.get("/api/users/preferences", headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_update_preferences(client, user, query_budget):
+    preferences = {"dietary_restrictions": ["vegetarian"], "calories_per_day": 1800}
+    with query_budget("PUT /api/users/preferences"):
+        response = client.put("/api/users/preferences", json=preferences, headers=user["headers"])
+    assert response.status_code == 200
+
+
+# Ingredients
+
+def test_common_ingredients(client, query_budget):
+    with query_budget("GET /api/ingredients/common"):
+        response = client.get("/api/ingredients/common")
+    assert response.status_code == 200
+
+
+# The user ingredient rows do not have the fields of the declared response
+# model, so listing and adding them fail after their statements have run
+
+def test_user_ingredients(lenient_client, user, query_budget):
+    add_user_ingredient(user)
+    with query_budget("GET /api/ingredients/user"):
+        lenient_client.get("/api/ingredients/user", headers=user["headers"])
+
+
+def test_add_user_ingredient(lenient_client, user, query_budget):
+    ingredient = {"name": f"Saffron {uuid.uuid4().hex[:8]}", "quantity": 1, "unit": "g"}
+    with query_budget("POST /api/ingredients/user"):
+        lenient_client.post("/api/ingredients/user", json=ingredient, headers=user["headers"])
+
+
+def test_update_user_ingredient(client, user, query_budget):
+    ingredient_id = add_user_ingredient(user)
+    with query_budget("PUT /api/ingredients/user/{ingredient_id}"):
+        response = client.put(
+            f"/api/ingredients/user/{ingredient_id}",
+            json={"name": "Pantry item", "quantity": 250, "unit": "g"},
+            headers=user["headers"]
+        )
+    assert response.status_code == 200
+
+
+def test_delete_user_ingredient(client, user, query_budget):
+    ingredient_id = add_user_ingredient(user)
+    with query_budget("DELETE /api/ingredients/user/{ingredient_id}"):
+        response = client.delete(f"/api/ingredients/user/{ingredient_id}", headers=user["headers"])
+    assert response.status_code == 200
+
+
+# Recipes
+
+def test_generate_recipe(client, user, query_budget):
+    with query_budget("POST /api/recipes/generate"):
+        response = client.post("/api/recipes/generate", json={"cuisine": "Italian"}, headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_get_recipe(client, user, meal_plan, query_budget):
+    with SessionLocal() as db:
+        recipe_id = db.query(models.Meal.recipe_id).join(models.DailyMeal).filter(
+            models.DailyMeal.meal_plan_id == meal_plan.id
+        ).limit(1).scalar()
+    with query_budget("GET /api/recipes/{recipe_id}"):
+        response = client.get(f"/api/recipes/{recipe_id}", headers=user["headers"])
+    assert response.status_code == 200
+
+
+# Meal plans
+
+def test_generate_meal_plan(client, user, meal_plan, query_budget):
+    # Replaces the seeded plan, so the budget covers deleting one as well
+    body = {
+        "week_info": {"year": meal_plan.year, "week_number": meal_plan.week_number},
+        "preferences": {"meal_types": ["breakfast", "dinner"]}
+    }
+    with query_budget("POST /api/meal-plans/generate"):
+        response = client.post(f"{MEAL_PLANS}/generate", json=body, headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_stream_meal_plan(client, user, meal_plan, query_budget):
+    body = {
+        "week_info": {"year": meal_plan.year, "week_number": meal_plan.week_number},
+        "preferences": {"meal_types": ["breakfast", "dinner"]}
+    }
+    with query_budget("POST /api/meal-plans/generate/stream"):
+        response = client.post(f"{MEAL_PLANS}/generate/stream", json=body, headers=user["headers"])
+    assert response.status_code == 200
+    assert "event: done" in response.text
+
+
+def test_create_meal_plan_job(client, user, query_budget):
+    body = {"preferences": {"meal_types": ["dinner"]}}
+    with query_budget("POST /api/meal-plans/jobs"):
+        response = client.post(f"{MEAL_PLANS}/jobs", json=body, headers=user["headers"])
+    assert response.status_code == 202
+
+
+def test_get_completed_meal_plan_job(client, user, meal_plan, query_budget):
+    with SessionLocal() as db:
+        job = models.MealPlanJob(
+            user_id=user["id"], week_number=meal_plan.week_number, year=meal_plan.year,
+            preferences=json.dumps({}), status="completed", progress=21, total=21, meal_plan_id=meal_plan.id
+        )
+        db.add(job)
+        db.commit()
+        job_id = job.id
+    with query_budget("GET /api/meal-plans/jobs/{job_id}"):
+        response = client.get(f"{MEAL_PLANS}/jobs/{job_id}", headers=user["headers"])
+    assert response.status_code == 200
+    assert response.json()["meal_plan"] is not None
+
+
+def test_current_meal_plan(client, user, meal_plan, query_budget):
+    with query_budget("GET /api/meal-plans/current"):
+        response = client.get(f"{MEAL_PLANS}/current", headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_week_meal_plan(client, user, meal_plan, query_budget):
+    with query_budget("GET /api/meal-plans/week/{year}/{week_number}"):
+        response = client.get(f"{MEAL_PLANS}/week/{meal_plan.year}/{meal_plan.week_number}", headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_meal_details(client, user, meal_plan, query_budget):
+    with query_budget("GET /api/meal-plans/current/meals/{day_index}/{meal_type}"):
+        response = client.get(f"{MEAL_PLANS}/current/meals/2/lunch", headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_replace_meal(client, user, meal_plan, query_budget):
+    body = {"day_index": 1, "meal_type": "dinner", "request": "Something with fish"}
+    with query_budget("PUT /api/meal-plans/current/meals"):
+        response = client.put(f"{MEAL_PLANS}/current/meals", json=body, headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_update_meal_servings(client, user, meal_plan, query_budget):
+    body = {"day_index": 0, "meal_type": "dinner", "servings": 6}
+    with query_budget("PUT /api/meal-plans/current/servings"):
+        response = client.put(f"{MEAL_PLANS}/current/servings", json=body, headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_update_all_meal_servings(client, user, meal_plan, query_budget):
+    with query_budget("PUT /api/meal-plans/current/servings/bulk"):
+        response = client.put(f"{MEAL_PLANS}/current/servings/bulk", json={"servings": 8}, headers=user["headers"])
+    assert response.status_code == 200
+
+
+def test_reset_meal_plans(client, user, meal_plan, query_budget):
+    with query_budget("DELETE /api/meal-plans/reset"):
+        response = client.delete(f"{MEAL_PLANS}/reset", headers=user["headers"])
+    assert response.status_code == 204
+
+
+# Shopping list
+
+def test_current_shopping_list(client, user, meal_plan, query_budget):
+    with query_budget("GET /api/shopping-list/current"):
+        response = client.get("/api/shopping-list/current", headers=user["headers"])
+    assert response.status_code == 200
+    assert response.json()
+
+
+def test_week_shopping_list(client, user, meal_plan, query_budget):
+    with query_budget("GET /api/shopping-list/week/{year}/{week_number}"):
+        response = client.get(
+            f"/api/shopping-list/week/{meal_plan.year}/{meal_plan.week_number}", headers=user["headers"]
+        )
+    assert response.status_code == 200
+
+
+def test_toggle_shopping_item(client, user, meal_plan, query_budget):
+    with SessionLocal() as db:
+        item_id = db.query(models.ShoppingItem.id).filter(
+            models.ShoppingItem.meal_plan_id == meal_plan.id
+        ).limit(1).scalar()
+    with query_budget("PATCH /api/shopping-list/items/{item_id}"):
+        response = client.patch(f"/api/shopping-list/items/{item_id}", json={"bought": True}, headers=user["headers"])
+    assert response.status_code == 200
@@ -0,0 +1,162 @@
+"""
+Servings updates and meal replacements adjust the shopping list in place.
+
+After any sequence of them the list must match one built from scratch for the
+plan's current recipes, and an item stays bought unless it now needs more.
+"""
+import pytest
+from sqlalchemy import func
+
+from app import models
+from app.database import SessionLocal
+from app.endpoints import meal_plans
+
+MEAL_PLANS = "/api/meal-plans"
+
+
+@pytest.fixture
+def week_plan(week_plan) -> dict:
+    """The test week with salt in two of day 1's meals, spelled differently as generated plans do."""
+    meals = week_plan["days"][0]["meals"]
+    meals["breakfast"]["recipe"]["ingredients"].append({"name": "Salt", "amount": 1, "unit": "tsp"})
+    meals["lunch"]["recipe"]["ingredients"].append({"name": "salt", "amount": 0.5, "unit": "tsp"})
+    return week_plan
+
+
+@pytest.fixture
+def replacement_recipe(monkeypatch):
+    """Replacement meals get this recipe instead of a generated one."""
+    recipe = {
+        "name": "Salted fish",
+        "description": "Test replacement",
+        "servings": 4,
+        "instructions": ["Cook"],
+        "nutrition": {"calories": 400, "protein": 40, "carbs": 10, "fat": 20},
+        "ingredients": [
+            {"name": "Test ingredient 0", "amount": 200, "unit": "g"},
+            {"name": "Salt", "amount": 2, "unit": "tsp"},
+            {"name": "Fish fillet", "amount": 4, "unit": "pieces"}
+        ]
+    }
+
+    async def generate_recipe(preferences, language="en"):
+        return dict(recipe)
+
+    monkeypatch.setattr(meal_plans.openrouter_client, "generate_recipe", generate_recipe)
+    return recipe
+
+
+def shopping_list(client, user) -> dict:
+    """The current shopping list as {(name, unit): item}."""
+    response = client.get("/api/shopping-list/current", headers=user["headers"])
+    assert response.status_code == 200
+    items = {(item["name"], item["unit"]): item for item in response.json()}
+    assert len(items) == len(response.json()), "one item per ingredient and unit"
+    return items
+
+
+def rebuilt_shopping_list(meal_plan_id: int) -> dict:
+    """What the shopping list should need, summed from the plan's current recipes."""
+    with SessionLocal() as db:
+        rows = db.query(
+            models.Ingredient.name, models.RecipeIngredient.unit, func.sum(models.RecipeIngredient.amount)
+        ).join(
+            models.RecipeIngredient.ingredient
+        ).join(
+            models.Meal, models.Meal.recipe_id == models.RecipeIngredient.recipe_id
+        ).join(
+            models.DailyMeal, models.DailyMeal.meal_id == models.Meal.id
+        ).filter(
+            models.DailyMeal.meal_plan_id == meal_plan_id
+        ).group_by(
+            models.Ingredient.name, models.RecipeIngredient.unit
+        ).all()
+    return {(name, unit): amount for name, unit, amount in rows}
+
+
+def needed(items: dict) -> dict:
+    return {key: pytest.approx(item["needed"]) for key, item in items.items()}
+
+
+def mark_all_bought(meal_plan_id: int):
+    with SessionLocal() as db:
+        db.query(models.ShoppingItem).filter(
+            models.ShoppingItem.meal_plan_id == meal_plan_id
+        ).update({models.ShoppingItem.bought: True})
+        db.commit()
+
+
+def test_saved_plan_keeps_differently_spelled_ingredients_apart(client, user, meal_plan):
+    items = shopping_list(client, user)
+    assert items[("Salt", "tsp")]["needed"] == pytest.approx(1)
+    assert items[("salt", "tsp")]["needed"] == pytest.approx(0.5)
+    assert needed(items) == rebuilt_shopping_list(meal_plan.id)
+
+
+def test_update_meal_servings(client, user, meal_plan):
+    before = shopping_list(client, user)
+    body = {"day_index": 0, "meal_type": "dinner", "servings": 6}
+    response = client.put(f"{MEAL_PLANS}/current/servings", json=body, headers=user["headers"])
+    assert response.status_code == 200
+    after = shopping_list(client, user)
+
+    # Day 1's meals use test ingredients 3 to 7, 100 g each for 4 servings
+    scaled = {(f"Test ingredient {n}", "g") for n in range(3, 8)}
+    assert set(after) == set(before)
+    for key in after:
+        change = 50 if key in scaled else 0
+        assert after[key]["needed"] == pytest.approx(before[key]["needed"] + change)
+    assert needed(after) == rebuilt_shopping_list(meal_plan.id)
+
+
+def test_update_all_meal_servings(client, user, meal_plan):
+    before = shopping_list(client, user)
+    response = client.put(f"{MEAL_PLANS}/current/servings/bulk", json={"servings": 8}, headers=user["headers"])
+    assert response.status_code == 200
+    after = shopping_list(client, user)
+
+    assert set(after) == set(before)
+    for key in after:
+        assert after[key]["needed"] == pytest.approx(before[key]["needed"] * 2)
+    assert needed(after) == rebuilt_shopping_list(meal_plan.id)
+
+
+def test_replace_meal(client, user, meal_plan, replacement_recipe):
+    before = shopping_list(client, user)
+    body = {"day_index": 0, "meal_type": "breakfast", "request": "Something with fish"}
+    response = client.put(f"{MEAL_PLANS}/current/meals", json=body, headers=user["headers"])
+    assert response.status_code == 200
+    after = shopping_list(client, user)
+
+    # The replaced breakfast had test ingredients 3 to 7 and 1 tsp of Salt
+    assert after[("Test ingredient 3", "g")]["needed"] == pytest.approx(before[("Test ingredient 3", "g")]["needed"] - 100)
+    assert after[("Test ingredient 0", "g")]["needed"] == pytest.approx(before[("Test ingredient 0", "g")]["needed"] + 200)
+    assert after[("Salt", "tsp")]["needed"] == pytest.approx(2)
+    assert after[("salt", "tsp")]["needed"] == pytest.approx(0.5)
+    assert after[("Fish fillet", "pieces")]["needed"] == pytest.approx(4)
+    assert needed(after) == rebuilt_shopping_list(meal_plan.id)
+
+
+def test_updates_match_a_rebuilt_list_and_keep_bought_items(client, user, meal_plan, replacement_recipe):
+    mark_all_bought(meal_plan.id)
+    before = shopping_list(client, user)
+
+    body = {"day_index": 0, "meal_type": "lunch", "servings": 2}
+    response = client.put(f"{MEAL_PLANS}/current/servings", json=body, headers=user["headers"])
+    assert response.status_code == 200
+    body = {"day_index": 0, "meal_type": "breakfast", "request": "Something with fish"}
+    response = client.put(f"{MEAL_PLANS}/current/meals", json=body, headers=user["headers"])
+    assert response.status_code == 200
+    after = shopping_list(client, user)
+
+    assert needed(after) == rebuilt_shopping_list(meal_plan.id)
+    for key, item in after.items():
+        # What needs more than was bought is back on the list; the rest stays bought
+        if key in before and item["needed"] <= before[key]["needed"] + 1e-6:
+            assert item["bought"], key
+        else:
+            assert not item["bought"], key
+    assert after[("salt", "tsp")]["needed"] == pytest.approx(0.25)
+    assert after[("salt", "tsp")]["bought"]
+    assert not after[("Salt", "tsp")]["bought"]
+    assert not after[("Fish fillet", "pieces")]["bought"]
@@ -0,0 +1,76 @@
+"""
+SingleFlight runs concurrent calls that share a key once, and a waiter going away does not cancel the work.
+"""
+import asyncio
+
+import httpx
+
+from app.endpoints import recipes
+from app.openrouter_client import recipe_flight
+from app.single_flight import SingleFlight
+from benchmarks import stub_openrouter
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    executions = []
+
+    async def work():
+        executions.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def main():
+        return await asyncio.gather(flight.do("key", work), flight.do("key", work), flight.do("other", work))
+
+    assert asyncio.run(main()) == ["done", "done", "done"]
+    assert len(executions) == 2
+    assert flight.stats() == {"calls": 3, "executions": 2, "coalesced": 1, "in_flight": 0}
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_task():
+    flight = SingleFlight("test")
+    release = None
+
+    async def work():
+        await release.wait()
+        return "done"
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        assert first.cancelled()
+
+        release.set()
+        return await second
+
+    assert asyncio.run(main()) == "done"
+    assert flight.stats() == {"calls": 2, "executions": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_concurrent_recipe_requests_make_one_upstream_call(monkeypatch):
+    upstream_requests = []
+
+    async def count_request(request):
+        upstream_requests.append(request.url.path)
+
+    transport = httpx.ASGITransport(app=stub_openrouter.app)
+    monkeypatch.setattr(recipes.openrouter_client, "_http_client", httpx.AsyncClient(
+        transport=transport, event_hooks={"request": [count_request]}
+    ))
+    executions = recipe_flight.executions
+    preferences = {"meal_name": "Coalesced soup", "cuisine_type": "Any"}
+
+    async def main():
+        return await asyncio.gather(*(recipes.openrouter_client.generate_recipe(preferences) for _ in range(3)))
+
+    first, second, third = asyncio.run(main())
+    assert first == second == third
+    assert len(upstream_requests) == 1
+    assert recipe_flight.executions == executions + 1
@@ -0,0 +1,57 @@
+"""
+The week plan is read with a fixed number of statements, however many meals it has.
+"""
+from app.query_budget import query_budget
+
+# Role lookup, the plan, its daily meals joined with meals, recipes and nutrition,
+# and one selectinload round trip for the recipe ingredients with their ingredients
+WEEK_PLAN_STATEMENTS = 4
+
+
+def assert_full_week(plan: dict):
+    meals = [day[meal_type] for day in plan["days"] for meal_type in ("breakfast", "lunch", "dinner")]
+    assert len(meals) == 21
+    for meal in meals:
+        assert meal is not None
+        assert meal["recipe"]["nutrition"]["calories"] == 500
+        assert len(meal["recipe"]["ingredientDetails"]) == 5
+        assert all(ingredient["name"] for ingredient in meal["recipe"]["ingredientDetails"])
+
+
+def test_current_week_plan_statements(client, user, meal_plan):
+    with query_budget(WEEK_PLAN_STATEMENTS, "GET /api/meal-plans/current") as recorder:
+        response = client.get("/api/meal-plans/current", headers=user["headers"])
+    assert response.status_code == 200
+    assert_full_week(response.json())
+    assert not recorder.repeated_shapes(threshold=2)
+
+
+def test_week_plan_statements(client, user, meal_plan):
+    path = f"/api/meal-plans/week/{meal_plan.year}/{meal_plan.week_number}"
+    with query_budget(WEEK_PLAN_STATEMENTS, f"GET {path}") as recorder:
+        response = client.get(path, headers=user["headers"])
+    assert response.status_code == 200
+    assert_full_week(response.json())
+    assert not recorder.repeated_shapes(threshold=2)
+
+
+def test_unchanged_week_plan_is_not_loaded(client, user, meal_plan):
+    response = client.get("/api/meal-plans/current", headers=user["headers"])
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    # At most the role lookup and the plan row; the meals are not loaded for a 304
+    headers = {**user["headers"], "If-None-Match": etag}
+    with query_budget(2, "GET /api/meal-plans/current with If-None-Match"):
+        response = client.get("/api/meal-plans/current", headers=headers)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    body = {"day_index": 0, "meal_type": "dinner", "servings": 6}
+    response = client.put("/api/meal-plans/current/servings", json=body, headers=user["headers"])
+    assert response.status_code == 200
+
+    response = client.get("/api/meal-plans/current", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert_full_week(response.json())